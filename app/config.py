@@ -0,0 +1,31 @@
+from os import getenv
+
+def env_flag(name:str, default:bool=False) -> bool:
+    '''Read a boolean environment variable. Accepts 1/true/yes/on (case insensitive) as True
+    '''
+    value = getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+def env_int(name:str, default:int | None=None) -> int | None:
+    '''Read an integer environment variable
+    '''
+    value = getenv(name)
+    if value is None or not value.strip():
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise EnvironmentError(f'Environment variable {name} must be an integer, got: {value}')
+
+def env_float(name:str, default:float | None=None) -> float | None:
+    '''Read a float environment variable
+    '''
+    value = getenv(name)
+    if value is None or not value.strip():
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        raise EnvironmentError(f'Environment variable {name} must be a number, got: {value}')
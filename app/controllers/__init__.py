@@ -1 +1,2 @@
-from .cli_controller import cli_bp
\ No newline at end of file
+from .cli_controller import cli_bp
+from .perf_controller import perf_bp
\ No newline at end of file
@@ -1,7 +1,13 @@
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+from time import perf_counter
 
-from flask import Blueprint
-from sqlalchemy import text
+import json
+from urllib.parse import urlencode
+
+import click
+from flask import Blueprint, current_app
+from marshmallow import Schema, fields
+from sqlalchemy import delete, func, select, text
 
 from app.db import db
 from app.model import (
@@ -10,28 +16,152 @@ from app.model import (
     CargoType,
     Dock,
     DockCargo,
-    Ship
+    Ship,
+    TableVersion,
+    DockUtilisation,
+    IdempotencyKey
+)
+from app.model.ddl import (
+    table_version_ddl,
+    TABLE_VERSION_DROP_DDL,
+    BUMP_TABLE_VERSION,
+    DOCK_UTILISATION_DDL,
+    dock_utilisation_rebuild_ddl,
+    DOCK_UTILISATION_DROP_DDL,
+    BOOKINGS_ARCHIVE_TABLE,
+    PARTITION_MONTHS_AHEAD,
+    PARTITIONED_BOOKINGS_DDL,
+    BOOKING_PARTITIONS_QUERY,
+    BOOKINGS_PARTITION_DROP_DDL,
+    ARCHIVE_BOOKINGS,
+    CREATE_PARTITION_STASH,
+    STASH_DEFAULT_PARTITION_ROWS,
+    RESTORE_DEFAULT_PARTITION_ROWS,
+    booking_partition_ddl,
+    booking_partition_name,
+    bookings_archive_ddl,
+    month_start
+)
+from app.schemas import (
+    bookings_schema,
+    cargos_schema,
+    companies_schema,
+    docks_schema,
+    ships_schema
 )
+from app.schemas.fast_dump import compile_serialiser, find_fast_dump_mismatches
+from app.perf.explain import run_explain, format_explain
+from app.perf.micro import dump_fixtures
+from app.utils import schema_loader_options, sparse_schema
+from app.utils.seed_generator import CopyStream, SeedGenerator
 
 cli_bp = Blueprint('db', __name__)
 
+def _table_exists(table_name:str) -> bool:
+    return db.session.scalar(text('SELECT to_regclass(:table_name) IS NOT NULL'), {'table_name': table_name})
+
+def _bookings_partitioned() -> bool:
+    '''Check whether the bookings table was created with the partitioned layout (flask db create --partitioned)
+    '''
+    return bool(db.session.scalar(text("SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass('bookings')")))
+
+def _create_booking_partition(month:date) -> int:
+    '''Create the bookings partition for a month, in the current transaction. Bookings of the month already in the
+    default partition (e.g. made before the partition was due) would block creating it, so are moved into it
+
+    Returns:
+        int: Number of bookings moved from the default partition
+    '''
+    db.session.execute(text(CREATE_PARTITION_STASH))
+    moved = db.session.execute(
+        text(STASH_DEFAULT_PARTITION_ROWS),
+        {'month_start': month, 'month_end': month_start(month, 1)}
+    ).rowcount
+
+    for statement in booking_partition_ddl(month):
+        db.session.execute(text(statement))
+
+    if moved:
+        #The rows are unchanged, so their utilisation & overlap checks still hold
+        db.session.execute(text("SELECT set_config('app.skip_utilisation', 'on', true), set_config('app.skip_overlap_check', 'on', true)"))
+        db.session.execute(text(RESTORE_DEFAULT_PARTITION_ROWS))
+        db.session.execute(text("SELECT set_config('app.skip_utilisation', 'off', true), set_config('app.skip_overlap_check', 'off', true)"))
+    return moved
+
+def _create_booking_partitions(months_ahead:int) -> dict[str, int]:
+    '''Create the missing monthly bookings partitions from the current month to months_ahead months later, in the
+    current transaction
+
+    Returns:
+        dict[str, int]: Names of the partitions created, with the number of bookings moved into each from the
+            default partition
+    '''
+    existing = {row.name for row in db.session.execute(text(BOOKING_PARTITIONS_QUERY), {'parent': Booking.__tablename__})}
+    this_month = month_start(date.today())
+    created = {}
+
+    for month in (month_start(this_month, offset) for offset in range(months_ahead + 1)):
+        name = booking_partition_name(month)
+        if name in existing:
+            continue
+        created[name] = _create_booking_partition(month)
+
+    return created
+
+def _create_partitioned_bookings():
+    '''Create the other tables, then bookings with the partitioned layout & partitions for the coming months
+    '''
+    db.metadata.create_all(db.engine, tables=[table for table in db.metadata.sorted_tables if table is not Booking.__table__])
+    Booking.__table__.c.booking_status.type.create(db.engine, checkfirst=True)
+
+    for statement in PARTITIONED_BOOKINGS_DDL:
+        db.session.execute(text(statement))
+    created = _create_booking_partitions(PARTITION_MONTHS_AHEAD)
+    db.session.commit()
+    print(f"Bookings partitioned by month. Partitions created: {', '.join(created)}")
+
 @cli_bp.cli.command('create')
-def create_tables():
+@click.option('--partitioned', is_flag=True, help='Create bookings partitioned by month of booking_start, if it does not exist yet')
+def create_tables(partitioned:bool):
     '''Command to create all tables defined in the model
-    Also installs btree_gist extension as required by bookings exclude constraints
+    Also installs btree_gist extension as required by bookings exclude constraints,
+    the triggers maintaining table_versions for conditional GET requests and the dock_utilisation_daily summary
+    Can be re-run on an existing database to add new tables & indexes
+    With --partitioned, a new bookings table is partitioned by month (see flask db partitions). An existing bookings table
+    keeps its layout
     '''
     print('Creating tables...')
     db.session.execute(text('CREATE EXTENSION IF NOT EXISTS btree_gist'))
     db.session.commit()
+
+    if partitioned:
+        if _table_exists(Booking.__tablename__):
+            print(f'{Booking.__tablename__} already exists, its layout is kept.')
+        else:
+            _create_partitioned_bookings()
     db.create_all()
+
+    #create_all skips tables that already exist, so add indexes declared since they were created
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
+
+    #Idempotency keys are never read by GET routes, so writes to them don't need to invalidate anything
+    unversioned_tables = (TableVersion.__tablename__, IdempotencyKey.__tablename__)
+    versioned_tables = [name for name in db.metadata.tables.keys() if name not in unversioned_tables]
+    for statement in table_version_ddl(versioned_tables) + DOCK_UTILISATION_DDL:
+        db.session.execute(text(statement))
+    db.session.commit()
     print(f"Tables created: {', '.join(db.metadata.tables.keys())}")
 
 @cli_bp.cli.command('drop')
 def drop_tables():
     '''Command to drop all tables defined in the model
-    Cleans up btree_gist extension
+    Cleans up btree_gist extension, table version and utilisation triggers, and the bookings archive
     '''
     db.drop_all()
+    for statement in TABLE_VERSION_DROP_DDL + DOCK_UTILISATION_DROP_DDL + BOOKINGS_PARTITION_DROP_DDL:
+        db.session.execute(text(statement))
     db.session.execute(text('DROP EXTENSION IF EXISTS btree_gist'))
     db.session.commit()
     print('All tables dropped.')
@@ -46,11 +176,100 @@ def truncate_tables():
 
     print(f'Truncated tables: {table_names_str}')
 
+def _rebuild_utilisation():
+    '''Recompute dock_utilisation_daily from bookings & archived bookings, in the current transaction
+    '''
+    for statement in dock_utilisation_rebuild_ddl(include_archive=_table_exists(BOOKINGS_ARCHIVE_TABLE)):
+        db.session.execute(text(statement))
+
+def _copy_rows(cursor, table_name:str, columns:tuple[str, ...], rows) -> int:
+    '''Stream rows into a table with COPY, then move the table's id sequence past the loaded IDs
+
+    Returns:
+        int: Number of rows loaded
+    '''
+    stream = CopyStream(rows)
+    cursor.copy_expert(f"COPY {table_name} ({', '.join(columns)}) FROM STDIN", stream)
+    cursor.execute(f"SELECT setval(pg_get_serial_sequence('{table_name}', 'id'), GREATEST((SELECT max(id) FROM {table_name}), 1))")
+    return stream.row_count
+
+def _seed_generated(companies:int, ships:int, docks:int, bookings_per_dock:int, days:int, pending_ratio:float, seed:int):
+    '''Generate a large dataset with SeedGenerator and bulk load it with COPY in a single transaction
+    '''
+    cargo_names = ('Container', 'Fuel', 'Grain', 'Vehicles', 'Passengers')
+    existing_names = set(db.session.scalars(select(CargoType.cargo_name)))
+    db.session.add_all(CargoType(cargo_name=name) for name in cargo_names if name not in existing_names)
+    db.session.flush()
+    cargo_type_ids = db.session.scalars(select(CargoType.id).order_by(CargoType.id)).all()
+
+    #Generated IDs start after the current maximum of each table, so existing data is left untouched
+    id_offsets = {
+        model.__tablename__: db.session.scalar(select(func.coalesce(func.max(model.id), 0)))
+        for model in (Company, Dock, DockCargo, Ship, Booking)
+    }
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    generator = SeedGenerator(
+        cargo_type_ids, companies, ships, docks, bookings_per_dock, days, today,
+        pending_ratio=pending_ratio, seed=seed, id_offsets=id_offsets
+    )
+
+    #Per row utilisation triggers would dominate the load time, so the summary is rebuilt once afterwards instead.
+    #Generated bookings don't overlap, so the cross partition overlap check of partitioned bookings is skipped too
+    db.session.execute(text("SET LOCAL app.skip_utilisation = 'on'"))
+    db.session.execute(text("SET LOCAL app.skip_overlap_check = 'on'"))
+
+    cursor = db.session.connection().connection.cursor()
+    loads = (
+        (Company.__tablename__, ('id', 'company_name', 'country', 'email', 'phone', 'address'), generator.company_rows()),
+        (Dock.__tablename__, ('id', 'dock_code', 'dock_length'), generator.dock_rows()),
+        (DockCargo.__tablename__, ('id', 'cargo_type_id', 'dock_id'), generator.dock_cargo_rows()),
+        (Ship.__tablename__, ('id', 'ship_name', 'ship_length', 'registration_country', 'cargo_type_id', 'company_id'), generator.ship_rows()),
+        (Booking.__tablename__, ('id', 'booking_start', 'booking_end', 'booking_status', 'ship_id', 'dock_id'), generator.booking_rows())
+    )
+    for table_name, columns, rows in loads:
+        started = perf_counter()
+        loaded = _copy_rows(cursor, table_name, columns, rows)
+        print(f'{table_name}: {loaded} rows loaded in {perf_counter() - started:.2f}s')
+
+    started = perf_counter()
+    _rebuild_utilisation()
+    print(f'{DockUtilisation.__tablename__}: rebuilt in {perf_counter() - started:.2f}s')
+    db.session.commit()
+
+    #Refresh planner statistics, so the first queries against the new data get sensible plans
+    for table_name, _, _ in loads:
+        db.session.execute(text(f'ANALYZE {table_name}'))
+    db.session.commit()
+
 @cli_bp.cli.command('seed')
-def seed_data():
+@click.option('--companies', type=click.IntRange(min=1), help='Generate this many companies')
+@click.option('--ships', type=click.IntRange(min=1), help='Generate this many ships')
+@click.option('--docks', type=click.IntRange(min=1), help='Generate this many docks')
+@click.option('--bookings-per-dock', type=click.IntRange(min=0), help='Generate this many CONFIRMED bookings per dock')
+@click.option('--days', type=click.IntRange(min=1), help='Spread generated bookings over this many days from today')
+@click.option('--pending-ratio', type=click.FloatRange(0, 1), help='Fraction of CONFIRMED bookings given an overlapping PENDING booking')
+@click.option('--seed', 'random_seed', type=int, help='Random seed for generated data')
+def seed_data(companies:int | None, ships:int | None, docks:int | None, bookings_per_dock:int | None, days:int | None,
+              pending_ratio:float | None, random_seed:int | None):
     '''Command to seed test data into the database
+    Without options, inserts a small demo dataset. With any option, generates a large dataset deterministically from
+    the seed and bulk loads it with COPY (unspecified options use their defaults)
     Test data can be removed with flask db truncate
     '''
+    options = (companies, ships, docks, bookings_per_dock, days, pending_ratio, random_seed)
+    if any(option is not None for option in options):
+        bookings_per_dock = 100 if bookings_per_dock is None else bookings_per_dock
+        days = days or 90
+        if bookings_per_dock > days * 24:
+            raise click.BadParameter('At most 24 bookings per dock per day can be generated', param_hint='--bookings-per-dock')
+
+        _seed_generated(
+            companies or 10, ships or 100, docks or 20, bookings_per_dock, days,
+            0.2 if pending_ratio is None else pending_ratio, random_seed or 0
+        )
+        print('Generated seed data inserted')
+        return
+
     cargo_types = [
         CargoType(cargo_name='Container'),
         CargoType(cargo_name='Fuel'),
@@ -116,4 +335,194 @@ def seed_data():
     db.session.add_all(bookings)
     db.session.commit()
 
-    print('Seed data inserted')
\ No newline at end of file
+    print('Seed data inserted')
+
+@cli_bp.cli.command('rebuild-utilisation')
+def rebuild_utilisation():
+    '''Command to rebuild the dock_utilisation_daily summary from bookings
+    Only needed if bookings were written with app.skip_utilisation set, or the triggers were missing
+    '''
+    started = perf_counter()
+    _rebuild_utilisation()
+    db.session.commit()
+
+    rows = db.session.scalar(select(func.count()).select_from(DockUtilisation))
+    print(f'{DockUtilisation.__tablename__} rebuilt: {rows} rows in {perf_counter() - started:.2f}s')
+
+@cli_bp.cli.command('purge-idempotency-keys')
+def purge_idempotency_keys():
+    '''Command to delete expired idempotency keys & their stored responses
+    Expired keys are already ignored by requests, so this only reclaims space. Run it regularly, e.g. daily from cron
+    '''
+    result = db.session.execute(delete(IdempotencyKey).where(IdempotencyKey.expires_at < func.now()))
+    db.session.commit()
+    print(f'{result.rowcount} expired idempotency keys deleted')
+
+@cli_bp.cli.command('partitions')
+@click.option('--ahead', default=PARTITION_MONTHS_AHEAD, show_default=True, type=click.IntRange(min=0), help='Create monthly partitions up to this many months after the current month')
+def partitions(ahead:int):
+    '''Command to create the missing monthly partitions of a partitioned bookings table & list its partitions
+    Run regularly (e.g. monthly from cron), as bookings after the last partition fall into bookings_default. Bookings
+    already in bookings_default for a month being created are moved into its partition
+    '''
+    if not _bookings_partitioned():
+        raise click.ClickException(f'{Booking.__tablename__} is not partitioned. Partitioning is set up by flask db create --partitioned on a new database.')
+
+    created = _create_booking_partitions(ahead)
+    db.session.commit()
+    print(f"Partitions created: {', '.join(created) or 'none'}")
+    for name, moved in created.items():
+        if moved:
+            print(f'{moved} bookings moved from {booking_partition_name(None)} to {name}')
+
+    for row in db.session.execute(text(BOOKING_PARTITIONS_QUERY), {'parent': Booking.__tablename__}):
+        #reltuples is -1 until the partition is first vacuumed or analyzed
+        print(f"{row.name:<20}{row.bounds:<80}~{max(row.estimated_rows, 0)} rows")
+
+def _detach_to_archive(partition_name:str, bounds:str):
+    '''Move a whole bookings partition to the archive by detaching it and attaching it to bookings_archive
+    '''
+    db.session.execute(text(f'ALTER TABLE {Booking.__tablename__} DETACH PARTITION {partition_name}'))
+
+    #Archived bookings don't block deleting their ship or dock, as with bookings moved by row
+    foreign_keys = db.session.scalars(
+        text("SELECT conname FROM pg_constraint WHERE conrelid = to_regclass(:table_name) AND contype = 'f'"),
+        {'table_name': partition_name}
+    ).all()
+    for constraint_name in foreign_keys:
+        db.session.execute(text(f'ALTER TABLE {partition_name} DROP CONSTRAINT {constraint_name}'))
+
+    db.session.execute(text(f'ALTER TABLE {BOOKINGS_ARCHIVE_TABLE} ATTACH PARTITION {partition_name} {bounds}'))
+
+@cli_bp.cli.command('archive')
+@click.option('--before', required=True, type=click.DateTime(formats=['%Y-%m-%d']), help='Archive bookings starting before this date (YYYY-MM-DD)')
+def archive(before:datetime):
+    '''Command to move bookings starting before a date from bookings to bookings_archive
+    Archived bookings are no longer returned by the API, but stay in the dock_utilisation_daily summary.
+    With partitioned bookings, whole months before the date are moved by detaching their partitions, then remaining
+    older rows are moved by row, so the date is rounded down to the start of its month
+    '''
+    before = before.date()
+    if before > date.today():
+        raise click.BadParameter('Only past bookings can be archived', param_hint='--before')
+
+    started = perf_counter()
+    partitioned = _bookings_partitioned()
+    for statement in bookings_archive_ddl(partitioned):
+        db.session.execute(text(statement))
+
+    detached = []
+    if partitioned:
+        before = month_start(before)
+        partitions = db.session.execute(text(BOOKING_PARTITIONS_QUERY), {'parent': Booking.__tablename__}).all()
+        for partition in partitions:
+            if partition.name == booking_partition_name(None):
+                continue
+            month = datetime.strptime(partition.name, 'bookings_y%Ym%m').date()
+            if month_start(month, 1) <= before:
+                _detach_to_archive(partition.name, partition.bounds)
+                detached.append(partition.name)
+
+    #Rows left before the date, e.g. in the default partition, are moved without touching the utilisation summary
+    db.session.execute(text("SET LOCAL app.skip_utilisation = 'on'"))
+    moved = db.session.execute(text(ARCHIVE_BOOKINGS), {'before': before}).rowcount
+
+    #Detaching doesn't fire the bookings triggers, so invalidate cached GET responses explicitly
+    db.session.execute(text(BUMP_TABLE_VERSION), {'table_name': Booking.__tablename__})
+    db.session.commit()
+
+    if detached:
+        print(f"Partitions moved to {BOOKINGS_ARCHIVE_TABLE}: {', '.join(detached)}")
+    print(f'{moved} bookings starting before {before} moved to {BOOKINGS_ARCHIVE_TABLE} by row in {perf_counter() - started:.2f}s')
+
+@cli_bp.cli.command('explain')
+@click.option('--min-rows', default=1000, show_default=True, type=click.IntRange(min=0), help='Flag filtered sequential scans reading at least this many rows')
+@click.option('--output', type=click.Path(dir_okay=False, allow_dash=True), help="Write JSON results to this file, or '-' for stdout")
+def explain(min_rows:int, output:str | None):
+    '''Command to run EXPLAIN (ANALYZE, BUFFERS) on the queries of each GET route & delete check against the current data,
+    flagging sequential scans that need an index and declared indexes missing from the database
+    Exits with status 1 if anything is flagged
+    '''
+    try:
+        results = run_explain(current_app, min_rows)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+
+    if output == '-':
+        click.echo(json.dumps(results, indent=2))
+    else:
+        click.echo(format_explain(results))
+        if output:
+            with open(output, 'w') as file:
+                json.dump(results, file, indent=2)
+            click.echo(f'Results written to {output}')
+
+    flagged = any(explained['warnings'] for statements in results['cases'].values() for explained in statements)
+    if flagged or results['missing_indexes']:
+        raise SystemExit(1)
+
+def _sparse_variants(schema:Schema) -> list[tuple[str, Schema]]:
+    '''Get the schema, and the restricted schemas sparse_schema builds from it, with each field selected on its own,
+    each nested field expanded (and all of them together) & each nested field's own fields selected with dot notation
+
+    Returns:
+        list[tuple[str, Schema]]: Query string: schema. The query string is empty for the unrestricted schema
+    '''
+    queries = []
+    nested_names = []
+    for field_name, field in schema.dump_fields.items():
+        inner = field.inner if isinstance(field, fields.List) else field
+        if isinstance(inner, fields.Nested):
+            nested_names.append(field_name)
+            queries.append({'expand': field_name})
+            queries += [{'fields': f'{field_name}.{nested_name}'} for nested_name in inner.schema.dump_fields]
+        else:
+            queries.append({'fields': field_name})
+    if len(nested_names) > 1:
+        queries.append({'expand': ','.join(nested_names)})
+
+    variants = [('', schema)]
+    for query in queries:
+        with current_app.test_request_context(query_string=query):
+            variants.append((urlencode(query), sparse_schema(schema)))
+    return variants
+
+@cli_bp.cli.command('check-dumps')
+@click.option('--limit', default=500, show_default=True, help='Number of rows of each table to compare')
+@click.option('--fixtures', is_flag=True, help='Compare built objects instead of database rows, for every fields/expand variant of each schema. Needs no database')
+def check_dumps(limit:int, fixtures:bool):
+    '''Command to check the compiled list serialisers produce output identical to marshmallow, using current data
+    With --fixtures, transient objects are built instead (see app.perf.micro.dump_fixtures), and also dumped with the
+    restricted schemas sparse_schema builds for the fields & expand query params, so it can run without a database
+    '''
+    failed = False
+    objects = dump_fixtures(limit) if fixtures else {}
+
+    for model, schema in ((Booking, bookings_schema), (Ship, ships_schema), (Dock, docks_schema), (Company, companies_schema), (CargoType, cargos_schema)):
+        if compile_serialiser(schema) is None:
+            print(f'{type(schema).__name__}: not compiled, marshmallow is used')
+            continue
+
+        if fixtures:
+            rows = objects[model]
+            variants = _sparse_variants(schema)
+        else:
+            stmt = select(model).options(*schema_loader_options(model, schema)).order_by(model.id).limit(limit)
+            rows = db.session.scalars(stmt).all()
+            variants = [('', schema)]
+
+        for query, variant in variants:
+            name = f'{type(schema).__name__}?{query}' if query else type(schema).__name__
+            if compile_serialiser(variant) is None:
+                print(f'{name}: not compiled, marshmallow is used')
+                continue
+
+            mismatches = find_fast_dump_mismatches(variant, rows)
+            if mismatches:
+                failed = True
+                print(f"{name}: {len(mismatches)} of {len(rows)} rows differ. IDs: {', '.join(str(rows[i].id) for i in mismatches[:20])}")
+            else:
+                print(f'{name}: {len(rows)} rows identical')
+
+    if failed:
+        raise SystemExit(1)
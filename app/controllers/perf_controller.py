@@ -0,0 +1,64 @@
+import json
+
+import click
+from flask import Blueprint, current_app
+
+from app.controllers.cli_controller import seed_data
+from app.perf import run_benchmark, format_results, WORKLOADS, run_microbenchmarks, format_micro_results, MICROBENCHMARKS
+
+perf_bp = Blueprint('perf', __name__)
+
+@perf_bp.cli.command('bench')
+@click.option('--workload', 'workloads', multiple=True, type=click.Choice(list(WORKLOADS)), help='Workload to run, repeatable. Default: all')
+@click.option('--threads', default=8, show_default=True, type=click.IntRange(min=1), help='Concurrent client threads')
+@click.option('--duration', default=10.0, show_default=True, type=click.FloatRange(min=0, min_open=True), help='Seconds each workload is measured for')
+@click.option('--warmup', default=2.0, show_default=True, type=click.FloatRange(min=0), help='Seconds each workload runs before measuring')
+@click.option('--scale', default=0, show_default=True, type=click.IntRange(min=0), help='Seed generated data first, at this multiple of the seed defaults. 0 uses the existing data')
+@click.option('--seed', 'random_seed', default=0, show_default=True, type=int, help='Random seed for seeding & request generation')
+@click.option('--base-url', help='Benchmark a running server (e.g. http://localhost:8000) instead of the app in-process')
+@click.option('--output', type=click.Path(dir_okay=False, allow_dash=True), help="Write JSON results to this file, or '-' for stdout")
+@click.pass_context
+def bench(ctx:click.Context, workloads:tuple[str, ...], threads:int, duration:float, warmup:float, scale:int, random_seed:int,
+          base_url:str | None, output:str | None):
+    '''Command to load test every /api/v1 route with concurrent clients, reporting throughput, latency percentiles,
+    SQL statements per request & peak RSS growth (in-process only) for each workload (read, write, mixed & contention)
+    Writes to the database: run against a disposable database
+    '''
+    if scale:
+        ctx.invoke(seed_data, companies=10 * scale, ships=100 * scale, docks=20 * scale, random_seed=random_seed)
+
+    try:
+        results = run_benchmark(current_app, list(workloads or WORKLOADS), threads, duration, warmup, random_seed, base_url)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+
+    if output == '-':
+        click.echo(json.dumps(results, indent=2))
+        return
+
+    click.echo(format_results(results))
+    if output:
+        with open(output, 'w') as file:
+            json.dump(results, file, indent=2)
+        click.echo(f'Results written to {output}')
+
+@perf_bp.cli.command('micro')
+@click.option('--bench', 'names', multiple=True, type=click.Choice(list(MICROBENCHMARKS)), help='Benchmark to run, repeatable. Default: all')
+@click.option('--rows', default=100, show_default=True, type=click.IntRange(min=1), help='Number of bookings dumped per call by the dump benchmarks')
+@click.option('--repeat', default=5, show_default=True, type=click.IntRange(min=1), help='Timing runs per benchmark, the best is reported')
+@click.option('--output', type=click.Path(dir_okay=False, allow_dash=True), help="Write JSON results to this file, or '-' for stdout")
+def micro(names:tuple[str, ...], rows:int, repeat:int, output:str | None):
+    '''Command to time schema load & dump paths on fixed synthetic objects, reporting ops/sec & allocations per call
+    Does not use the database
+    '''
+    results = run_microbenchmarks(list(names or MICROBENCHMARKS), rows=rows, repeat=repeat)
+
+    if output == '-':
+        click.echo(json.dumps(results, indent=2))
+        return
+
+    click.echo(format_micro_results(results))
+    if output:
+        with open(output, 'w') as file:
+            json.dump(results, file, indent=2)
+        click.echo(f'Results written to {output}')
@@ -1,7 +1,12 @@
 from os import getenv
 
 from dotenv import load_dotenv
+from flask import g, has_app_context
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
+from sqlalchemy.pool import NullPool
+
+from .config import env_flag, env_int
 
 load_dotenv()
 
@@ -19,4 +24,54 @@ if missing_envs:
 
 DB_CONNSTR = f'postgresql+psycopg2://{env_dict['DB_USER']}:{env_dict['DB_PASSWORD']}@{env_dict['DB_HOST']}/{env_dict['DB_NAME']}'
 
-db = SQLAlchemy()
+#Optional read replicas, comma separated. Use the same credentials & database name as the primary
+DB_REPLICA_CONNSTRS = [
+    f'postgresql+psycopg2://{env_dict['DB_USER']}:{env_dict['DB_PASSWORD']}@{host.strip()}/{env_dict['DB_NAME']}'
+    for host in (getenv('DB_REPLICA_HOST') or '').split(',') if host.strip()
+]
+
+class RoutingSession(Session):
+    '''Session sending statements to the connection the current request's transaction is held on (g.db_connection),
+    or the read replica engine chosen for the current request (g.db_read_engine), falling back to the default bind
+    when neither was chosen or while flushing writes
+
+    Sessions join a g.db_connection transaction with savepoints (join_transaction_mode create_savepoint), so commits
+    & rollbacks in the request only release or roll back a savepoint, and the connection's owner commits the transaction
+    '''
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_app_context():
+            connection = g.get('db_connection')
+            if connection is not None:
+                return connection
+            read_engine = g.get('db_read_engine')
+            if read_engine is not None and not self._flushing:
+                return read_engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+db = SQLAlchemy(session_options={'class_': RoutingSession, 'join_transaction_mode': 'create_savepoint'})
+
+
+def engine_options() -> dict:
+    '''Build the SQLAlchemy engine options from environment variables
+
+    With DB_POOL_MODE=null connections are not pooled by the app (e.g. when connecting through pgbouncer),
+    otherwise a QueuePool is configured from the DB_POOL_* variables.
+
+    Returns:
+        dict: Options for SQLALCHEMY_ENGINE_OPTIONS
+    '''
+    pool_mode = (getenv('DB_POOL_MODE') or 'queue').strip().lower()
+
+    match pool_mode:
+        case 'queue':
+            return {
+                'pool_size': env_int('DB_POOL_SIZE', 5),
+                'max_overflow': env_int('DB_MAX_OVERFLOW', 10),
+                'pool_timeout': env_int('DB_POOL_TIMEOUT', 30),
+                'pool_recycle': env_int('DB_POOL_RECYCLE', 1800),
+                'pool_pre_ping': env_flag('DB_POOL_PRE_PING', True)
+            }
+        case 'null':
+            return {'poolclass': NullPool}
+        case _:
+            raise EnvironmentError(f"Environment variable DB_POOL_MODE must be 'queue' or 'null', got: {pool_mode}")
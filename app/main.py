@@ -1,16 +1,39 @@
 from flask import Flask
 
-from .db import db, DB_CONNSTR
+from .db import db, DB_CONNSTR, DB_REPLICA_CONNSTRS, engine_options
+from .config import env_flag, env_int
 from .errors import register_error_handler
-from .controllers import cli_bp
-from .routes import routes_bp
+from .utils import booking_index, compatibility_index, replica_router, solver_pool, register_instrumentation, register_metrics
+from .controllers import cli_bp, perf_bp
+from .routes import routes_bp, health_bp, metrics_bp
 
 def create_app():
     '''App factory to define and create the Flask application
     '''
     app = Flask(__name__)
     app.config['SQLALCHEMY_DATABASE_URI'] = DB_CONNSTR
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options()
+    app.config['DB_REPLICA_URLS'] = DB_REPLICA_CONNSTRS
+    app.config['DB_REPLICA_CHECK_INTERVAL'] = env_int('DB_REPLICA_CHECK_INTERVAL', 10)
+    app.config['DB_REPLICA_RETRY_AFTER'] = env_int('DB_REPLICA_RETRY_AFTER', 30)
+    app.config['DB_REPLICA_STICKY_SECONDS'] = env_int('DB_REPLICA_STICKY_SECONDS', 5)
+    app.config['BOOKING_INDEX_ENABLED'] = env_flag('BOOKING_INDEX_ENABLED')
+    app.config['BOOKING_INDEX_TTL'] = env_int('BOOKING_INDEX_TTL', 30)
+    app.config['COMPATIBILITY_CACHE_TTL'] = env_int('COMPATIBILITY_CACHE_TTL', 300)
+    app.config['COMPATIBILITY_CHECK_INTERVAL'] = env_int('COMPATIBILITY_CHECK_INTERVAL', 1)
+    app.config['IDEMPOTENCY_KEY_TTL'] = env_int('IDEMPOTENCY_KEY_TTL', 24)
+    app.config['IDEMPOTENCY_WAIT_SECONDS'] = env_int('IDEMPOTENCY_WAIT_SECONDS', 30)
+    app.config['SOLVER_PROCESSES'] = env_int('SOLVER_PROCESSES', 0)
+    app.config['SOLVER_POOL_MIN_SIZE'] = env_int('SOLVER_POOL_MIN_SIZE', 500)
+    app.config['SLOW_REQUEST_MS'] = env_int('SLOW_REQUEST_MS')
+    app.config['SLOW_REQUEST_TOP_STATEMENTS'] = env_int('SLOW_REQUEST_TOP_STATEMENTS', 5)
     db.init_app(app)
+    booking_index.init_app(app)
+    compatibility_index.init_app(app)
+    replica_router.init_app(app)
+    solver_pool.init_app(app)
+    register_instrumentation(app)
+    register_metrics(app)
 
     app.json.sort_keys = False
 
@@ -19,7 +42,10 @@ def create_app():
         return {'status': 'healthy'}
     
     app.register_blueprint(cli_bp)
+    app.register_blueprint(perf_bp)
     app.register_blueprint(routes_bp)
+    app.register_blueprint(health_bp)
+    app.register_blueprint(metrics_bp)
 
     register_error_handler(app)
     
@@ -3,4 +3,7 @@ from .cargo_model import CargoType
 from .ship_model import Ship
 from .dock_model import Dock
 from .dock_cargo_model import DockCargo
-from .booking_model import Booking
\ No newline at end of file
+from .booking_model import Booking
+from .table_version_model import TableVersion
+from .dock_utilisation_model import DockUtilisation
+from .idempotency_model import IdempotencyKey
@@ -1,7 +1,7 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 from enum import Enum
 
-from sqlalchemy import types, ForeignKey
+from sqlalchemy import types, ForeignKey, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.dialects.postgresql import ExcludeConstraint
 from sqlalchemy import func
@@ -17,6 +17,15 @@ class StatusEnum(Enum):
     PENDING = 'PENDING'
     CONFIRMED = 'CONFIRMED'
 
+#Longest allowed booking. Also bounds how far before a time range an overlapping booking can start, so range filters
+#can add a booking_start predicate, letting partitioned bookings prune partitions
+MAX_BOOKING_DURATION = timedelta(hours=12)
+
+def booking_period(start, end):
+    '''Range expression of a booking's [start, end) times. Matches the expression indexed by ix_bookings_period,
+    so overlap filters written as booking_period(...).op('&&')(...) can use the index
+    '''
+    return func.tstzrange(start, end, '[)')
 
 class Booking(db.Model):
     """
@@ -46,10 +55,20 @@ class Booking(db.Model):
     __table_args__ = (
         ExcludeConstraint(
             ('dock_id', "="),
-            (func.tstzrange(booking_start, booking_end, '[)'), "&&"),
+            (booking_period(booking_start, booking_end), "&&"),
             where=("booking_status = 'CONFIRMED'"),
             name='exclude_overlapping_confirmed_bookings_per_dock'
         ),
+        #Keyset for GetAllBookings ordering & cursor pagination
+        Index('ix_bookings_booking_start_id', booking_start, id),
+        #Ship & dock filters (and FK lookups, e.g. before deleting a ship), ordered by start for booking windows
+        Index('ix_bookings_ship_id_booking_start', ship_id, booking_start),
+        Index('ix_bookings_dock_id_booking_start', dock_id, booking_start),
+        Index('ix_bookings_booking_status_booking_start', booking_status, booking_start),
+        #GetAllBookings from_time only filter
+        Index('ix_bookings_booking_end', booking_end),
+        #GetAllBookings from_time & to_time overlap filter, for any dock & status
+        Index('ix_bookings_period', booking_period(booking_start, booking_end), postgresql_using='gist'),
     )
 
     ship: Mapped['Ship'] = relationship(back_populates='bookings')
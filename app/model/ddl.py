@@ -0,0 +1,312 @@
+from datetime import date
+
+from app.model.booking_model import MAX_BOOKING_DURATION
+
+def table_version_ddl(table_names:list[str]) -> list[str]:
+    '''Statements creating the bump_table_version function, and a statement level trigger calling it on each table
+    A sequence is used for versions so they keep increasing after a table (or table_versions itself) is truncated.
+
+    Writes only queue a bump, once per table per transaction, in the unlogged table_version_bumps table. A deferred
+    constraint trigger applies it to table_versions at commit, so the table_versions row lock is held for the commit
+    only, rather than from a transaction's first write until it ends. Bumps of rolled back transactions are discarded
+    '''
+    statements = [
+        'CREATE SEQUENCE IF NOT EXISTS table_version_seq',
+        'CREATE UNLOGGED TABLE IF NOT EXISTS table_version_bumps (table_name varchar(63) NOT NULL)',
+        '''
+        CREATE OR REPLACE FUNCTION queue_table_version_bump(p_table_name text) RETURNS void AS $$
+        BEGIN
+            IF current_setting('table_versions.queued_' || p_table_name, true) IS DISTINCT FROM 'on' THEN
+                PERFORM set_config('table_versions.queued_' || p_table_name, 'on', true);
+                INSERT INTO table_version_bumps (table_name) VALUES (p_table_name);
+            END IF;
+        END
+        $$ LANGUAGE plpgsql
+        ''',
+        '''
+        CREATE OR REPLACE FUNCTION bump_table_version() RETURNS trigger AS $$
+        BEGIN
+            PERFORM queue_table_version_bump(TG_TABLE_NAME);
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+        ''',
+        #clock_timestamp as now() is the transaction start, so updated_at could go backwards across commits
+        '''
+        CREATE OR REPLACE FUNCTION apply_table_version_bump() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO table_versions (table_name, version, updated_at)
+            VALUES (NEW.table_name, nextval('table_version_seq'), clock_timestamp())
+            ON CONFLICT (table_name) DO UPDATE SET version = EXCLUDED.version, updated_at = EXCLUDED.updated_at;
+            DELETE FROM table_version_bumps WHERE ctid = NEW.ctid;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+        ''',
+        'DROP TRIGGER IF EXISTS table_version_bumps_apply ON table_version_bumps',
+        '''
+        CREATE CONSTRAINT TRIGGER table_version_bumps_apply
+        AFTER INSERT ON table_version_bumps
+        DEFERRABLE INITIALLY DEFERRED
+        FOR EACH ROW EXECUTE FUNCTION apply_table_version_bump()
+        '''
+    ]
+
+    for table_name in table_names:
+        statements += [
+            f'DROP TRIGGER IF EXISTS {table_name}_bump_version ON {table_name}',
+            f'''
+            CREATE TRIGGER {table_name}_bump_version
+            AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table_name}
+            FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version()
+            '''
+        ]
+
+    return statements
+
+#Bumps a table's version, at commit, for writes that don't fire its triggers, e.g. detaching a partition
+BUMP_TABLE_VERSION = 'SELECT queue_table_version_bump(:table_name)'
+
+TABLE_VERSION_DROP_DDL = [
+    'DROP FUNCTION IF EXISTS bump_table_version() CASCADE',
+    'DROP TABLE IF EXISTS table_version_bumps',
+    'DROP FUNCTION IF EXISTS apply_table_version_bump()',
+    'DROP FUNCTION IF EXISTS queue_table_version_bump(text)',
+    'DROP SEQUENCE IF EXISTS table_version_seq'
+]
+
+#Booked seconds of one booking on each day it spans, upserted into dock_utilisation_daily with sign 1 (add) or -1 (remove)
+_APPLY_DOCK_UTILISATION = '''
+CREATE OR REPLACE FUNCTION apply_dock_utilisation(
+    p_dock_id integer, p_cargo_type_id integer, p_start timestamptz, p_end timestamptz, p_status text, p_sign integer
+) RETURNS void AS $$
+BEGIN
+    INSERT INTO dock_utilisation_daily AS u (dock_id, day, cargo_type_id, booking_status, booked_seconds)
+    SELECT p_dock_id, d.day::date, p_cargo_type_id, p_status,
+        p_sign * extract(epoch FROM least(p_end, d.day + interval '1 day') - greatest(p_start, d.day))::bigint
+    FROM generate_series(date_trunc('day', p_start), p_end - interval '1 microsecond', interval '1 day') AS d(day)
+    ON CONFLICT (dock_id, day, cargo_type_id, booking_status)
+    DO UPDATE SET booked_seconds = u.booked_seconds + EXCLUDED.booked_seconds;
+
+    IF p_sign < 0 THEN
+        DELETE FROM dock_utilisation_daily
+        WHERE dock_id = p_dock_id AND cargo_type_id = p_cargo_type_id AND booking_status = p_status
+            AND day BETWEEN p_start::date AND p_end::date AND booked_seconds = 0;
+    END IF;
+END
+$$ LANGUAGE plpgsql
+'''
+
+#Setting app.skip_utilisation to on (e.g. SET LOCAL for a bulk load) skips maintenance, to be followed by a rebuild
+_BOOKINGS_MAINTAIN_UTILISATION = '''
+CREATE OR REPLACE FUNCTION bookings_maintain_utilisation() RETURNS trigger AS $$
+BEGIN
+    IF current_setting('app.skip_utilisation', true) = 'on' THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM apply_dock_utilisation(OLD.dock_id, (SELECT cargo_type_id FROM ships WHERE id = OLD.ship_id),
+            OLD.booking_start, OLD.booking_end, OLD.booking_status::text, -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM apply_dock_utilisation(NEW.dock_id, (SELECT cargo_type_id FROM ships WHERE id = NEW.ship_id),
+            NEW.booking_start, NEW.booking_end, NEW.booking_status::text, 1);
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+'''
+
+#Moves a ship's booked time to its new cargo type
+_SHIPS_MAINTAIN_UTILISATION = '''
+CREATE OR REPLACE FUNCTION ships_maintain_utilisation() RETURNS trigger AS $$
+DECLARE
+    b record;
+BEGIN
+    IF current_setting('app.skip_utilisation', true) = 'on' THEN
+        RETURN NULL;
+    END IF;
+    FOR b IN SELECT dock_id, booking_start, booking_end, booking_status::text AS status FROM bookings WHERE ship_id = NEW.id LOOP
+        PERFORM apply_dock_utilisation(b.dock_id, OLD.cargo_type_id, b.booking_start, b.booking_end, b.status, -1);
+        PERFORM apply_dock_utilisation(b.dock_id, NEW.cargo_type_id, b.booking_start, b.booking_end, b.status, 1);
+    END LOOP;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+'''
+
+DOCK_UTILISATION_DDL = [
+    _APPLY_DOCK_UTILISATION,
+    _BOOKINGS_MAINTAIN_UTILISATION,
+    _SHIPS_MAINTAIN_UTILISATION,
+    'DROP TRIGGER IF EXISTS bookings_maintain_utilisation ON bookings',
+    '''
+    CREATE TRIGGER bookings_maintain_utilisation
+    AFTER INSERT OR DELETE OR UPDATE OF booking_start, booking_end, booking_status, ship_id, dock_id ON bookings
+    FOR EACH ROW EXECUTE FUNCTION bookings_maintain_utilisation()
+    ''',
+    'DROP TRIGGER IF EXISTS ships_maintain_utilisation ON ships',
+    '''
+    CREATE TRIGGER ships_maintain_utilisation
+    AFTER UPDATE OF cargo_type_id ON ships
+    FOR EACH ROW WHEN (OLD.cargo_type_id IS DISTINCT FROM NEW.cargo_type_id)
+    EXECUTE FUNCTION ships_maintain_utilisation()
+    '''
+]
+
+def dock_utilisation_rebuild_ddl(include_archive:bool=False) -> list[str]:
+    '''Statements recomputing dock_utilisation_daily from bookings, and bookings_archive if include_archive,
+    as archived bookings keep their place in utilisation reports
+    '''
+    source = 'bookings'
+    if include_archive:
+        source = '(SELECT * FROM bookings UNION ALL SELECT * FROM bookings_archive)'
+
+    return [
+        'TRUNCATE TABLE dock_utilisation_daily',
+        f'''
+        INSERT INTO dock_utilisation_daily (dock_id, day, cargo_type_id, booking_status, booked_seconds)
+        SELECT b.dock_id, d.day::date, s.cargo_type_id, b.booking_status::text,
+            sum(extract(epoch FROM least(b.booking_end, d.day + interval '1 day') - greatest(b.booking_start, d.day)))::bigint
+        FROM {source} b
+        JOIN ships s ON s.id = b.ship_id
+        CROSS JOIN LATERAL generate_series(date_trunc('day', b.booking_start), b.booking_end - interval '1 microsecond', interval '1 day') AS d(day)
+        GROUP BY 1, 2, 3, 4
+        ''',
+        'ANALYZE dock_utilisation_daily'
+    ]
+
+DOCK_UTILISATION_DROP_DDL = [
+    'DROP FUNCTION IF EXISTS bookings_maintain_utilisation() CASCADE',
+    'DROP FUNCTION IF EXISTS ships_maintain_utilisation() CASCADE',
+    'DROP FUNCTION IF EXISTS apply_dock_utilisation(integer, integer, timestamptz, timestamptz, text, integer)'
+]
+
+BOOKINGS_ARCHIVE_TABLE = 'bookings_archive'
+PARTITION_MONTHS_AHEAD = 12
+
+def month_start(day:date, months:int=0) -> date:
+    '''Get the first day of the month the given number of months after day's month
+    '''
+    month_index = day.year * 12 + day.month - 1 + months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+def booking_partition_name(month:date | None) -> str:
+    '''Name of the bookings partition for the month starting on month, or the default partition if None
+    '''
+    return 'bookings_default' if month is None else f'bookings_y{month:%Y}m{month:%m}'
+
+def booking_partition_ddl(month:date | None) -> list[str]:
+    '''Statements creating the bookings partition for a month (or the default partition), with its own copy of the
+    exclusion constraint preventing overlapping CONFIRMED bookings on a dock, as partitioned tables can't have one
+    '''
+    name = booking_partition_name(month)
+    bounds = 'DEFAULT' if month is None else f"FOR VALUES FROM ('{month}') TO ('{month_start(month, 1)}')"
+    return [
+        f'CREATE TABLE {name} PARTITION OF bookings {bounds}',
+        f'''
+        ALTER TABLE {name} ADD CONSTRAINT {name}_exclude_overlapping_confirmed
+        EXCLUDE USING gist (dock_id WITH =, tstzrange(booking_start, booking_end, '[)') WITH &&) WHERE (booking_status = 'CONFIRMED')
+        '''
+    ]
+
+#Per partition exclusion constraints can't see a booking in another partition, so CONFIRMED writes are checked against
+#bookings starting up to MAX_BOOKING_DURATION earlier, which covers any booking crossing into the partition.
+#The advisory lock serialises the check per dock, as the constraint's index locking does within a partition.
+#Setting app.skip_overlap_check to on (e.g. SET LOCAL for a bulk load of non overlapping bookings) skips the check
+_BOOKINGS_CHECK_CROSS_PARTITION_OVERLAP = f'''
+CREATE OR REPLACE FUNCTION bookings_check_cross_partition_overlap() RETURNS trigger AS $$
+DECLARE
+    conflict bookings%ROWTYPE;
+BEGIN
+    IF current_setting('app.skip_overlap_check', true) = 'on' THEN
+        RETURN NEW;
+    END IF;
+    PERFORM pg_advisory_xact_lock(hashtext('bookings'), NEW.dock_id);
+    SELECT * INTO conflict FROM bookings
+    WHERE dock_id = NEW.dock_id AND booking_status = 'CONFIRMED' AND id <> NEW.id
+        AND booking_start < NEW.booking_end AND booking_start > NEW.booking_start - interval '{MAX_BOOKING_DURATION.total_seconds():.0f} seconds'
+        AND booking_end > NEW.booking_start
+    LIMIT 1;
+    IF FOUND THEN
+        --Same message & detail as the exclusion constraint, so callers handle both alike
+        RAISE EXCEPTION 'conflicting key value violates exclusion constraint "exclude_overlapping_confirmed_bookings_per_dock"'
+            USING ERRCODE = 'exclusion_violation', CONSTRAINT = 'exclude_overlapping_confirmed_bookings_per_dock',
+                DETAIL = format('Key (dock_id, tstzrange(booking_start, booking_end, ''[)''::text))=(%s, ["%s","%s")) conflicts with existing key (dock_id, tstzrange(booking_start, booking_end, ''[)''::text))=(%s, ["%s","%s")).',
+                    NEW.dock_id, NEW.booking_start, NEW.booking_end, conflict.dock_id, conflict.booking_start, conflict.booking_end);
+    END IF;
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql
+'''
+
+#Partitioned layout of bookings, created by flask db create --partitioned. Columns must match the Booking model.
+#The primary key includes the partition key, as Postgres requires. The model's indexes are added by flask db create
+PARTITIONED_BOOKINGS_DDL = [
+    '''
+    CREATE TABLE bookings (
+        id SERIAL NOT NULL,
+        booking_start TIMESTAMP WITH TIME ZONE NOT NULL,
+        booking_end TIMESTAMP WITH TIME ZONE NOT NULL,
+        booking_status statusenum,
+        ship_id INTEGER NOT NULL,
+        dock_id INTEGER NOT NULL,
+        PRIMARY KEY (id, booking_start),
+        FOREIGN KEY (ship_id) REFERENCES ships (id) ON DELETE RESTRICT,
+        FOREIGN KEY (dock_id) REFERENCES docks (id) ON DELETE RESTRICT
+    ) PARTITION BY RANGE (booking_start)
+    ''',
+    *booking_partition_ddl(None),
+    _BOOKINGS_CHECK_CROSS_PARTITION_OVERLAP,
+    '''
+    CREATE TRIGGER bookings_check_cross_partition_overlap
+    BEFORE INSERT OR UPDATE OF booking_start, booking_end, booking_status, dock_id ON bookings
+    FOR EACH ROW WHEN (NEW.booking_status = 'CONFIRMED')
+    EXECUTE FUNCTION bookings_check_cross_partition_overlap()
+    '''
+]
+
+BOOKING_PARTITIONS_QUERY = '''
+SELECT c.relname AS name, pg_get_expr(c.relpartbound, c.oid) AS bounds, c.reltuples::bigint AS estimated_rows
+FROM pg_inherits i
+JOIN pg_class c ON c.oid = i.inhrelid
+WHERE i.inhparent = to_regclass(:parent)
+ORDER BY c.relname
+'''
+
+def bookings_archive_ddl(partitioned:bool) -> list[str]:
+    '''Statements creating bookings_archive with the same columns as bookings. For partitioned bookings the archive is
+    partitioned too, so detached monthly partitions can be attached to it, with a default partition for moved rows
+    '''
+    if not partitioned:
+        return [f'CREATE TABLE IF NOT EXISTS {BOOKINGS_ARCHIVE_TABLE} (LIKE bookings)']
+    return [
+        f'CREATE TABLE IF NOT EXISTS {BOOKINGS_ARCHIVE_TABLE} (LIKE bookings) PARTITION BY RANGE (booking_start)',
+        f'CREATE TABLE IF NOT EXISTS {BOOKINGS_ARCHIVE_TABLE}_default PARTITION OF {BOOKINGS_ARCHIVE_TABLE} DEFAULT'
+    ]
+
+#Takes the bookings of a month out of the default partition, so the month's partition can be created, into a temporary
+#table they are inserted back from. Run with app.skip_utilisation & app.skip_overlap_check on, as the rows are unchanged
+CREATE_PARTITION_STASH = 'CREATE TEMPORARY TABLE IF NOT EXISTS bookings_partition_stash (LIKE bookings) ON COMMIT DROP'
+STASH_DEFAULT_PARTITION_ROWS = f'''
+WITH moved AS (
+    DELETE FROM {booking_partition_name(None)} WHERE booking_start >= :month_start AND booking_start < :month_end RETURNING *
+)
+INSERT INTO bookings_partition_stash SELECT * FROM moved
+'''
+RESTORE_DEFAULT_PARTITION_ROWS = '''
+WITH moved AS (DELETE FROM bookings_partition_stash RETURNING *)
+INSERT INTO bookings SELECT * FROM moved
+'''
+
+#Moves bookings starting before :before to the archive in one statement. Run with app.skip_utilisation on, so archived
+#bookings stay in utilisation reports
+ARCHIVE_BOOKINGS = f'''
+WITH moved AS (DELETE FROM bookings WHERE booking_start < :before RETURNING *)
+INSERT INTO {BOOKINGS_ARCHIVE_TABLE} SELECT * FROM moved
+'''
+
+BOOKINGS_PARTITION_DROP_DDL = [
+    f'DROP TABLE IF EXISTS {BOOKINGS_ARCHIVE_TABLE} CASCADE',
+    'DROP FUNCTION IF EXISTS bookings_check_cross_partition_overlap() CASCADE'
+]
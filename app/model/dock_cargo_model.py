@@ -1,4 +1,4 @@
-from sqlalchemy import types, ForeignKey, UniqueConstraint
+from sqlalchemy import types, ForeignKey, UniqueConstraint, Index
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.db import db
@@ -16,6 +16,8 @@ class DockCargo(db.Model):
     __tablename__ = 'dock_cargo'
     __table_args__ = (
         UniqueConstraint('cargo_type_id', 'dock_id', name='dock_cargo_unique_cargo_type_id_dock_id'),
+        #Loading a dock's cargo types, the unique constraint's index only covers lookups by cargo type
+        Index('ix_dock_cargo_dock_id', 'dock_id'),
     )
 
     id: Mapped[int] = mapped_column(types.Integer, primary_key=True)
@@ -1,4 +1,4 @@
-from sqlalchemy import types, CheckConstraint
+from sqlalchemy import types, CheckConstraint, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.db import db
@@ -17,7 +17,9 @@ class Dock(db.Model):
     __table_args__ = (
         CheckConstraint('dock_length > 0', name='check_dock_length'),
         CheckConstraint('length(dock_code) > 1', name='check_dock_code_length'),
-        CheckConstraint("regexp_like(dock_code, '^[a-zA-Z0-9]+$')", name='check_dock_code_regex')
+        CheckConstraint("regexp_like(dock_code, '^[a-zA-Z0-9]+$')", name='check_dock_code_regex'),
+        #GetAllDocks min_length filter
+        Index('ix_docks_dock_length', 'dock_length')
     )
     id: Mapped[int] = mapped_column(types.Integer, primary_key=True)
     dock_code: Mapped[str] = mapped_column(types.String(10), unique=True)
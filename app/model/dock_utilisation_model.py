@@ -0,0 +1,31 @@
+from datetime import date
+
+from sqlalchemy import types, ForeignKey, Index
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db import db
+
+class DockUtilisation(db.Model):
+    """
+    DockUtilisation model summarising booked time per dock, day, cargo type & booking status, used for utilisation reports.
+    Rows are maintained by triggers on bookings & ships, created by flask db create, and can be rebuilt from bookings
+    with flask db rebuild-utilisation.
+
+    Fields:
+        dock_id: ID of the booked dock (FK to docks)
+        day: The calendar day (in the database timezone) the booked time falls on. Bookings spanning midnight are split across days
+        cargo_type_id: Cargo type of the booked ships (FK to cargo_types)
+        booking_status: Status of the bookings, from [PENDING, CONFIRMED]
+        booked_seconds: Total booked time on the day, in seconds
+    """
+
+    __tablename__ = 'dock_utilisation_daily'
+    __table_args__ = (
+        Index('ix_dock_utilisation_daily_day', 'day'),
+    )
+
+    dock_id: Mapped[int] = mapped_column(ForeignKey('docks.id', ondelete='CASCADE'), primary_key=True)
+    day: Mapped[date] = mapped_column(types.Date, primary_key=True)
+    cargo_type_id: Mapped[int] = mapped_column(ForeignKey('cargo_types.id', ondelete='CASCADE'), primary_key=True)
+    booking_status: Mapped[str] = mapped_column(types.String(20), primary_key=True)
+    booked_seconds: Mapped[int] = mapped_column(types.BigInteger)
@@ -0,0 +1,34 @@
+from datetime import datetime
+
+from sqlalchemy import types, Index
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db import db
+
+class IdempotencyKey(db.Model):
+    """
+    IdempotencyKey model storing the response to a create request sent with an Idempotency-Key header,
+    replayed when the request is retried with the same key. Written by the idempotent decorator.
+
+    Fields:
+        idempotency_key: Primary key, the client supplied Idempotency-Key header
+        request_hash: SHA-256 of the request method, path & body, so a key reused for a different request is rejected
+        status_code: Status of the stored response. Null while the first request with the key is in progress
+        response_body: Body of the stored response
+        content_type: Content-Type of the stored response
+        created_at: The date / time the key was first used
+        expires_at: The date / time after which the key can be reused, and the row deleted by flask db purge-idempotency-keys
+    """
+
+    __tablename__ = 'idempotency_keys'
+    __table_args__ = (
+        Index('ix_idempotency_keys_expires_at', 'expires_at'),
+    )
+
+    idempotency_key: Mapped[str] = mapped_column(types.String(255), primary_key=True)
+    request_hash: Mapped[str] = mapped_column(types.String(64))
+    status_code: Mapped[int | None] = mapped_column(types.SmallInteger, nullable=True)
+    response_body: Mapped[str | None] = mapped_column(types.Text, nullable=True)
+    content_type: Mapped[str | None] = mapped_column(types.String(255), nullable=True)
+    created_at: Mapped[datetime] = mapped_column(types.DateTime(timezone=True))
+    expires_at: Mapped[datetime] = mapped_column(types.DateTime(timezone=True))
@@ -1,4 +1,4 @@
-from sqlalchemy import types, ForeignKey, UniqueConstraint, CheckConstraint
+from sqlalchemy import types, ForeignKey, UniqueConstraint, CheckConstraint, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.db import db
@@ -21,7 +21,11 @@ class Ship(db.Model):
         UniqueConstraint('ship_name', 'company_id', name='ships_unique_ship_name_company_id'),
         CheckConstraint('length(ship_name) > 3', name='check_ship_name_length'),
         CheckConstraint('ship_length > 9', name='check_ship_length'),
-        CheckConstraint('length(registration_country) > 3', name='check_registration_country_length')
+        CheckConstraint('length(registration_country) > 3', name='check_registration_country_length'),
+        #GetAllShips filters, and the FK lookup before deleting a company
+        Index('ix_ships_company_id', 'company_id'),
+        Index('ix_ships_cargo_type_id_ship_length', 'cargo_type_id', 'ship_length'),
+        Index('ix_ships_ship_length', 'ship_length')
     )
 
     id: Mapped[int] = mapped_column(types.Integer, primary_key=True)
@@ -0,0 +1,23 @@
+from datetime import datetime
+
+from sqlalchemy import types
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db import db
+
+class TableVersion(db.Model):
+    """
+    TableVersion model holding a version stamp for each table, used to answer conditional GET requests.
+    Rows are maintained by the bump_table_version trigger on every table, created by flask db create.
+
+    Fields:
+        table_name: Primary key, name of the versioned table
+        version: Value from table_version_seq, taken when the most recent write to the table committed
+        updated_at: The date / time the most recent write to the table committed
+    """
+
+    __tablename__ = 'table_versions'
+
+    table_name: Mapped[str] = mapped_column(types.String(63), primary_key=True)
+    version: Mapped[int] = mapped_column(types.BigInteger)
+    updated_at: Mapped[datetime] = mapped_column(types.DateTime(timezone=True))
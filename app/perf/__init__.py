@@ -0,0 +1,3 @@
+from .bench import run_benchmark, format_results, WORKLOADS
+from .micro import run_microbenchmarks, format_micro_results, MICROBENCHMARKS
+from .explain import run_explain, format_explain
@@ -0,0 +1,459 @@
+import json
+import re
+import sys
+from datetime import datetime, timedelta
+from http.client import HTTPConnection, HTTPException, HTTPSConnection
+from itertools import count
+from random import Random
+from threading import Thread, local
+from time import perf_counter, time
+from typing import Callable, NamedTuple
+from urllib.parse import urlsplit
+
+from flask import Flask
+from sqlalchemy import select
+
+from app.db import db
+from app.model import CargoType, Company, Dock, Ship
+from app.utils import compatibility_index
+
+try:
+    import resource
+except ImportError:
+    #Not available on Windows, peak RSS is not reported there
+    resource = None
+
+API_PREFIX = '/api/v1'
+FIXTURE_LIMIT = 1000
+_STATEMENTS_RE = re.compile(r'db;[^,]*desc="(\d+) statements"')
+
+def _base36(value:int) -> str:
+    digits = '0123456789abcdefghijklmnopqrstuvwxyz'
+    encoded = ''
+    while True:
+        value, remainder = divmod(value, 36)
+        encoded = digits[remainder] + encoded
+        if not value:
+            return encoded
+
+#Prefixes names of rows created by this process, so rows left by an interrupted run never clash with a later run
+_RUN_TOKEN = _base36(int(time()) % 36 ** 4).rjust(4, '0')
+_name_counter = count()
+
+class Sample(NamedTuple):
+    label: str
+    status: int
+    latency: float
+    statements: int | None
+    error: bool
+
+class AppClient:
+    '''Sends requests to the WSGI app in-process, through a Flask test client per thread
+    '''
+    def __init__(self, app:Flask):
+        self.app = app
+        self._local = local()
+
+    def request(self, method:str, path:str, body=None) -> tuple[int, dict, bytes]:
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+
+        response = client.open(path, method=method, json=body)
+        return response.status_code, response.headers, response.get_data()
+
+class HttpClient:
+    '''Sends requests to a running server, over a keep-alive connection per thread
+    '''
+    def __init__(self, base_url:str):
+        url = urlsplit(base_url)
+        self._connection_class = HTTPSConnection if url.scheme == 'https' else HTTPConnection
+        self._netloc = url.netloc
+        self._prefix = url.path.rstrip('/')
+        self._local = local()
+
+    def request(self, method:str, path:str, body=None) -> tuple[int, dict, bytes]:
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        payload = json.dumps(body) if body is not None else None
+
+        #Retry once on a fresh connection, in case the server closed the idle keep-alive connection
+        for attempt in range(2):
+            connection = getattr(self._local, 'connection', None)
+            if connection is None:
+                connection = self._local.connection = self._connection_class(self._netloc, timeout=60)
+            try:
+                connection.request(method, self._prefix + path, body=payload, headers=headers)
+                response = connection.getresponse()
+                return response.status, response.headers, response.read()
+            except (HTTPException, OSError):
+                connection.close()
+                self._local.connection = None
+                if attempt:
+                    raise
+
+class Fixtures:
+    '''IDs of existing rows the benchmark requests are built from, loaded once before running
+
+    Fields:
+        company_ids, cargo_type_ids, ship_ids, dock_ids: IDs of existing rows
+        booking_pairs: (ship_id, dock_id) pairs of compatible ships & docks
+        contention_dock_id: Dock targeted by the contention workload, the dock with the most compatible ships
+        contention_ship_ids: Ships compatible with the contention dock
+    '''
+    def __init__(self):
+        self.company_ids = db.session.scalars(select(Company.id).order_by(Company.id).limit(FIXTURE_LIMIT)).all()
+        self.cargo_type_ids = db.session.scalars(select(CargoType.id).order_by(CargoType.id)).all()
+        self.ship_ids = db.session.scalars(select(Ship.id).order_by(Ship.id).limit(FIXTURE_LIMIT)).all()
+        self.dock_ids = db.session.scalars(select(Dock.id).order_by(Dock.id).limit(FIXTURE_LIMIT)).all()
+
+        self.booking_pairs = []
+        ships_by_dock = {}
+        for ship_id in self.ship_ids:
+            for dock in compatibility_index.compatible_docks(ship_id) or []:
+                self.booking_pairs.append((ship_id, dock.id))
+                ships_by_dock.setdefault(dock.id, []).append(ship_id)
+
+        if not self.company_ids or not self.cargo_type_ids or not self.booking_pairs:
+            raise ValueError('The database needs companies, cargo types and compatible ships & docks to benchmark. Seed it with --scale.')
+
+        self.contention_dock_id = max(ships_by_dock, key=lambda dock_id: (len(ships_by_dock[dock_id]), -dock_id))
+        self.contention_ship_ids = ships_by_dock[self.contention_dock_id]
+
+class Worker:
+    '''State of one client thread: its random stream, recorded samples and the bookings it left behind
+
+    Bookings are created far in the future, so benchmark writes never conflict with seeded or real bookings
+    '''
+    def __init__(self, client, fixtures:Fixtures, seed:str, base_day:datetime):
+        self.client = client
+        self.fixtures = fixtures
+        self.rng = Random(seed)
+        self.base_day = base_day
+        self.samples: list[Sample] = []
+        self.created_booking_ids: list[int] = []
+        self.recording = False
+
+    def unique_name(self) -> str:
+        '''Short alphanumeric name unique across runs, for rows with unique constraints
+        '''
+        return f'{_RUN_TOKEN}{_base36(next(_name_counter))}'
+
+    def call(self, label:str, method:str, path:str, body=None, expected:tuple[int, ...]=(200,)):
+        '''Send a request, record it under the label and return the decoded JSON body (None if not JSON)
+        '''
+        start = perf_counter()
+        status, headers, data = self.client.request(method, API_PREFIX + path, body)
+        latency = perf_counter() - start
+
+        if self.recording:
+            match = _STATEMENTS_RE.search(headers.get('Server-Timing') or '')
+            statements = int(match.group(1)) if match else None
+            self.samples.append(Sample(label, status, latency, statements, status not in expected))
+
+        try:
+            return status, json.loads(data) if data else None
+        except ValueError:
+            return status, None
+
+    def booking_times(self, day_range:int, max_hours:int=4) -> tuple[str, str]:
+        start = self.base_day + timedelta(days=self.rng.randrange(day_range), hours=self.rng.randrange(0, 20))
+        end = start + timedelta(hours=self.rng.randint(1, max_hours))
+        return start.strftime(r'%Y-%m-%d %H:%M'), end.strftime(r'%Y-%m-%d %H:%M')
+
+#Read tasks, one per GET route
+def read_company(w:Worker):
+    w.call('GET /company/<id>', 'GET', f'/company/{w.rng.choice(w.fixtures.company_ids)}')
+
+def read_all_companies(w:Worker):
+    w.call('GET /company/GetAllCompanies', 'GET', '/company/GetAllCompanies?limit=100')
+
+def read_cargo_types(w:Worker):
+    w.call('GET /cargo/GetCargoTypes', 'GET', '/cargo/GetCargoTypes')
+
+def read_ship(w:Worker):
+    w.call('GET /ship/<id>', 'GET', f'/ship/{w.rng.choice(w.fixtures.ship_ids)}')
+
+def read_all_ships(w:Worker):
+    w.call('GET /ship/GetAllShips', 'GET', '/ship/GetAllShips?limit=100')
+
+def read_compatible_docks(w:Worker):
+    w.call('GET /ship/<id>/CompatibleDocks', 'GET', f'/ship/{w.rng.choice(w.fixtures.ship_ids)}/CompatibleDocks')
+
+def read_dock(w:Worker):
+    w.call('GET /dock/<id>', 'GET', f'/dock/{w.rng.choice(w.fixtures.dock_ids)}')
+
+def read_all_docks(w:Worker):
+    w.call('GET /dock/GetAllDocks', 'GET', '/dock/GetAllDocks?limit=100')
+
+def read_compatible_ships(w:Worker):
+    w.call('GET /dock/<id>/CompatibleShips', 'GET', f'/dock/{w.rng.choice(w.fixtures.dock_ids)}/CompatibleShips')
+
+def read_booking(w:Worker):
+    status, page = w.call('GET /booking/GetAllBookings', 'GET', f'/booking/GetAllBookings?dock_id={w.rng.choice(w.fixtures.dock_ids)}&limit=20')
+    if status == 200 and page['results']:
+        w.call('GET /booking/<id>', 'GET', f"/booking/{w.rng.choice(page['results'])['id']}")
+
+def read_all_bookings(w:Worker):
+    from_time = (datetime.now() + timedelta(days=w.rng.randrange(30))).strftime(r'%Y-%m-%d 00:00')
+    w.call('GET /booking/GetAllBookings', 'GET', f'/booking/GetAllBookings?from_time={from_time}&limit=100')
+
+def read_availability(w:Worker):
+    from_day = datetime.now() + timedelta(days=w.rng.randrange(30))
+    ship_id, _ = w.rng.choice(w.fixtures.booking_pairs)
+    query = f"ship_id={ship_id}&from_time={from_day:%Y-%m-%d} 00:00&to_time={from_day + timedelta(days=7):%Y-%m-%d} 00:00&duration={w.rng.randint(1, 12)}"
+    w.call('GET /booking/FindAvailability', 'GET', f'/booking/FindAvailability?{query}')
+
+#Write tasks, each creating, updating & deleting its own rows
+def write_company(w:Worker):
+    name = w.unique_name()
+    body = {
+        'company_name': f'Bench {name}',
+        'country': 'Australia',
+        'email': f'{name}@bench.example.com',
+        'phone': '+61 400 000 000',
+        'address': '1 Benchmark Street, Melbourne'
+    }
+    status, company = w.call('POST /company/CreateCompany', 'POST', '/company/CreateCompany', body, expected=(201,))
+    if status != 201:
+        return
+    w.call('PATCH /company/UpdateCompany/<id>', 'PATCH', f"/company/UpdateCompany/{company['id']}", {'phone': '+61 400 000 001'})
+    w.call('DELETE /company/DeleteCompany/<id>', 'DELETE', f"/company/DeleteCompany/{company['id']}")
+
+def write_cargo(w:Worker):
+    status, cargo = w.call('POST /cargo/CreateCargo', 'POST', '/cargo/CreateCargo', {'cargo_name': f'Bench {w.unique_name()}'}, expected=(201,))
+    if status == 201:
+        w.call('DELETE /cargo/DeleteCargo/<id>', 'DELETE', f"/cargo/DeleteCargo/{cargo['id']}")
+
+def write_dock(w:Worker):
+    cargo_type_ids = w.fixtures.cargo_type_ids
+    body = {'dock_code': f'B{w.unique_name()}', 'dock_length': w.rng.randrange(100, 400), 'cargo_types': [w.rng.choice(cargo_type_ids)]}
+    status, dock = w.call('POST /dock/CreateDock', 'POST', '/dock/CreateDock', body, expected=(201,))
+    if status != 201:
+        return
+    w.call('PATCH /dock/UpdateLength/<id>', 'PATCH', f"/dock/UpdateLength/{dock['id']}", {'dock_length': dock['dock_length'] + 10})
+    w.call('PATCH /dock/UpdateCargo/<id>', 'PATCH', f"/dock/UpdateCargo/{dock['id']}", {'cargo_types': cargo_type_ids[:2]}, expected=(200, 400))
+    w.call('DELETE /dock/DeleteDock/<id>', 'DELETE', f"/dock/DeleteDock/{dock['id']}")
+
+def write_ship(w:Worker):
+    body = {
+        'ship_name': f'Bench {w.unique_name()}',
+        'ship_length': w.rng.randrange(50, 300),
+        'registration_country': 'Australia',
+        'cargo_type_id': w.rng.choice(w.fixtures.cargo_type_ids),
+        'company_id': w.rng.choice(w.fixtures.company_ids)
+    }
+    status, ship = w.call('POST /ship/CreateShip', 'POST', '/ship/CreateShip', body, expected=(201,))
+    if status != 201:
+        return
+    w.call('PATCH /ship/UpdateShip/<id>', 'PATCH', f"/ship/UpdateShip/{ship['id']}", {'registration_country': 'New Zealand'})
+    w.call('DELETE /ship/DeleteShip/<id>', 'DELETE', f"/ship/DeleteShip/{ship['id']}")
+
+def write_booking(w:Worker):
+    ship_id, dock_id = w.rng.choice(w.fixtures.booking_pairs)
+    booking_start, booking_end = w.booking_times(365)
+    body = {'booking_start': booking_start, 'booking_end': booking_end, 'booking_status': 'PENDING', 'ship_id': ship_id, 'dock_id': dock_id}
+    status, booking = w.call('POST /booking/CreateBooking', 'POST', '/booking/CreateBooking', body, expected=(201,))
+    if status != 201:
+        return
+    #UpdateBooking validates start & end together, so both are sent
+    body = {'booking_start': booking_start, 'booking_end': booking_end[:-2] + '59'}
+    w.call('PATCH /booking/UpdateBooking/<id>', 'PATCH', f"/booking/UpdateBooking/{booking['id']}", body, expected=(200,))
+    w.call('DELETE /booking/DeleteBooking/<id>', 'DELETE', f"/booking/DeleteBooking/{booking['id']}")
+
+def write_bulk_bookings(w:Worker):
+    body = []
+    for _ in range(10):
+        ship_id, dock_id = w.rng.choice(w.fixtures.booking_pairs)
+        booking_start, booking_end = w.booking_times(365)
+        body.append({'booking_start': booking_start, 'booking_end': booking_end, 'booking_status': 'PENDING', 'ship_id': ship_id, 'dock_id': dock_id})
+
+    status, results = w.call('POST /booking/BulkCreateBookings', 'POST', '/booking/BulkCreateBookings', body, expected=(201,))
+    for result in results if status in (201, 207) else []:
+        if result['status'] == 'created':
+            w.call('DELETE /booking/DeleteBooking/<id>', 'DELETE', f"/booking/DeleteBooking/{result['booking']['id']}")
+
+#Concurrent confirmed bookings on a single dock, within two days, so requests race for the same slots
+def contend_booking(w:Worker):
+    booking_start, booking_end = w.booking_times(2)
+    body = {
+        'booking_start': booking_start,
+        'booking_end': booking_end,
+        'booking_status': 'CONFIRMED',
+        'ship_id': w.rng.choice(w.fixtures.contention_ship_ids),
+        'dock_id': w.fixtures.contention_dock_id
+    }
+    #A conflict (400) is the expected outcome for most requests
+    status, booking = w.call('POST /booking/CreateBooking (contended)', 'POST', '/booking/CreateBooking', body, expected=(201, 400))
+    if status == 201:
+        w.created_booking_ids.append(booking['id'])
+
+READ_TASKS = (
+    read_company, read_all_companies, read_cargo_types, read_ship, read_all_ships, read_compatible_docks,
+    read_dock, read_all_docks, read_compatible_ships, read_booking, read_all_bookings, read_availability
+)
+WRITE_TASKS = (write_company, write_cargo, write_dock, write_ship, write_booking, write_bulk_bookings)
+
+#Workload name: weighted tasks
+WORKLOADS: dict[str, list[tuple[int, Callable[[Worker], None]]]] = {
+    'read': [(1, task) for task in READ_TASKS],
+    'write': [(1, task) for task in WRITE_TASKS],
+    'mixed': [(9, task) for task in READ_TASKS] + [(1, task) for task in WRITE_TASKS],
+    'contention': [(1, contend_booking)]
+}
+
+def percentile(sorted_values:list[float], fraction:float) -> float:
+    '''Nearest-rank percentile of pre-sorted values
+    '''
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))]
+
+def summarise(samples:list[Sample], elapsed:float) -> dict:
+    '''Summarise samples as request count, throughput, error count, latency percentiles (ms) & statements per request
+    '''
+    latencies = sorted(sample.latency * 1000 for sample in samples)
+    statements = [sample.statements for sample in samples if sample.statements is not None]
+    statuses = {}
+    for sample in samples:
+        statuses[str(sample.status)] = statuses.get(str(sample.status), 0) + 1
+
+    return {
+        'requests': len(samples),
+        'throughput': round(len(samples) / elapsed, 2) if elapsed else 0.0,
+        'errors': sum(sample.error for sample in samples),
+        'statuses': dict(sorted(statuses.items())),
+        'latency_ms': {
+            'p50': round(percentile(latencies, 0.50), 3),
+            'p95': round(percentile(latencies, 0.95), 3),
+            'p99': round(percentile(latencies, 0.99), 3),
+            'mean': round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+            'max': round(latencies[-1], 3) if latencies else 0.0
+        },
+        'statements_per_request': round(sum(statements) / len(statements), 2) if statements else None
+    }
+
+def peak_rss_kb() -> int | None:
+    '''Peak resident set size of this process in KiB, or None where unsupported
+    '''
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    #ru_maxrss is in bytes on macOS, KiB elsewhere
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+def run_workload(name:str, client, fixtures:Fixtures, threads:int, duration:float, warmup:float, seed:int, base_day:datetime,
+                 measure_rss:bool=True) -> dict:
+    '''Run one workload from a number of client threads, recording every request after the warmup period
+
+    Args:
+        measure_rss: Report how much the workload raised this process's peak RSS (peak_rss_growth_kb). Only meaningful
+            when the app runs in-process, as otherwise this process is just the client
+
+    Returns:
+        dict: Summary of the whole workload, plus a summary per endpoint label
+    '''
+    peak_before = peak_rss_kb() if measure_rss else None
+    tasks = WORKLOADS[name]
+    weights = [weight for weight, _ in tasks]
+    functions = [task for _, task in tasks]
+    workers = [Worker(client, fixtures, f'{seed}:{name}:{i}', base_day) for i in range(threads)]
+
+    def run(worker:Worker, until:float):
+        while perf_counter() < until:
+            worker.rng.choices(functions, weights)[0](worker)
+
+    def run_all(seconds:float):
+        until = perf_counter() + seconds
+        pool = [Thread(target=run, args=(worker, until)) for worker in workers]
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+
+    if warmup > 0:
+        run_all(warmup)
+
+    for worker in workers:
+        worker.recording = True
+    started = perf_counter()
+    run_all(duration)
+    elapsed = perf_counter() - started
+
+    #Remove bookings left by the contention workload, so repeated runs start from the same state
+    for worker in workers:
+        worker.recording = False
+        for booking_id in worker.created_booking_ids:
+            client.request('DELETE', f'{API_PREFIX}/booking/DeleteBooking/{booking_id}')
+
+    samples = [sample for worker in workers for sample in worker.samples]
+    by_label = {}
+    for sample in samples:
+        by_label.setdefault(sample.label, []).append(sample)
+
+    summary = summarise(samples, elapsed)
+    summary['duration_s'] = round(elapsed, 3)
+    if peak_before is not None:
+        #The peak only ever grows, so this is the memory the workload needed beyond earlier workloads' high-water mark
+        summary['peak_rss_growth_kb'] = peak_rss_kb() - peak_before
+    summary['endpoints'] = {label: summarise(by_label[label], elapsed) for label in sorted(by_label)}
+    return summary
+
+def run_benchmark(app:Flask, workloads:list[str], threads:int, duration:float, warmup:float, seed:int, base_url:str | None=None) -> dict:
+    '''Run each workload in turn against the app (in-process) or a running server at base_url
+
+    Must be called within an app context, used to load fixtures from the database.
+
+    Returns:
+        dict: JSON serialisable results, with the run configuration under 'config' and each workload's summary under 'workloads'
+    '''
+    fixtures = Fixtures()
+    client = HttpClient(base_url) if base_url else AppClient(app)
+    #Start benchmark bookings two years out, clear of real & seeded bookings
+    base_day = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=730)
+
+    results = {
+        'config': {
+            'started_at': datetime.now().isoformat(timespec='seconds'),
+            'target': base_url or 'in-process',
+            'threads': threads,
+            'duration_s': duration,
+            'warmup_s': warmup,
+            'seed': seed,
+            'python': sys.version.split()[0],
+            'fixtures': {
+                'companies': len(fixtures.company_ids),
+                'ships': len(fixtures.ship_ids),
+                'docks': len(fixtures.dock_ids),
+                'contention_dock_id': fixtures.contention_dock_id
+            }
+        },
+        'workloads': {}
+    }
+    for name in workloads:
+        results['workloads'][name] = run_workload(name, client, fixtures, threads, duration, warmup, seed, base_day, measure_rss=not base_url)
+
+    #Against a running server, this process only holds the client threads, so its memory says nothing of the server's
+    results['client_peak_rss_kb' if base_url else 'peak_rss_kb'] = peak_rss_kb()
+    return results
+
+def format_results(results:dict) -> str:
+    '''Format benchmark results as a plain text table per workload
+    '''
+    lines = []
+    for name, summary in results['workloads'].items():
+        lines.append(
+            f"{name}: {summary['requests']} requests in {summary['duration_s']}s, {summary['throughput']} req/s, "
+            f"{summary['errors']} errors, p50 {summary['latency_ms']['p50']}ms, p95 {summary['latency_ms']['p95']}ms, "
+            f"p99 {summary['latency_ms']['p99']}ms"
+            + (f", peak RSS +{summary['peak_rss_growth_kb']} KiB" if 'peak_rss_growth_kb' in summary else '')
+        )
+        lines.append(f"  {'endpoint':<48}{'count':>8}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'stmts':>8}")
+        for label, endpoint in summary['endpoints'].items():
+            latency = endpoint['latency_ms']
+            statements = endpoint['statements_per_request']
+            lines.append(
+                f"  {label:<48}{endpoint['requests']:>8}{endpoint['errors']:>8}{latency['p50']:>10}{latency['p95']:>10}"
+                f"{latency['p99']:>10}{statements if statements is not None else '-':>8}"
+            )
+        lines.append('')
+    return '\n'.join(lines)
@@ -0,0 +1,192 @@
+import re
+from datetime import timedelta
+
+from flask import Flask
+from sqlalchemy import Engine, event, inspect, select
+
+from app.db import db
+from app.model import Booking, CargoType, Company, Dock, Ship
+from app.perf.bench import API_PREFIX
+
+EXPLAIN_PREFIX = 'EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) '
+_IDENTIFIER_RE = re.compile(r'[a-z_][a-z0-9_]*')
+#Monthly & default partitions of a partitioned table (flask db create --partitioned), reported under the parent table
+_PARTITION_RE = re.compile(r'(.+)_(?:y\d{4}m\d{2}|default)')
+
+def explain_cases() -> list[tuple[str, object]]:
+    '''Representative requests for each GET route & filter, built from existing rows, plus the foreign key
+    lookups made by the delete routes (as statements, so nothing is deleted)
+
+    Returns:
+        list[tuple]: (label, request path or select statement)
+    '''
+    company_id = db.session.scalar(select(Company.id).order_by(Company.id).limit(1))
+    cargo_type_id = db.session.scalar(select(CargoType.id).order_by(CargoType.id).limit(1))
+    dock = db.session.scalars(select(Dock).order_by(Dock.id).limit(1)).first()
+    booking = db.session.scalars(select(Booking).order_by(Booking.id).limit(1)).first()
+
+    if company_id is None or cargo_type_id is None or dock is None or booking is None:
+        raise ValueError('The database needs companies, cargo types, docks and bookings to explain. Seed it with flask db seed.')
+
+    ship = db.session.get(Ship, booking.ship_id)
+    day = booking.booking_start.replace(hour=0, minute=0, second=0, microsecond=0)
+    from_time = f'{day:%Y-%m-%d %H:%M}'
+    to_time = f'{day + timedelta(days=7):%Y-%m-%d %H:%M}'
+
+    return [
+        ('GET /company/<id>', f'/company/{company_id}'),
+        ('GET /company/GetAllCompanies', '/company/GetAllCompanies?limit=100'),
+        ('GET /cargo/GetCargoTypes', '/cargo/GetCargoTypes'),
+        ('GET /ship/<id>', f'/ship/{ship.id}'),
+        ('GET /ship/GetAllShips?company_id', f'/ship/GetAllShips?company_id={company_id}&limit=100'),
+        ('GET /ship/GetAllShips?cargo_type_id&min_length', f'/ship/GetAllShips?cargo_type_id={ship.cargo_type_id}&min_length={ship.ship_length}&limit=100'),
+        ('GET /ship/GetAllShips?min_length&max_length', f'/ship/GetAllShips?min_length={ship.ship_length}&max_length={ship.ship_length + 10}&limit=100'),
+        ('GET /dock/<id>', f'/dock/{dock.id}?bookings_from={from_time}'),
+        ('GET /dock/GetAllDocks?min_length', f'/dock/GetAllDocks?min_length={dock.dock_length}&limit=100'),
+        ('GET /dock/GetAllDocks?cargo_type', f'/dock/GetAllDocks?cargo_type={cargo_type_id}&limit=100'),
+        ('GET /dock/Utilisation', f'/dock/Utilisation?from={day:%Y-%m-%d}&group_by=week'),
+        ('GET /booking/<id>', f'/booking/{booking.id}'),
+        ('GET /booking/GetAllBookings?ship_id', f'/booking/GetAllBookings?ship_id={booking.ship_id}&limit=100'),
+        ('GET /booking/GetAllBookings?dock_id', f'/booking/GetAllBookings?dock_id={booking.dock_id}&limit=100'),
+        ('GET /booking/GetAllBookings?status', '/booking/GetAllBookings?status=PENDING&limit=100'),
+        ('GET /booking/GetAllBookings?from_time', f'/booking/GetAllBookings?from_time={from_time}&limit=100'),
+        ('GET /booking/GetAllBookings?from_time&to_time', f'/booking/GetAllBookings?from_time={from_time}&to_time={to_time}&limit=100'),
+        ('GET /booking/FindAvailability', f'/booking/FindAvailability?ship_id={ship.id}&from_time={from_time}&to_time={to_time}&duration=4'),
+        ('DELETE /ship/DeleteShip/<id> booking check', select(Booking).where(Booking.ship_id == ship.id)),
+        ('DELETE /company/DeleteCompany/<id> ship check', select(Ship).where(Ship.company_id == company_id)),
+        ('DELETE /dock/DeleteDock/<id> booking check', select(Booking).where(Booking.dock_id == dock.id))
+    ]
+
+def _captured_statements(app:Flask, path:str) -> list[tuple[str, object]]:
+    '''Send a GET request through the app and capture the SELECT statements it runs, except table_versions lookups
+    '''
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT') and 'table_versions' not in statement:
+            statements.append((statement, parameters))
+
+    event.listen(Engine, 'before_cursor_execute', capture)
+    try:
+        response = app.test_client().get(API_PREFIX + path)
+    finally:
+        event.remove(Engine, 'before_cursor_execute', capture)
+
+    if response.status_code != 200:
+        raise ValueError(f'GET {path} returned {response.status_code}: {response.get_data(as_text=True)[:200]}')
+    return statements
+
+def _plan_nodes(plan:dict):
+    yield plan
+    for child in plan.get('Plans', []):
+        yield from _plan_nodes(child)
+
+def _table_indexes(table_name:str) -> list[tuple[str, list[str]]]:
+    '''Get the (name, columns) of each index in the database on a table, including primary key & unique constraints
+    '''
+    inspector = inspect(db.engine)
+    indexes = [(index['name'], index['column_names']) for index in inspector.get_indexes(table_name)]
+    primary_key = inspector.get_pk_constraint(table_name)
+    if primary_key['constrained_columns']:
+        indexes.append((primary_key['name'], primary_key['constrained_columns']))
+    indexes += [(constraint['name'], constraint['column_names']) for constraint in inspector.get_unique_constraints(table_name)]
+    return indexes
+
+def _seq_scan_warning(node:dict, min_rows:int) -> str | None:
+    '''Describe a filtered sequential scan reading at least min_rows rows, suggesting an index on the filtered columns
+    '''
+    table_name = node.get('Relation Name')
+    if table_name not in db.metadata.tables and (partition := _PARTITION_RE.fullmatch(table_name or '')):
+        table_name = partition.group(1)
+    condition = node.get('Filter')
+    rows_read = round((node.get('Actual Rows', 0) + node.get('Rows Removed by Filter', 0)) * node.get('Actual Loops', 1))
+
+    if node['Node Type'] != 'Seq Scan' or not condition or rows_read < min_rows or table_name not in db.metadata.tables:
+        return None
+
+    table_columns = db.metadata.tables[table_name].columns
+    columns = list(dict.fromkeys(name for name in _IDENTIFIER_RE.findall(condition) if name in table_columns))
+    message = f'Seq Scan on {table_name} read {rows_read} rows, filter {condition}.'
+
+    indexed = [name for name, index_columns in _table_indexes(table_name) if index_columns and index_columns[0] in columns]
+    if indexed:
+        return f"{message} Index {', '.join(indexed)} exists but was not used: check the filter's selectivity & ANALYZE statistics"
+    if columns:
+        return f"{message} Missing index: consider CREATE INDEX ON {table_name} ({', '.join(columns)})"
+    return message
+
+def _explain(statement:str, parameters, min_rows:int) -> dict:
+    cursor = db.session.connection().connection.cursor()
+    cursor.execute(EXPLAIN_PREFIX + statement, parameters)
+    [result] = cursor.fetchone()[0]
+    plan = result['Plan']
+    nodes = list(_plan_nodes(plan))
+
+    return {
+        'statement': ' '.join(statement.split()),
+        'execution_ms': round(result['Execution Time'], 3),
+        'shared_hit_blocks': plan.get('Shared Hit Blocks', 0),
+        'shared_read_blocks': plan.get('Shared Read Blocks', 0),
+        'scans': [
+            ' '.join(filter(None, (node['Node Type'], f"using {node['Index Name']}" if 'Index Name' in node else None,
+                                   f"on {node['Relation Name']}" if 'Relation Name' in node else None)))
+            for node in nodes if 'Relation Name' in node
+        ],
+        'warnings': [warning for node in nodes if (warning := _seq_scan_warning(node, min_rows))]
+    }
+
+def missing_declared_indexes() -> list[str]:
+    '''Get the names of indexes declared on the models that don't exist in the database, e.g. as the tables
+    were created by an older version (flask db create adds them)
+    '''
+    inspector = inspect(db.engine)
+    missing = []
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        missing += [index.name for index in table.indexes if index.name not in existing]
+    return missing
+
+def run_explain(app:Flask, min_rows:int=1000) -> dict:
+    '''Run EXPLAIN (ANALYZE, BUFFERS) on every statement of each explain_cases request against the current data
+
+    Statements are executed by EXPLAIN ANALYZE, so only read-only requests & statements are explained.
+
+    Args:
+        app: The Flask app the requests are sent to
+        min_rows: Sequential scans with a filter reading at least this many rows are flagged
+
+    Returns:
+        dict: cases - label: list of explained statements (execution_ms, buffers, scans & warnings),
+            missing_indexes - declared indexes missing from the database
+    '''
+    cases = {}
+    for label, case in explain_cases():
+        if isinstance(case, str):
+            statements = _captured_statements(app, case)
+        else:
+            compiled = case.compile(dialect=db.engine.dialect)
+            statements = [(compiled.string, compiled.params)]
+
+        cases[label] = [_explain(statement, parameters, min_rows) for statement, parameters in statements]
+        db.session.rollback()
+
+    return {'cases': cases, 'missing_indexes': missing_declared_indexes()}
+
+def format_explain(results:dict) -> str:
+    '''Format explain results as plain text, with flagged scans marked !
+    '''
+    lines = []
+    for label, statements in results['cases'].items():
+        lines.append(f'{label} ({len(statements)} statements)')
+        for explained in statements:
+            lines.append(
+                f"  {explained['execution_ms']:>9.3f} ms  hit {explained['shared_hit_blocks']:>6}  read {explained['shared_read_blocks']:>6}  "
+                + ('; '.join(explained['scans']) or 'no table scans')
+            )
+            lines += [f'  ! {warning}' for warning in explained['warnings']]
+
+    if results['missing_indexes']:
+        lines.append(f"Declared indexes missing from the database (run flask db create): {', '.join(results['missing_indexes'])}")
+    return '\n'.join(lines)
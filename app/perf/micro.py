@@ -0,0 +1,147 @@
+import gc
+import sys
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from timeit import Timer
+from typing import Callable
+
+from app.model import Booking, CargoType, Company, Dock, Ship
+from app.model.booking_model import StatusEnum
+from app.schemas import booking_schema, bookings_schema, company_schema, dock_cargos_schema
+from app.schemas.fast_dump import marshmallow_dump
+
+def _booking_objects(rows:int) -> list[Booking]:
+    '''Build fixed transient bookings with their nested ship (company, cargo type) and dock (cargo types),
+    as loaded for GetAllBookings. Times are timezone aware, as returned by the database
+    '''
+    cargo_types = [CargoType(id=i, cargo_name=f'Cargo {i}') for i in range(1, 6)]
+    companies = [
+        Company(id=i, company_name=f'Company {i}', country='Australia', email=f'contact@company{i}.com', phone='+61 400 000 000',
+                address=f'{i} Harbour Road, Melbourne')
+        for i in range(1, 11)
+    ]
+    ships = [
+        Ship(id=i, ship_name=f'Ship {i}', ship_length=100 + i, registration_country='Australia',
+             cargo_type=cargo_types[i % 5], company=companies[i % 10])
+        for i in range(1, 51)
+    ]
+    docks = [Dock(id=i, dock_code=f'D{i}', dock_length=300, cargo_types=cargo_types[i % 5:i % 5 + 2]) for i in range(1, 21)]
+
+    start = datetime(2030, 1, 1, tzinfo=timezone.utc)
+    return [
+        Booking(
+            id=i,
+            booking_start=start + timedelta(hours=i),
+            booking_end=start + timedelta(hours=i + 4),
+            booking_status=StatusEnum.CONFIRMED if i % 3 else StatusEnum.PENDING,
+            ship=ships[i % 50],
+            dock=docks[i % 20]
+        )
+        for i in range(1, rows + 1)
+    ]
+
+def dump_fixtures(rows:int=100) -> dict[type, list]:
+    '''Build transient objects of every dumped model, linked as when loaded from the database: the bookings of
+    _booking_objects, with their ships, docks, companies & cargo types. Used to check the compiled serialisers
+    without a database
+
+    Returns:
+        dict[type, list]: Model: its objects, ordered by ID
+    '''
+    bookings = _booking_objects(rows)
+    ships = {booking.ship for booking in bookings}
+    docks = {booking.dock for booking in bookings}
+    companies = {ship.company for ship in ships}
+    cargo_types = {ship.cargo_type for ship in ships} | {cargo_type for dock in docks for cargo_type in dock.cargo_types}
+
+    objects = {Booking: bookings, Ship: ships, Dock: docks, Company: companies, CargoType: cargo_types}
+    return {model: sorted(objs, key=lambda obj: obj.id) for model, objs in objects.items()}
+
+def _booking_load() -> Callable:
+    #Times as passed to the schema by the booking routes, after parsing the request strings
+    start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=30)
+    data = {'booking_start': start, 'booking_end': start + timedelta(hours=6), 'booking_status': 'CONFIRMED', 'ship_id': 1, 'dock_id': 1}
+    return lambda: booking_schema.load(data, transient=True)
+
+def _bookings_dump(rows:int) -> Callable:
+    bookings = _booking_objects(rows)
+    return lambda: bookings_schema.dump(bookings)
+
+def _bookings_dump_marshmallow(rows:int) -> Callable:
+    bookings = _booking_objects(rows)
+    return lambda: marshmallow_dump(bookings_schema, bookings, many=True)
+
+def _company_load() -> Callable:
+    data = {
+        'company_name': 'Benchmark Shipping',
+        'country': 'Australia',
+        'email': 'contact@benchmark-shipping.com',
+        'phone': '+61 (03) 9000 0000',
+        'address': '1 Benchmark Street, Melbourne 3000 VIC'
+    }
+    return lambda: company_schema.load(data, transient=True)
+
+def _dock_cargos_load() -> Callable:
+    data = [{'cargo_type_id': cargo_type_id, 'dock_id': 1} for cargo_type_id in range(1, 6)]
+    return lambda: dock_cargos_schema.load(data, many=True, transient=True)
+
+#Benchmark name: function building the callable to time, given the number of rows for dump benchmarks
+MICROBENCHMARKS: dict[str, Callable[[int], Callable]] = {
+    'booking_schema.load': lambda rows: _booking_load(),
+    'bookings_schema.dump': _bookings_dump,
+    'bookings_schema.dump (marshmallow)': _bookings_dump_marshmallow,
+    'company_schema.load': lambda rows: _company_load(),
+    'dock_cargos_schema.load': lambda rows: _dock_cargos_load()
+}
+
+def _allocations(func:Callable) -> tuple[int, int]:
+    '''Measure a single call's peak traced memory (bytes) and the number of memory blocks still allocated by its result
+    '''
+    gc.collect()
+    tracemalloc.start()
+    try:
+        blocks_before = sys.getallocatedblocks()
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        result = func()
+        peak = tracemalloc.get_traced_memory()[1] - baseline
+        blocks = sys.getallocatedblocks() - blocks_before
+        del result
+    finally:
+        tracemalloc.stop()
+    return peak, blocks
+
+def run_microbenchmarks(names:list[str], rows:int=100, repeat:int=5) -> dict:
+    '''Time each benchmark with timeit, reporting the best of repeat runs, and measure its allocations per call
+
+    Returns:
+        dict: Benchmark name: ops_per_sec, usec_per_op, peak_alloc_bytes & retained_blocks per call
+    '''
+    results = {}
+    for name in names:
+        func = MICROBENCHMARKS[name](rows)
+        func()
+
+        timer = Timer(func)
+        number, _ = timer.autorange()
+        best = min(timer.repeat(repeat=repeat, number=number)) / number
+        peak, blocks = _allocations(func)
+
+        results[name] = {
+            'ops_per_sec': round(1 / best, 1),
+            'usec_per_op': round(best * 1_000_000, 3),
+            'peak_alloc_bytes': peak,
+            'retained_blocks': blocks
+        }
+    return results
+
+def format_micro_results(results:dict) -> str:
+    '''Format microbenchmark results as a plain text table
+    '''
+    lines = [f"{'benchmark':<38}{'ops/sec':>14}{'usec/op':>12}{'peak bytes':>14}{'blocks':>10}"]
+    for name, result in results.items():
+        lines.append(
+            f"{name:<38}{result['ops_per_sec']:>14}{result['usec_per_op']:>12}"
+            f"{result['peak_alloc_bytes']:>14}{result['retained_blocks']:>10}"
+        )
+    return '\n'.join(lines)
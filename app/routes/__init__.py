@@ -5,6 +5,8 @@ from .cargo_routes import cargo_route_bp
 from .ship_routes import ship_route_bp
 from .dock_routes import dock_route_bp
 from .booking_routes import booking_route_bp
+from .health_routes import health_bp
+from .metrics_routes import metrics_bp
 
 routes_bp = Blueprint('routes', __name__, url_prefix='/api/v1')
 
@@ -1,39 +1,56 @@
 from datetime import datetime, timedelta
+from itertools import groupby
 from re import search as search_re
 
 from flask import Blueprint, request, jsonify
-from sqlalchemy import select
+from sqlalchemy import func, insert, select, tuple_, update
+from sqlalchemy.orm import aliased
 from sqlalchemy.exc import IntegrityError
+from marshmallow import ValidationError
 from psycopg2 import errorcodes
 
-from app.schemas import booking_schema, bookings_schema
-from app.model import Booking, Ship, Dock
+from app.schemas import booking_schema, bookings_schema, bookings_summary_schema
+from app.model import Booking, Ship, Dock, DockCargo
+from app.model.booking_model import StatusEnum, booking_period, MAX_BOOKING_DURATION
 from app.db import db
 from app.errors import PathParamError, BodyError, QueryParamError
+from app.utils import (
+    schema_loader_options,
+    paginate,
+    paginated_response,
+    wants_stream,
+    ndjson_response,
+    free_gaps,
+    max_weight_schedule,
+    allocate_docks,
+    solver_pool,
+    booking_index,
+    compatibility_index,
+    conditional_get,
+    varies_by_day,
+    schema_tables,
+    sparse_schema,
+    record_booking_conflict,
+    idempotent,
+    after_commit
+)
 
 booking_route_bp = Blueprint('booking_routes', __name__, url_prefix='/booking')
 
-@booking_route_bp.route('/CreateBooking', methods=('POST',))
-def create_booking():
-    '''Create a new booking. One of booking_duration or booking_end must be supplied
-
-    Body data (JSON):
-        booking_start (datetime): The date / time of the start of the booking. FORMAT: (YYYY-MM-DD HH:MM)
-        OPTIONAL: booking_duration (int): The duration (in hours) of the booking
-        OPTIONAL: booking_end (datetime): The date / time of the end of the booking. FORMAT: (YYYY-MM-DD HH:MM)
-        booking_status (str): The current status of the booking, from [PENDING, CONFIRMED]
-        ship_id (int): ID of the ship this booking is for
-        dock_id (int): ID of the dock this booking is for
-    '''
+#Keyset used to order & paginate GetAllBookings, backed by index ix_bookings_booking_start_id
+BOOKING_PAGE_KEYS = (Booking.booking_start, Booking.id)
 
-    data = request.get_json()
-
-    #Check ship & dock exist, and that lengths & cargo types are compatible. Must be done at controller level as requires db call
-    ship_id = data.get('ship_id')
-    dock_id = data.get('dock_id')
-    ship = db.session.get(Ship, ship_id)
-    dock = db.session.get(Dock, dock_id)
+#Maximum number of bookings accepted by a single BulkCreateBookings request
+MAX_BULK_BOOKINGS = 1000
+#Maximum number of requests accepted by a single AutoAllocate call
+MAX_ALLOCATION_REQUESTS = 5000
+#Maximum number of slots returned by FindAvailability
+MAX_AVAILABILITY_SLOTS = 200
 
+def _check_ship_dock_compatible(ship:Ship | None, dock:Dock | None, ship_id, dock_id):
+    '''Check ship & dock exist, and that lengths & cargo types are compatible. Raises BodyError if not
+    Must be done at controller level as requires db call
+    '''
     if not ship:
         raise BodyError(f'No ship found with supplied ID: {ship_id}')
     if not dock:
@@ -42,13 +59,23 @@ def create_booking():
     if ship.ship_length > dock.dock_length:
         raise BodyError(f'Ship length ({ship.ship_length}m) exceeds dock length ({dock.dock_length}m). Unable to create booking')
     
+    #Answered from the compatibility cache, checked against the table versions in this request.
+    #Rejections are double checked against the database, in case the cache has no entry for a brand new dock
+    if compatibility_index.dock_accepts(dock.id, ship.cargo_type_id):
+        return
+
     dock_cargo_ids = [dock_obj.id for dock_obj in dock.cargo_types]
 
     if ship.cargo_type_id not in dock_cargo_ids:
         dock_cargo_names = [f"'{dock_obj.cargo_name}'" for dock_obj in dock.cargo_types]
         raise BodyError(f"Dock '{dock.dock_code}' cannot accept cargo of type '{ship.cargo_type.cargo_name}'. Accepts: {', '.join(dock_cargo_names)}")
-    
-    #Process start/end datetime
+
+    #Dock does accept the cargo type, so the cache is out of date
+    compatibility_index.invalidate()
+
+def _process_booking_times(data:dict) -> dict:
+    '''Replace booking_start & booking_end / booking_duration strings in booking body data with start & end datetimes
+    '''
     start_str = data.pop('booking_start', None)
     end_str = data.pop('booking_end', None)
     duration = data.pop('booking_duration', None)
@@ -62,16 +89,116 @@ def create_booking():
     if end_str and duration:
         raise BodyError('Conflicting information supplied. Only one of booking_duration, booking_end can be supplied.')
 
-    start_datetime = datetime.strptime(start_str, r'%Y-%m-%d %H:%M')
-    end_datetime = start_datetime + timedelta(hours=duration) if duration \
-        else datetime.strptime(end_str, r'%Y-%m-%d %H:%M')
+    try:
+        start_datetime = datetime.strptime(start_str, r'%Y-%m-%d %H:%M')
+        end_datetime = start_datetime + timedelta(hours=duration) if duration \
+            else datetime.strptime(end_str, r'%Y-%m-%d %H:%M')
+    except (ValueError, TypeError):
+        raise BodyError('Invalid input supplied. booking_start and booking_end must match format: YYYY-MM-DD HH:MM, booking_duration must be an integer.')
 
     data['booking_start'] = start_datetime
     data['booking_end'] = end_datetime
 
+    return data
+
+def _find_conflicting_bookings(booking:Booking) -> list[Booking]:
+    '''Get the confirmed bookings on the same dock whose times overlap the supplied booking
+    '''
+    stmt = select(Booking).where(
+        (Booking.dock_id == booking.dock_id)
+        & (Booking.booking_status == 'CONFIRMED')
+        & (Booking.booking_start < booking.booking_end)
+        & (Booking.booking_end > booking.booking_start)
+        & (Booking.booking_start > booking.booking_start - MAX_BOOKING_DURATION)
+    ).order_by(Booking.booking_start)
+
+    if booking.id:
+        stmt = stmt.where(Booking.id != booking.id)
+
+    return db.session.scalars(stmt).all()
+
+def _is_confirmed(status) -> bool:
+    '''Check a booking status, which may be the loaded string or the StatusEnum read from the database
+    '''
+    return status in ('CONFIRMED', StatusEnum.CONFIRMED)
+
+def _index_conflicts_message(dock_id:int, start:datetime, end:datetime, ignore_id:int | None=None) -> str | None:
+    '''Check the in-process booking index for confirmed bookings overlapping a proposed confirmed booking
+
+    Index hits are double checked against the database before rejecting, as another worker may have deleted, moved or
+    unconfirmed them since the dock was indexed. Misses are left to the exclusion constraint.
+
+    Returns:
+        str | None: Description of every overlapping booking, or None if no conflict is confirmed
+    '''
+    conflicts = booking_index.overlaps(dock_id, start, end, ignore_id=ignore_id)
+    if not conflicts:
+        return None
+
+    stmt = select(Booking.id, Booking.booking_start, Booking.booking_end).where(
+        Booking.id.in_([booking_id for booking_id, _, _ in conflicts])
+        & (Booking.dock_id == dock_id)
+        & (Booking.booking_status == 'CONFIRMED')
+        & (Booking.booking_start < end)
+        & (Booking.booking_end > start)
+        & (Booking.booking_start > start - MAX_BOOKING_DURATION)
+    ).order_by(Booking.booking_start)
+    #The booking being created or updated is flushed by the route's commit, where conflicts are handled
+    with db.session.no_autoflush:
+        confirmed = db.session.execute(stmt).all()
+
+    if len(confirmed) < len(conflicts):
+        #The index is out of date for this dock
+        booking_index.invalidate(dock_id)
+    if not confirmed:
+        return None
+
+    return ', '.join(
+        f"ID {booking_id} from {conflict_start.strftime(r'%Y-%m-%d %H:%M')} to {conflict_end.strftime(r'%Y-%m-%d %H:%M')}"
+        for booking_id, conflict_start, conflict_end in confirmed
+    )
+
+def _sync_booking_index(booking:Booking):
+    '''Update the in-process booking index once a booking's changes are committed
+    '''
+    if _is_confirmed(booking.booking_status):
+        after_commit(booking_index.add, booking.dock_id, booking.id, booking.booking_start, booking.booking_end)
+    else:
+        after_commit(booking_index.remove, booking.dock_id, booking.id)
+
+@booking_route_bp.route('/CreateBooking', methods=('POST',))
+@idempotent
+def create_booking():
+    '''Create a new booking. One of booking_duration or booking_end must be supplied
+
+    Body data (JSON):
+        booking_start (datetime): The date / time of the start of the booking. FORMAT: (YYYY-MM-DD HH:MM)
+        OPTIONAL: booking_duration (int): The duration (in hours) of the booking
+        OPTIONAL: booking_end (datetime): The date / time of the end of the booking. FORMAT: (YYYY-MM-DD HH:MM)
+        booking_status (str): The current status of the booking, from [PENDING, CONFIRMED]
+        ship_id (int): ID of the ship this booking is for
+        dock_id (int): ID of the dock this booking is for
+    '''
+
+    data = request.get_json()
+
+    ship_id = data.get('ship_id')
+    dock_id = data.get('dock_id')
+    ship = db.session.get(Ship, ship_id)
+    dock = db.session.get(Dock, dock_id)
+
+    _check_ship_dock_compatible(ship, dock, ship_id, dock_id)
+    data = _process_booking_times(data)
 
     #Load new booking
     new_booking = booking_schema.load(data, session=db.session)
+
+    #Reject conflicts already known to this worker without a round trip to the database
+    if _is_confirmed(new_booking.booking_status):
+        conflicts = _index_conflicts_message(new_booking.dock_id, new_booking.booking_start, new_booking.booking_end)
+        if conflicts:
+            record_booking_conflict('index')
+            raise BodyError(f'Unable to create booking. Booking conflicts with existing bookings for this dock: {conflicts}.')
     
     try:
         db.session.add(new_booking)
@@ -82,29 +209,177 @@ def create_booking():
         if e.orig.pgcode != errorcodes.EXCLUSION_VIOLATION:
             raise e
 
+        record_booking_conflict('database')
+        #The index missed a conflict written by another worker, reload it on next use
+        after_commit(booking_index.invalidate, dock_id)
+
         current_booking_start = search_re(r'conflicts with existing key.*?=\(\d+, \["(.+?)","(.+?)"', e.orig.pgerror).group(1)
         current_booking_end = search_re(r'conflicts with existing key.*?=\(\d+, \["(.+?)","(.+?)"', e.orig.pgerror).group(2)
         raise BodyError(f'Unable to create booking. Booking conflicts with existing booking for this dock from {current_booking_start} to {current_booking_end}.')
     
+    _sync_booking_index(new_booking)
+
     result = booking_schema.dump(new_booking)
     return jsonify(result), 201
 
+@booking_route_bp.route('/BulkCreateBookings', methods=('POST',))
+@idempotent
+def bulk_create_bookings():
+    '''Create many bookings in a single request. Each booking is created independently, with a result returned per item
+
+    Ships & docks for the whole batch are fetched in one query each, and every booking is inserted in its own savepoint,
+    so a failed or conflicting booking does not prevent the rest of the batch from being created.
+    Responds 201 if every booking was created, otherwise 207 with the per item results.
+
+    Body data (JSON array, max 1000 items). Each item accepts the same fields as CreateBooking:
+        booking_start (datetime): The date / time of the start of the booking. FORMAT: (YYYY-MM-DD HH:MM)
+        OPTIONAL: booking_duration (int): The duration (in hours) of the booking
+        OPTIONAL: booking_end (datetime): The date / time of the end of the booking. FORMAT: (YYYY-MM-DD HH:MM)
+        booking_status (str): The current status of the booking, from [PENDING, CONFIRMED]
+        ship_id (int): ID of the ship this booking is for
+        dock_id (int): ID of the dock this booking is for
+
+    Response items:
+        index (int): Position of the item in the request array
+        status (str): One of created, conflict, error
+        booking (Booking): The created booking (status created)
+        conflicts_with (list[Booking]): Existing confirmed bookings that overlap this booking (status conflict)
+        message (str | dict): Reason the booking was not created (status conflict, error)
+    '''
+    data = request.get_json()
+
+    if not isinstance(data, list) or not data:
+        raise BodyError('Request body must be a non-empty array of bookings.')
+    if len(data) > MAX_BULK_BOOKINGS:
+        raise BodyError(f'A maximum of {MAX_BULK_BOOKINGS} bookings can be created per request.')
+    
+    items = [item if isinstance(item, dict) else {} for item in data]
+
+    #Fetch every referenced ship & dock up front, eager loading everything needed for validation & the response dump
+    ship_ids = {item.get('ship_id') for item in items if isinstance(item.get('ship_id'), int)}
+    dock_ids = {item.get('dock_id') for item in items if isinstance(item.get('dock_id'), int)}
+
+    ship_stmt = select(Ship).where(Ship.id.in_(ship_ids)) \
+        .options(*schema_loader_options(Ship, booking_schema.dump_fields['ship'].schema))
+    dock_stmt = select(Dock).where(Dock.id.in_(dock_ids)) \
+        .options(*schema_loader_options(Dock, booking_schema.dump_fields['dock'].schema))
+
+    ships = {ship.id: ship for ship in db.session.scalars(ship_stmt)}
+    docks = {dock.id: dock for dock in db.session.scalars(dock_stmt)}
+
+    results = []
+    for index, item in enumerate(items):
+        ship_id = item.get('ship_id')
+        dock_id = item.get('dock_id')
+
+        try:
+            _check_ship_dock_compatible(ships.get(ship_id), docks.get(dock_id), ship_id, dock_id)
+            new_booking = booking_schema.load(_process_booking_times(dict(item)), session=db.session)
+        except BodyError as e:
+            results.append({'index': index, 'status': 'error', 'message': e.message})
+            continue
+        except ValidationError as e:
+            results.append({'index': index, 'status': 'error', 'message': e.messages})
+            continue
+
+        try:
+            with db.session.begin_nested():
+                db.session.add(new_booking)
+        except IntegrityError as e:
+            if e.orig.pgcode != errorcodes.EXCLUSION_VIOLATION:
+                results.append({'index': index, 'status': 'error', 'message': e.orig.diag.message_primary})
+                continue
+
+            record_booking_conflict('database')
+            results.append({
+                'index': index,
+                'status': 'conflict',
+                'message': 'Unable to create booking. Booking conflicts with existing booking for this dock.',
+                'conflicts_with': bookings_summary_schema.dump(_find_conflicting_bookings(new_booking))
+            })
+            continue
+
+        #Store the new booking's id until the batch is committed & reloaded
+        results.append({'index': index, 'status': 'created', 'booking': new_booking.id})
+
+    db.session.commit()
+    after_commit(booking_index.invalidate, *dock_ids)
+
+    #Reload the committed bookings in a single query, rather than refreshing each expired booking as it is dumped
+    created_ids = [result['booking'] for result in results if result['status'] == 'created']
+    stmt = select(Booking).where(Booking.id.in_(created_ids)).options(*schema_loader_options(Booking, bookings_schema))
+    created_bookings = {booking.id: booking for booking in db.session.scalars(stmt)}
+
+    for result in results:
+        if result['status'] == 'created':
+            result['booking'] = booking_schema.dump(created_bookings[result['booking']])
+
+    all_created = all(result['status'] == 'created' for result in results)
+    return jsonify(results), 201 if all_created else 207
+
 @booking_route_bp.route('/<int:booking_id>')
+@conditional_get(*schema_tables(Booking, booking_schema))
 def get_booking(booking_id:int):
     '''Get a single booking
 
     Path Params:
         booking_id (int): ID of the booking to retrieve
+    Query Params (All optional):
+        fields (str): Comma separated fields to return, e.g. id,booking_start. Nested fields can be selected with dot notation
+        expand (str): Comma separated nested objects to include, e.g. ship,dock. Others are omitted when fields or expand is supplied
     '''
-    booking = db.session.get(Booking, booking_id)
+    schema = sparse_schema(booking_schema)
+    booking = db.session.get(Booking, booking_id, options=schema_loader_options(Booking, schema))
 
     if not booking:
         raise PathParamError(f'No booking with id {booking_id}')
     
-    result = booking_schema.dump(booking)
+    result = schema.dump(booking)
     return jsonify(result), 200
 
+def _booking_filters(q_from_time:str | None, q_to_time:str | None, status:str | None, dock_id:int | None, ship_id:int | None,
+                     error:type[Exception]) -> list:
+    '''Build the where clauses selecting bookings by the GetAllBookings filters, raising error for invalid times
+
+    Returns:
+        list: Clauses to pass to Select.where / Update.where, all of which must match
+    '''
+    try:
+        from_time = datetime.strptime(q_from_time, r'%Y-%m-%d %H:%M') if q_from_time else None
+        to_time = datetime.strptime(q_to_time, r'%Y-%m-%d %H:%M') if q_to_time else None
+    except (TypeError, ValueError):
+        raise error('Invalid input supplied. from_time and to_time must match format: YYYY-MM-DD HH:MM')
+
+    if from_time and to_time and to_time < from_time:
+        raise error('to_time cannot be earlier than from_time.')
+
+    filters = []
+
+    # Process start & end times
+    #Overlapping bookings start less than the maximum duration before from_time. Redundant with the overlap filters,
+    #but lets a partitioned bookings table skip partitions before from_time
+    if from_time:
+        filters.append(Booking.booking_start > from_time - MAX_BOOKING_DURATION)
+    #The range overlap can use ix_bookings_period. It is closed so it isn't empty when from_time == to_time,
+    #with the comparisons below keeping the exact overlap (bookings covering that instant)
+    if from_time and to_time:
+        filters.append(booking_period(Booking.booking_start, Booking.booking_end).op('&&')(func.tstzrange(from_time, to_time, '[]')))
+    if from_time:
+        filters.append(Booking.booking_end > from_time)
+    if to_time:
+        filters.append(Booking.booking_start < to_time)
+
+    if status:
+        filters.append(Booking.booking_status == status.upper())
+    if dock_id:
+        filters.append(Booking.dock_id == dock_id)
+    if ship_id:
+        filters.append(Booking.ship_id == ship_id)
+
+    return filters
+
 @booking_route_bp.route('/GetAllBookings')
+@conditional_get(*schema_tables(Booking, bookings_schema))
 def get_all_bookings():
     '''Get all bookings
     Query Params (All optional):
@@ -113,45 +388,425 @@ def get_all_bookings():
         status (str): Retrieve matching bookings with specified booking status
         dock_id (int): Retrieve bookings for specified dock
         ship_id (int): Retrieve bookings for specified ship
+        limit (int): Maximum number of bookings to return. Paginated responses are returned as {'results': [...], 'next_cursor': str}
+        cursor (str): Return the page following the one that supplied this next_cursor value
+        stream (int): Set to 1 (or send Accept: application/x-ndjson) to stream all matching bookings as NDJSON. Ignores limit & cursor
+        fields (str): Comma separated fields to return, e.g. id,booking_start. Nested fields can be selected with dot notation
+        expand (str): Comma separated nested objects to include, e.g. ship,dock. Others are omitted when fields or expand is supplied
+    '''
+
+    filters = _booking_filters(
+        request.args.get('from_time'),
+        request.args.get('to_time'),
+        request.args.get('status'),
+        request.args.get('dock_id', type=int),
+        request.args.get('ship_id', type=int),
+        QueryParamError
+    )
+
+    schema = sparse_schema(bookings_schema)
+    stmt = select(Booking).options(*schema_loader_options(Booking, schema, BOOKING_PAGE_KEYS)).where(*filters)
+
+    if wants_stream():
+        return ndjson_response(stmt.order_by(*BOOKING_PAGE_KEYS), schema)
+
+    stmt, limit = paginate(stmt, BOOKING_PAGE_KEYS)
+    bookings = db.session.scalars(stmt)
+
+    return paginated_response(bookings, schema, BOOKING_PAGE_KEYS, limit)
+
+@booking_route_bp.route('/FindAvailability')
+@conditional_get(Booking.__tablename__, Dock.__tablename__, DockCargo.__tablename__, Ship.__tablename__, time_key=varies_by_day())
+def find_availability():
+    '''Find free slots for a ship across every dock that can accept it
+    Compatible docks are those at least as long as the ship that accept the ship's cargo type.
+    Slots are ranked by earliest start, then by the closest fitting dock length.
 
+    Query Params:
+        ship_id (int): ID of the ship to find a slot for
+        from_time (datetime): Earliest slot start, in format YYYY-MM-DD HH:MM
+        to_time (datetime): Latest slot end, in format YYYY-MM-DD HH:MM
+        duration (int): Required duration of the booking (in hours)
+        OPTIONAL: limit (int): Maximum number of slots to return, at most 200. Default 20
+    
+    Response items:
+        dock (Dock): The dock with a free slot (id, dock_code, dock_length)
+        slot_start (datetime): Earliest start time of the free slot
+        slot_end (datetime): End time of a booking of the requested duration starting at slot_start
+        latest_end (datetime): End of the free gap, the latest time a booking in this slot could end
     '''
+    ship_id = request.args.get('ship_id', type=int)
+    q_from_time = request.args.get('from_time')
+    q_to_time = request.args.get('to_time')
+    duration = request.args.get('duration', type=int)
+    q_limit = request.args.get('limit', '20')
 
+    if not ship_id or not q_from_time or not q_to_time or not duration:
+        raise QueryParamError('ship_id, from_time, to_time and duration are required.')
+    
+    max_hours = MAX_BOOKING_DURATION // timedelta(hours=1)
+    if not 0 < duration <= max_hours:
+        raise QueryParamError(f'duration must be between 1 and {max_hours} hours.')
+
+    #Non-integer limits are rejected with the out of range ones
+    try:
+        limit = int(q_limit)
+    except ValueError:
+        limit = 0
+    if not 0 < limit <= MAX_AVAILABILITY_SLOTS:
+        raise QueryParamError(f'limit must be an integer between 1 and {MAX_AVAILABILITY_SLOTS}.')
+
+    try:
+        from_time = datetime.strptime(q_from_time, r'%Y-%m-%d %H:%M')
+        to_time = datetime.strptime(q_to_time, r'%Y-%m-%d %H:%M')
+    except ValueError:
+        raise QueryParamError('Invalid input supplied. from_time and to_time must match format: YYYY-MM-DD HH:MM')
+    
+    ship = db.session.get(Ship, ship_id)
+
+    if not ship:
+        raise QueryParamError(f'No ship found with supplied ID: {ship_id}')
+
+    #Bookings cannot start before today
+    from_time = max(from_time, datetime.now().replace(hour=0, minute=0, second=0, microsecond=0))
+
+    stmt = select(Dock).join(DockCargo, DockCargo.dock_id == Dock.id).where(
+        (Dock.dock_length >= ship.ship_length)
+        & (DockCargo.cargo_type_id == ship.cargo_type_id)
+    )
+    docks = {dock.id: dock for dock in db.session.scalars(stmt)}
+
+    #Pull the confirmed intervals for every compatible dock in one query
+    stmt = select(Booking.dock_id, Booking.booking_start, Booking.booking_end).where(
+        (Booking.dock_id.in_(docks.keys()))
+        & (Booking.booking_status == 'CONFIRMED')
+        & (Booking.booking_start < to_time)
+        & (Booking.booking_end > from_time)
+        & (Booking.booking_start > from_time - MAX_BOOKING_DURATION)
+    ).order_by(Booking.dock_id, Booking.booking_start)
+
+    #Request times are naive & interpreted in the database timezone, so compare against naive wall clock booking times
+    busy_by_dock = {
+        dock_id: [(start.replace(tzinfo=None), end.replace(tzinfo=None)) for _, start, end in rows]
+        for dock_id, rows in groupby(db.session.execute(stmt), key=lambda row: row.dock_id)
+    }
+
+    booking_duration = timedelta(hours=duration)
+    slots = []
+
+    for dock in docks.values():
+        for gap_start, gap_end in free_gaps(busy_by_dock.get(dock.id, []), from_time, to_time, booking_duration):
+            slots.append((gap_start, dock.dock_length - ship.ship_length, gap_end, dock))
+
+    slots.sort(key=lambda slot: slot[:3])
+
+    result = [
+        {
+            'dock': {'id': dock.id, 'dock_code': dock.dock_code, 'dock_length': dock.dock_length},
+            'slot_start': gap_start.strftime(r'%Y-%m-%d %H:%M'),
+            'slot_end': (gap_start + booking_duration).strftime(r'%Y-%m-%d %H:%M'),
+            'latest_end': gap_end.strftime(r'%Y-%m-%d %H:%M')
+        }
+        for gap_start, _, gap_end, dock in slots[:limit]
+    ]
+    return jsonify(result), 200
+
+def _resolve_weights(data:dict) -> dict[int, float] | None:
+    '''Parse the optional priorities of a ResolvePending body
+
+    Returns:
+        dict | None: Booking id: priority, or None to weight bookings by their hours
+    '''
+    priorities = data.get('priorities')
+    if priorities is None:
+        return None
+
+    try:
+        priorities = {int(booking_id): priority for booking_id, priority in priorities.items()}
+    except (AttributeError, ValueError):
+        raise BodyError('priorities must be an object of booking ID: priority.')
+
+    if not all(isinstance(priority, (int, float)) and priority >= 0 for priority in priorities.values()):
+        raise BodyError('Each priority must be a number of at least 0.')
+    return priorities
+
+@booking_route_bp.route('/ResolvePending', methods=('POST',))
+def resolve_pending():
+    '''Choose which PENDING bookings to confirm on each dock, so no confirmed bookings overlap and the total booked hours
+    (or supplied priority) of the confirmed bookings is as high as possible
+
+    The PENDING & CONFIRMED bookings of the dock(s) around the window are loaded in one query. Per dock, PENDING bookings
+    overlapping a CONFIRMED booking are skipped, then the best set of the rest is found by weighted interval scheduling.
+    By default the proposed set is only returned. With apply=1 it is confirmed in one UPDATE, in the same transaction
+    as the locked read, so the bookings can't change in between.
+
+    Query Params:
+        from_time (datetime): Resolve PENDING bookings overlapping this time or later, in format YYYY-MM-DD HH:MM
+        to_time (datetime): Resolve PENDING bookings overlapping times before this, in format YYYY-MM-DD HH:MM
+        OPTIONAL: dock_id (int): Only resolve bookings for this dock. Defaults to every dock
+        OPTIONAL: apply (int): Set to 1 to confirm the proposed bookings. Defaults to 0, a dry run
+
+    Body data (JSON, optional):
+        priorities (object): Booking ID: priority (number). When supplied, the total priority is maximised instead of
+            booked hours, with bookings not listed given priority 1. Bookings with priority 0 are never confirmed
+
+    Response fields:
+        applied (bool): Whether the proposed bookings were confirmed
+        docks (list): Per dock with PENDING bookings in the window: dock_id, confirm (IDs of the bookings to confirm),
+            remain_pending (IDs left PENDING), blocked (IDs overlapping an existing CONFIRMED booking),
+            confirmed_hours (hours of the bookings to confirm) & total_weight (hours or priority maximised)
+    '''
     q_from_time = request.args.get('from_time')
     q_to_time = request.args.get('to_time')
-    status = request.args.get('status')
     dock_id = request.args.get('dock_id', type=int)
-    ship_id = request.args.get('ship_id', type=int)
+    apply = request.args.get('apply', 0, type=int) == 1
+
+    if not q_from_time or not q_to_time:
+        raise QueryParamError('from_time and to_time are required.')
 
     try:
-        from_time = datetime.strptime(q_from_time, r'%Y-%m-%d %H:%M') if q_from_time else None
-        to_time = datetime.strptime(q_to_time, r'%Y-%m-%d %H:%M') if q_to_time else None
+        from_time = datetime.strptime(q_from_time, r'%Y-%m-%d %H:%M')
+        to_time = datetime.strptime(q_to_time, r'%Y-%m-%d %H:%M')
     except ValueError:
         raise QueryParamError('Invalid input supplied. from_time and to_time must match format: YYYY-MM-DD HH:MM')
 
-    stmt = select(Booking)
+    if to_time <= from_time:
+        raise QueryParamError('to_time must be later than from_time.')
 
-    # Process start & end times
-    if from_time and to_time:
-        stmt = stmt.where(
-            (Booking.booking_start < to_time) & (Booking.booking_end > from_time)
-        )
-    else:
-        if from_time:
-            stmt = stmt.where(Booking.booking_end > from_time)
-        if to_time:
-            stmt = stmt.where(Booking.booking_start < to_time)
-    
-    if status:
-        stmt = stmt.where(Booking.booking_status == status.upper())
+    priorities = _resolve_weights(request.get_json(silent=True) or {})
+
+    #Confirmed bookings up to the maximum duration either side of the window can overlap a pending booking in it
+    stmt = select(Booking.id, Booking.dock_id, Booking.booking_start, Booking.booking_end, Booking.booking_status).where(
+        Booking.booking_status.in_(('PENDING', 'CONFIRMED'))
+        & (Booking.booking_start < to_time + MAX_BOOKING_DURATION)
+        & (Booking.booking_end > from_time - MAX_BOOKING_DURATION)
+        & (Booking.booking_start > from_time - 2 * MAX_BOOKING_DURATION)
+    ).order_by(Booking.dock_id, Booking.booking_start)
     if dock_id:
         stmt = stmt.where(Booking.dock_id == dock_id)
-    if ship_id:
-        stmt = stmt.where(Booking.ship_id == ship_id)
+    if apply:
+        stmt = stmt.with_for_update()
 
-    bookings = db.session.scalars(stmt)
+    #Request times are naive & interpreted in the database timezone, so compare against naive wall clock booking times
+    docks = []
+    for booking_dock_id, rows in groupby(db.session.execute(stmt), key=lambda row: row.dock_id):
+        taken, pending = [], []
+        for booking_id, _, start, end, status in rows:
+            start, end = start.replace(tzinfo=None), end.replace(tzinfo=None)
+            if status == StatusEnum.CONFIRMED:
+                taken.append((start, end))
+            elif start < to_time and end > from_time:
+                pending.append((booking_id, start, end))
 
-    result = bookings_schema.dump(bookings)
-    return jsonify(result), 200
+        if not pending:
+            continue
+
+        hours = {booking_id: (end - start).total_seconds() / 3600 for booking_id, start, end in pending}
+        weights = hours if priorities is None else {booking_id: priorities.get(booking_id, 1) for booking_id, _, _ in pending}
+        confirm, blocked = max_weight_schedule(
+            ((booking_id, start, end, weights[booking_id]) for booking_id, start, end in pending), taken
+        )
+
+        confirm_ids = set(confirm)
+        docks.append({
+            'dock_id': booking_dock_id,
+            'confirm': confirm,
+            'remain_pending': [booking_id for booking_id, _, _ in pending if booking_id not in confirm_ids],
+            'blocked': blocked,
+            'confirmed_hours': round(sum(hours[booking_id] for booking_id in confirm), 2),
+            'total_weight': round(sum(weights[booking_id] for booking_id in confirm), 2)
+        })
+
+    confirm_ids = [booking_id for dock in docks for booking_id in dock['confirm']]
+    if apply and confirm_ids:
+        stmt = update(Booking).where(Booking.id.in_(confirm_ids)).values(booking_status='CONFIRMED') \
+            .execution_options(synchronize_session=False)
+        try:
+            db.session.execute(stmt)
+            db.session.commit()
+        except IntegrityError as e:
+            if e.orig.pgcode == errorcodes.EXCLUSION_VIOLATION:
+                record_booking_conflict('database')
+            raise
+        finally:
+            after_commit(booking_index.invalidate, *(dock['dock_id'] for dock in docks))
+
+    return jsonify({'applied': apply and bool(confirm_ids), 'docks': docks}), 200
+
+def _parse_allocation_request(item:dict, today:datetime) -> tuple[int, datetime, datetime, timedelta]:
+    '''Validate one AutoAllocate request item. Raises BodyError if invalid
+
+    Returns:
+        tuple: ship_id, earliest_start (no earlier than today), latest_end, duration
+    '''
+    ship_id = item.get('ship_id')
+    duration = item.get('duration')
+
+    if not isinstance(ship_id, int):
+        raise BodyError('ship_id (int) is required.')
+    if not isinstance(duration, int) or not 0 < duration <= MAX_BOOKING_DURATION // timedelta(hours=1):
+        raise BodyError(f'duration must be between 1 and {MAX_BOOKING_DURATION // timedelta(hours=1)} hours.')
+
+    try:
+        earliest_start = datetime.strptime(item.get('earliest_start'), r'%Y-%m-%d %H:%M')
+        latest_end = datetime.strptime(item.get('latest_end'), r'%Y-%m-%d %H:%M')
+    except (TypeError, ValueError):
+        raise BodyError('earliest_start and latest_end are required, in format: YYYY-MM-DD HH:MM')
+
+    #Bookings cannot start before today
+    earliest_start = max(earliest_start, today)
+    duration = timedelta(hours=duration)
+    if latest_end - earliest_start < duration:
+        raise BodyError('No time between earliest_start (or today) and latest_end for a booking of this duration.')
+
+    return ship_id, earliest_start, latest_end, duration
+
+def _recheck_allocated_pairs(new_bookings:list[tuple[int, dict]], results:list[dict]) -> list[tuple[int, dict]]:
+    '''Check the allocated ship & dock pairs against the database, as the compatibility cache they were chosen from
+    may be out of date. The matching ships, docks & dock_cargo rows are locked FOR SHARE until the bookings are committed,
+    so they can't change in between. Results of incompatible pairs are updated to errors
+
+    Returns:
+        list: The new bookings whose ship can still use the allocated dock
+    '''
+    pairs = {(values['ship_id'], values['dock_id']) for _, values in new_bookings}
+    stmt = select(Ship.id, Dock.id).join(Dock, Dock.dock_length >= Ship.ship_length).join(DockCargo, (
+        (DockCargo.dock_id == Dock.id)
+        & (DockCargo.cargo_type_id == Ship.cargo_type_id)
+    )).where(tuple_(Ship.id, Dock.id).in_(pairs)).with_for_update(read=True)
+    compatible = set(db.session.execute(stmt).all())
+
+    if len(compatible) == len(pairs):
+        return new_bookings
+
+    compatibility_index.invalidate()
+    for index, values in new_bookings:
+        if (values['ship_id'], values['dock_id']) not in compatible:
+            for key in ('dock_id', 'booking_start', 'booking_end'):
+                results[index].pop(key)
+            results[index].update(status='error', message='Ship can no longer use the allocated dock. Retry the request.')
+    return [(index, values) for index, values in new_bookings if (values['ship_id'], values['dock_id']) in compatible]
+
+@booking_route_bp.route('/AutoAllocate', methods=('POST',))
+@idempotent
+def auto_allocate():
+    '''Assign many booking requests to compatible docks without overlapping CONFIRMED bookings or each other
+
+    Compatible docks (long enough for the ship, accepting its cargo type) come from the in-process compatibility cache,
+    and the CONFIRMED bookings of every candidate dock in the requests' time span are loaded in one query.
+    Requests are then placed by a best-fit greedy heuristic (see allocate_docks), solved in a separate process for
+    large batches when SOLVER_PROCESSES is set. By default the allocation is only returned. With apply=1 the allocated
+    ship & dock pairs are re-checked against the database in one locking query, and requests whose ship can no longer
+    use its dock are returned as errors. The rest are created as CONFIRMED bookings in one INSERT, with times built
+    within the limits BookingSchema validates. If another request confirmed an overlapping booking meanwhile,
+    nothing is created and 409 is returned, and the allocation can be retried.
+    Responds 200 (201 when applied) if every request was allocated, otherwise 207 with the per item results.
+
+    Query Params (All optional):
+        apply (int): Set to 1 to create the allocated bookings. Defaults to 0, a dry run
+
+    Body data (JSON array, max 5000 items):
+        ship_id (int): ID of the ship to book
+        earliest_start (datetime): Earliest start of the booking, in format YYYY-MM-DD HH:MM
+        latest_end (datetime): Latest end of the booking, in format YYYY-MM-DD HH:MM
+        duration (int): Duration (in hours) of the booking
+
+    Response items:
+        index (int): Position of the item in the request array
+        status (str): One of allocated, unallocated (no compatible dock is free), error
+        dock_id (int), booking_start (datetime), booking_end (datetime): The allocated slot (status allocated)
+        booking_id (int): ID of the created booking (status allocated, with apply=1)
+        message (str): Reason the request was not allocated (status unallocated, error)
+    '''
+    data = request.get_json()
+    apply = request.args.get('apply', 0, type=int) == 1
+
+    if not isinstance(data, list) or not data:
+        raise BodyError('Request body must be a non-empty array of allocation requests.')
+    if len(data) > MAX_ALLOCATION_REQUESTS:
+        raise BodyError(f'A maximum of {MAX_ALLOCATION_REQUESTS} requests can be allocated per call.')
+
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    results = [{'index': index} for index in range(len(data))]
+    requests, request_items = [], []
+
+    for index, item in enumerate(data):
+        try:
+            ship_id, earliest_start, latest_end, duration = _parse_allocation_request(item if isinstance(item, dict) else {}, today)
+        except BodyError as e:
+            results[index].update(status='error', message=e.message)
+            continue
+
+        docks = compatibility_index.compatible_docks(ship_id, fresh=True)
+        if docks is None:
+            results[index].update(status='error', message=f'No ship found with supplied ID: {ship_id}')
+        elif not docks:
+            results[index].update(status='unallocated', message='No dock is long enough for the ship and accepts its cargo type.')
+        else:
+            requests.append((earliest_start, latest_end, duration, [(dock.id, dock.dock_length) for dock in docks]))
+            request_items.append((index, ship_id))
+
+    busy = {}
+    if requests:
+        dock_ids = {dock_id for *_, docks in requests for dock_id, _ in docks}
+        span_start = min(earliest_start for earliest_start, *_ in requests)
+        span_end = max(latest_end for _, latest_end, *_ in requests)
+
+        stmt = select(Booking.dock_id, Booking.booking_start, Booking.booking_end).where(
+            (Booking.dock_id.in_(dock_ids))
+            & (Booking.booking_status == 'CONFIRMED')
+            & (Booking.booking_start < span_end)
+            & (Booking.booking_end > span_start)
+            & (Booking.booking_start > span_start - MAX_BOOKING_DURATION)
+        ).order_by(Booking.dock_id, Booking.booking_start)
+
+        #Request times are naive & interpreted in the database timezone, so compare against naive wall clock booking times
+        busy = {
+            dock_id: [(start.replace(tzinfo=None), end.replace(tzinfo=None)) for _, start, end in rows]
+            for dock_id, rows in groupby(db.session.execute(stmt), key=lambda row: row.dock_id)
+        }
+
+    allocations = solver_pool.run(allocate_docks, requests, busy, size=len(requests)) if requests else []
+
+    new_bookings = []
+    for (index, ship_id), (_, _, duration, _), allocation in zip(request_items, requests, allocations):
+        if allocation is None:
+            results[index].update(status='unallocated', message='No compatible dock is free for this duration between earliest_start and latest_end.')
+            continue
+        dock_id, start = allocation
+        results[index].update(
+            status='allocated',
+            dock_id=dock_id,
+            booking_start=start.strftime(r'%Y-%m-%d %H:%M'),
+            booking_end=(start + duration).strftime(r'%Y-%m-%d %H:%M')
+        )
+        new_bookings.append((index, {
+            'booking_start': start, 'booking_end': start + duration, 'booking_status': 'CONFIRMED', 'ship_id': ship_id, 'dock_id': dock_id
+        }))
+
+    if apply and new_bookings:
+        new_bookings = _recheck_allocated_pairs(new_bookings, results)
+
+    applied = apply and bool(new_bookings)
+    if applied:
+        stmt = insert(Booking).returning(Booking.id, sort_by_parameter_order=True)
+        try:
+            booking_ids = db.session.scalars(stmt, [values for _, values in new_bookings]).all()
+            db.session.commit()
+        except IntegrityError as e:
+            if e.orig.pgcode == errorcodes.EXCLUSION_VIOLATION:
+                record_booking_conflict('database')
+            raise
+        finally:
+            after_commit(booking_index.invalidate, *{values['dock_id'] for _, values in new_bookings})
+
+        for (index, _), booking_id in zip(new_bookings, booking_ids):
+            results[index]['booking_id'] = booking_id
+
+    all_allocated = all(result['status'] == 'allocated' for result in results)
+    if not all_allocated:
+        return jsonify(results), 207
+    return jsonify(results), 201 if applied else 200
 
 @booking_route_bp.route('/UpdateBooking/<int:booking_id>', methods=('PUT','PATCH'))
 def update_booking(booking_id:int):
@@ -179,11 +834,181 @@ def update_booking(booking_id:int):
         raise BodyError(f'No valid attributes to update. Allowed attributes: {", ".join(allowed_updates)}')
 
     booking = booking_schema.load(data, instance=booking, session=db.session, partial=True)
-    db.session.commit()
+
+    if _is_confirmed(booking.booking_status):
+        conflicts = _index_conflicts_message(booking.dock_id, booking.booking_start, booking.booking_end, ignore_id=booking.id)
+        if conflicts:
+            record_booking_conflict('index')
+            raise BodyError(f'Unable to update booking. Booking conflicts with existing bookings for this dock: {conflicts}.')
+
+    dock_id = booking.dock_id
+    try:
+        db.session.commit()
+    except IntegrityError as e:
+        if e.orig.pgcode == errorcodes.EXCLUSION_VIOLATION:
+            record_booking_conflict('database')
+        after_commit(booking_index.invalidate, dock_id)
+        raise
+
+    _sync_booking_index(booking)
 
     result = booking_schema.dump(booking)
     return jsonify(result), 200
 
+#Filters accepted by BulkUpdateStatus, the same as GetAllBookings query params
+BULK_STATUS_FILTERS = ('from_time', 'to_time', 'status', 'dock_id', 'ship_id')
+#Attempts at BulkUpdateStatus' UPDATE when a concurrent write confirms a conflicting booking between its check & update
+BULK_STATUS_ATTEMPTS = 3
+
+def _bulk_status_selection(data:dict) -> tuple[list, list[int] | None]:
+    '''Parse the ids or filter of a BulkUpdateStatus body
+
+    Returns:
+        tuple: Where clauses selecting the bookings, and the requested ids (None when selected by filter)
+    '''
+    ids = data.get('ids')
+    booking_filter = data.get('filter')
+
+    if (ids is None) == (booking_filter is None):
+        raise BodyError('Exactly one of ids or filter must be supplied.')
+
+    if ids is not None:
+        if not isinstance(ids, list) or not ids or not all(isinstance(booking_id, int) for booking_id in ids):
+            raise BodyError('ids must be a non-empty array of booking IDs.')
+        if len(ids) > MAX_BULK_BOOKINGS:
+            raise BodyError(f'A maximum of {MAX_BULK_BOOKINGS} bookings can be updated per request.')
+        ids = list(dict.fromkeys(ids))
+        return [Booking.id.in_(ids)], ids
+
+    if not isinstance(booking_filter, dict) or not booking_filter:
+        raise BodyError(f"filter must be a non-empty object with any of: {', '.join(BULK_STATUS_FILTERS)}")
+    unknown = set(booking_filter) - set(BULK_STATUS_FILTERS)
+    if unknown:
+        raise BodyError(f"Unknown filter: {', '.join(sorted(unknown))}. Allowed filters: {', '.join(BULK_STATUS_FILTERS)}")
+    for key in ('dock_id', 'ship_id'):
+        if key in booking_filter and not isinstance(booking_filter[key], int):
+            raise BodyError(f'filter {key} must be an integer.')
+    if not isinstance(booking_filter.get('status', ''), str):
+        raise BodyError('filter status must be a string.')
+
+    filters = _booking_filters(*(booking_filter.get(key) for key in BULK_STATUS_FILTERS), BodyError)
+    return filters, None
+
+def _confirmation_conflicts(candidates:list) -> dict[int, list[int]]:
+    '''Find which candidate bookings would violate exclude_overlapping_confirmed_bookings_per_dock if confirmed, in one query
+
+    A candidate conflicts with any CONFIRMED booking, or any other candidate, on the same dock overlapping its times.
+    Overlapping candidates conflict with each other, so neither is confirmed.
+
+    Returns:
+        dict[int, list[int]]: Conflicting candidate id: ids of the bookings it overlaps
+    '''
+    if not candidates:
+        return {}
+
+    candidate_ids = [booking_id for booking_id, _, _, _ in candidates]
+    other = aliased(Booking)
+    stmt = select(Booking.id, other.id).join(other, (
+        (other.dock_id == Booking.dock_id)
+        & (other.id != Booking.id)
+        & (other.booking_start < Booking.booking_end)
+        & (other.booking_end > Booking.booking_start)
+        & (other.booking_start > Booking.booking_start - MAX_BOOKING_DURATION)
+        & ((other.booking_status == 'CONFIRMED') | other.id.in_(candidate_ids))
+    )).where(Booking.id.in_(candidate_ids)).order_by(Booking.id, other.booking_start)
+
+    conflicts = {}
+    for booking_id, other_id in db.session.execute(stmt):
+        conflicts.setdefault(booking_id, []).append(other_id)
+    return conflicts
+
+@booking_route_bp.route('/BulkUpdateStatus', methods=('PATCH',))
+def bulk_update_status():
+    '''Set the status of many bookings in one set based UPDATE ... RETURNING, with a result per booking
+
+    Bookings are selected by ids, or by a filter taking the same values as the GetAllBookings query params.
+    When confirming, bookings that would overlap a CONFIRMED booking (or another booking being confirmed) on their dock
+    are found in a single query beforehand and left unchanged, reported as conflicts, while the rest are confirmed.
+    Responds 200 if every selected booking has the target status afterwards, otherwise 207 with the per booking results.
+
+    Body data (JSON):
+        booking_status (str): Target status, from [PENDING, CONFIRMED]
+        ids (array[int]): IDs of the bookings to update, max 1000. Either ids or filter is required
+        filter (object): Select bookings by any of from_time, to_time, status, dock_id, ship_id, as for GetAllBookings.
+            At most 1000 bookings can match
+
+    Response items:
+        id (int): ID of the booking
+        status (str): One of updated, unchanged (already had the target status), conflict, not_found (ids only)
+        conflicts_with (list[Booking]): Overlapping bookings preventing confirmation (status conflict)
+    '''
+    data = request.get_json()
+
+    if not isinstance(data, dict):
+        raise BodyError('Request body must be an object with booking_status and ids or filter.')
+
+    target = data.get('booking_status')
+    statuses = Booking.booking_status.type.enums
+    if target not in statuses:
+        raise BodyError(f"booking_status must be one of: {', '.join(statuses)}")
+
+    filters, ids = _bulk_status_selection(data)
+
+    for attempt in range(1, BULK_STATUS_ATTEMPTS + 1):
+        #Lock the selected bookings, so their times & statuses can't change between the conflict check & the update
+        stmt = select(Booking.id, Booking.dock_id, Booking.booking_start, Booking.booking_end, Booking.booking_status) \
+            .where(*filters).order_by(Booking.id).limit(MAX_BULK_BOOKINGS + 1).with_for_update()
+        selected = db.session.execute(stmt).all()
+        if len(selected) > MAX_BULK_BOOKINGS:
+            raise BodyError(f'filter matches more than {MAX_BULK_BOOKINGS} bookings. Narrow the filter.')
+
+        candidates = [
+            (booking_id, dock_id, start, end) for booking_id, dock_id, start, end, status in selected
+            if status is None or status.name != target
+        ]
+        conflicts = _confirmation_conflicts(candidates) if target == 'CONFIRMED' else {}
+        update_ids = [booking_id for booking_id, _, _, _ in candidates if booking_id not in conflicts]
+
+        try:
+            with db.session.begin_nested():
+                stmt = update(Booking).where(Booking.id.in_(update_ids)).values(booking_status=target) \
+                    .returning(Booking.id).execution_options(synchronize_session=False)
+                updated_ids = set(db.session.scalars(stmt)) if update_ids else set()
+            break
+        except IntegrityError as e:
+            #A booking confirmed by another request since the check now overlaps, so check again
+            if e.orig.pgcode != errorcodes.EXCLUSION_VIOLATION or attempt == BULK_STATUS_ATTEMPTS:
+                raise e
+            record_booking_conflict('database')
+
+    db.session.commit()
+    after_commit(booking_index.invalidate, *{dock_id for _, dock_id, _, _ in candidates})
+
+    #Load every conflicting booking in one query for the response
+    conflict_ids = {other_id for other_ids in conflicts.values() for other_id in other_ids}
+    stmt = select(Booking).where(Booking.id.in_(conflict_ids)).options(*schema_loader_options(Booking, bookings_summary_schema))
+    conflicting_bookings = {booking.id: booking for booking in db.session.scalars(stmt)} if conflict_ids else {}
+
+    results = []
+    for booking_id, *_ in selected:
+        if booking_id in updated_ids:
+            results.append({'id': booking_id, 'status': 'updated'})
+        elif booking_id in conflicts:
+            results.append({
+                'id': booking_id,
+                'status': 'conflict',
+                'conflicts_with': bookings_summary_schema.dump([conflicting_bookings[other_id] for other_id in conflicts[booking_id]])
+            })
+        else:
+            results.append({'id': booking_id, 'status': 'unchanged'})
+
+    if ids is not None:
+        found = {booking_id for booking_id, *_ in selected}
+        results += [{'id': booking_id, 'status': 'not_found'} for booking_id in ids if booking_id not in found]
+
+    all_done = all(result['status'] in ('updated', 'unchanged') for result in results)
+    return jsonify(results), 200 if all_done else 207
+
 @booking_route_bp.route('/DeleteBooking/<int:booking_id>', methods=('DELETE',))
 def delete_company(booking_id:int):
     '''Delete a single booking
@@ -196,7 +1021,10 @@ def delete_company(booking_id:int):
     if not booking:
         raise PathParamError(f'No booking with id {booking_id}')
 
+    dock_id = booking.dock_id
     db.session.delete(booking)
     db.session.commit()
 
+    after_commit(booking_index.remove, dock_id, booking_id)
+
     return jsonify({'message': f'Booking with ID {booking_id} deleted.'}), 200
\ No newline at end of file
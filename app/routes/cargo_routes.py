@@ -6,10 +6,22 @@ from app.schemas import cargo_schema, cargos_schema
 from app.model import CargoType
 from app.db import db
 from app.errors import PathParamError
+from app.utils import (
+    schema_loader_options,
+    paginate,
+    paginated_response,
+    compatibility_index,
+    conditional_get,
+    schema_tables,
+    sparse_schema,
+    idempotent,
+    after_commit
+)
 
 cargo_route_bp = Blueprint('cargo_routes', __name__, url_prefix='/cargo')
 
 @cargo_route_bp.route('/CreateCargo', methods=('POST',))
+@idempotent
 def add_cargo():
     '''Create a new cargo type
 
@@ -27,16 +39,22 @@ def add_cargo():
     return jsonify(result), 201
 
 @cargo_route_bp.route('/GetCargoTypes')
+@conditional_get(*schema_tables(CargoType, cargos_schema))
 def get_all_cargos():
     '''Get all cargo types
-
+    Query Params (All optional):
+        limit (int): Maximum number of cargo types to return. Paginated responses are returned as {'results': [...], 'next_cursor': str}
+        cursor (str): Return the page following the one that supplied this next_cursor value
+        fields (str): Comma separated fields to return, e.g. id,cargo_name. Nested fields can be selected with dot notation
+        expand (str): Comma separated nested objects to include, e.g. docks. Others are omitted when fields or expand is supplied
     '''
-    stmt = select(CargoType)
+    schema = sparse_schema(cargos_schema)
+    stmt = select(CargoType).options(*schema_loader_options(CargoType, schema))
 
+    stmt, limit = paginate(stmt, (CargoType.id,))
     cargo_types = db.session.scalars(stmt)
 
-    result = cargos_schema.dump(cargo_types)
-    return jsonify(result), 200
+    return paginated_response(cargo_types, schema, (CargoType.id,), limit)
 
 @cargo_route_bp.route('/DeleteCargo/<int:cargo_id>', methods=('DELETE',))
 def delete_cargo(cargo_id:int):
@@ -55,5 +73,7 @@ def delete_cargo(cargo_id:int):
         db.session.commit()
     except IntegrityError:
         raise PathParamError('Unable to delete cargo type while registered to a ship or dock.')
+    
+    after_commit(compatibility_index.invalidate)
 
     return jsonify({'message': f'Cargo with ID {cargo_id} deleted.'}), 200
\ No newline at end of file
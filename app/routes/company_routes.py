@@ -5,11 +5,13 @@ from app.schemas import company_schema, companies_schema
 from app.model import Company, Ship
 from app.db import db
 from app.errors import PathParamError
+from app.utils import schema_loader_options, paginate, paginated_response, conditional_get, schema_tables, sparse_schema, idempotent
 
 company_route_bp = Blueprint('company_routes', __name__, url_prefix='/company')
 
 
 @company_route_bp.route('/CreateCompany', methods=('POST',))
+@idempotent
 def add_company():
     '''Create a new shipping company
 
@@ -31,31 +33,42 @@ def add_company():
     return jsonify(result), 201
 
 @company_route_bp.route('/<int:company_id>')
+@conditional_get(*schema_tables(Company, company_schema))
 def get_company(company_id:int):
     '''Get a single company
 
     Path Params:
         company_id (int): ID of the company to retrieve
+    Query Params (All optional):
+        fields (str): Comma separated fields to return, e.g. id,company_name. Nested fields can be selected with dot notation
+        expand (str): Comma separated nested objects to include, e.g. ships. Others are omitted when fields or expand is supplied
     '''
-    company = db.session.get(Company, company_id)
+    schema = sparse_schema(company_schema)
+    company = db.session.get(Company, company_id, options=schema_loader_options(Company, schema))
 
     if not company:
         raise PathParamError(f'No company with id {company_id}')
     
-    result = company_schema.dump(company)
+    result = schema.dump(company)
     return jsonify(result), 200
 
 @company_route_bp.route('/GetAllCompanies')
+@conditional_get(*schema_tables(Company, companies_schema))
 def get_all_companies():
     '''Get all companies
-
+    Query Params (All optional):
+        limit (int): Maximum number of companies to return. Paginated responses are returned as {'results': [...], 'next_cursor': str}
+        cursor (str): Return the page following the one that supplied this next_cursor value
+        fields (str): Comma separated fields to return, e.g. id,company_name. Nested fields can be selected with dot notation
+        expand (str): Comma separated nested objects to include, e.g. ships. Others are omitted when fields or expand is supplied
     '''
-    stmt = select(Company)
+    schema = sparse_schema(companies_schema)
+    stmt = select(Company).options(*schema_loader_options(Company, schema))
 
+    stmt, limit = paginate(stmt, (Company.id,))
     companies = db.session.scalars(stmt)
 
-    result = companies_schema.dump(companies)
-    return jsonify(result), 200
+    return paginated_response(companies, schema, (Company.id,), limit)
 
 @company_route_bp.route('/UpdateCompany/<int:company_id>', methods=('PUT','PATCH'))
 def update_company(company_id:int):
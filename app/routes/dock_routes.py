@@ -1,14 +1,37 @@
+from datetime import date, datetime, timedelta
+from itertools import groupby
+
 from flask import Blueprint, request, jsonify
-from sqlalchemy import select, delete
+from sqlalchemy import select, delete, func, literal_column, types
 
 from app.schemas import dock_schema, docks_schema, dock_cargos_schema
-from app.model import Dock, DockCargo, CargoType
+from app.model import Dock, DockCargo, DockUtilisation
+from app.model.booking_model import StatusEnum
 from app.db import db
 from app.errors import PathParamError, BodyError, QueryParamError
+from app.utils import (
+    schema_loader_options,
+    paginate,
+    paginated_response,
+    wants_stream,
+    ndjson_response,
+    compatibility_index,
+    conditional_get,
+    varies_by_day,
+    varies_by_now,
+    schema_tables,
+    sparse_schema,
+    load_booking_window,
+    idempotent,
+    after_commit
+)
 
 dock_route_bp = Blueprint('dock_routes', __name__, url_prefix='/dock')
 
+UTILISATION_GROUPS = ('day', 'week', 'cargo_type')
+
 @dock_route_bp.route('/CreateDock', methods=('POST',))
+@idempotent
 def add_dock():
     '''Create a new dock
 
@@ -41,32 +64,54 @@ def add_dock():
         db.session.add_all(dock_cargos)
         db.session.commit()
     
+    after_commit(compatibility_index.invalidate)
+
     result = dock_schema.dump(new_dock)
     return jsonify(result), 201
 
 @dock_route_bp.route('/<int:dock_id>')
+@conditional_get(*schema_tables(Dock, dock_schema), time_key=varies_by_now('bookings_from'))
 def get_dock(dock_id:int):
     '''Get details of a single dock
 
     Path Params:
         dock_id (int): ID of the dock to retrieve
+    Query Params (All optional):
+        fields (str): Comma separated fields to return, e.g. id,dock_code. Nested fields can be selected with dot notation
+        expand (str): Comma separated nested objects to include, e.g. cargo_types,bookings. Others are omitted when fields or expand is supplied
+        bookings_from (datetime): Only include bookings ending after this time, in format YYYY-MM-DD HH:MM. Defaults to now
+        bookings_to (datetime): Only include bookings starting before this time, in format YYYY-MM-DD HH:MM
+        bookings_limit (int): Maximum number of bookings to include, ordered by booking_start. Defaults to 100.
+            The number of bookings in the window left out by the limit is returned as bookings_omitted
     '''
-    dock = db.session.get(Dock, dock_id)
+    schema = sparse_schema(dock_schema)
+    dock = db.session.get(Dock, dock_id, options=schema_loader_options(Dock, schema, skip=(Dock.bookings,)))
 
     if not dock:
         raise PathParamError(f'No dock with id {dock_id}')
+
+    bookings_omitted = load_booking_window(dock, schema)
     
-    result = dock_schema.dump(dock)
+    result = schema.dump(dock)
+    if bookings_omitted is not None:
+        result['bookings_omitted'] = bookings_omitted
     return jsonify(result), 200
 
 @dock_route_bp.route('/GetAllDocks')
+@conditional_get(*schema_tables(Dock, docks_schema))
 def get_all_docks():
     '''Get all docks
     Query Params (All optional):
         min_length (int): Retrieve docks longer than supplied length (in metres)
         cargo_type (int): Retrieve docks that can accept cargo type with supplied ID / IDs. Multiple IDs must be seperated by a comma
+        limit (int): Maximum number of docks to return. Paginated responses are returned as {'results': [...], 'next_cursor': str}
+        cursor (str): Return the page following the one that supplied this next_cursor value
+        stream (int): Set to 1 (or send Accept: application/x-ndjson) to stream all matching docks as NDJSON. Ignores limit & cursor
+        fields (str): Comma separated fields to return, e.g. id,dock_code. Nested fields can be selected with dot notation
+        expand (str): Comma separated nested objects to include, e.g. cargo_types,bookings. Others are omitted when fields or expand is supplied
     '''
-    stmt = select(Dock)
+    schema = sparse_schema(docks_schema)
+    stmt = select(Dock).options(*schema_loader_options(Dock, schema))
 
     min_length = request.args.get('min_length', type=int)
     q_cargo_type = request.args.get('cargo_type')
@@ -81,11 +126,105 @@ def get_all_docks():
             cargo_ids = [int(cargo_id) for cargo_id in q_cargo_type.replace(' ', '').split(',')]
         except ValueError:
             raise QueryParamError('cargo_type must be a comma seperated list of integers.')
-        stmt = stmt.filter(Dock.cargo_types.any(CargoType.id.in_(cargo_ids)))
+        if min(cargo_ids) < 1:
+            raise QueryParamError('cargo_type IDs must be positive integers.')
+        stmt = stmt.where(Dock.id.in_(compatibility_index.docks_accepting(cargo_ids)))
+
+    if wants_stream():
+        return ndjson_response(stmt.order_by(Dock.id), schema)
 
+    stmt, limit = paginate(stmt, (Dock.id,))
     docks = db.session.scalars(stmt)
-    result = docks_schema.dump(docks)
 
+    return paginated_response(docks, schema, (Dock.id,), limit)
+
+@dock_route_bp.route('/Utilisation')
+@conditional_get(DockUtilisation.__tablename__, time_key=varies_by_day('from'))
+def get_utilisation():
+    '''Get booked hours & utilisation per dock, read from the dock_utilisation_daily summary rather than bookings
+    Query Params (All optional):
+        from (date): First day to report on, in format YYYY-MM-DD. Defaults to today
+        to (date): Last day to report on (inclusive), in format YYYY-MM-DD. Defaults to 30 days from from
+        dock_id (int): Only report on the dock with supplied ID
+        group_by (str): day, week (starting Monday) or cargo_type (of the booked ships, over the whole range). Default day
+
+    Response items:
+        dock_id (int): ID of the dock
+        day / week / cargo_type_id: The group, by group_by. Days & weeks in format YYYY-MM-DD
+        booked_hours (object): Booked hours in the group for each booking status
+        utilisation (float): Fraction of the group's hours (within the range) covered by CONFIRMED bookings
+    '''
+    q_from = request.args.get('from')
+    q_to = request.args.get('to')
+    dock_id = request.args.get('dock_id', type=int)
+    group_by = request.args.get('group_by', 'day')
+
+    if group_by not in UTILISATION_GROUPS:
+        raise QueryParamError(f'group_by must be one of: {", ".join(UTILISATION_GROUPS)}')
+
+    try:
+        from_day = datetime.strptime(q_from, r'%Y-%m-%d').date() if q_from else date.today()
+        to_day = datetime.strptime(q_to, r'%Y-%m-%d').date() if q_to else from_day + timedelta(days=29)
+    except ValueError:
+        raise QueryParamError('Invalid input supplied. from and to must match format: YYYY-MM-DD')
+
+    if to_day < from_day:
+        raise QueryParamError('to cannot be earlier than from.')
+
+    if group_by == 'day':
+        group = DockUtilisation.day
+    elif group_by == 'week':
+        group = func.date_trunc(literal_column("'week'"), DockUtilisation.day).cast(types.Date)
+    else:
+        group = DockUtilisation.cargo_type_id
+
+    stmt = select(DockUtilisation.dock_id, group, DockUtilisation.booking_status, func.sum(DockUtilisation.booked_seconds)) \
+        .where(DockUtilisation.day.between(from_day, to_day)) \
+        .group_by(DockUtilisation.dock_id, group, DockUtilisation.booking_status) \
+        .order_by(DockUtilisation.dock_id, group)
+    if dock_id:
+        stmt = stmt.where(DockUtilisation.dock_id == dock_id)
+
+    range_days = (to_day - from_day).days + 1
+    result = []
+
+    for (row_dock_id, group_value), rows in groupby(db.session.execute(stmt), key=lambda row: tuple(row[:2])):
+        booked_hours = {status.value: 0.0 for status in StatusEnum}
+        for _, _, status, seconds in rows:
+            booked_hours[status] = round(seconds / 3600, 2)
+
+        #Hours of the group inside the requested range, so partial weeks at either end aren't under-reported
+        if group_by == 'day':
+            group_days = 1
+        elif group_by == 'week':
+            group_days = (min(group_value + timedelta(days=6), to_day) - max(group_value, from_day)).days + 1
+        else:
+            group_days = range_days
+
+        key = 'cargo_type_id' if group_by == 'cargo_type' else group_by
+        result.append({
+            'dock_id': row_dock_id,
+            key: group_value if group_by == 'cargo_type' else group_value.strftime(r'%Y-%m-%d'),
+            'booked_hours': booked_hours,
+            'utilisation': round(booked_hours[StatusEnum.CONFIRMED.value] / (group_days * 24), 4)
+        })
+
+    return jsonify(result), 200
+
+@dock_route_bp.route('/<int:dock_id>/CompatibleShips')
+def get_compatible_ships(dock_id:int):
+    '''Get all ships that can use a dock: no longer than the dock, and carrying a cargo type the dock accepts
+    Answered from the in-process compatibility cache
+
+    Path Params:
+        dock_id (int): ID of the dock to find ships for
+    '''
+    ships = compatibility_index.compatible_ships(dock_id)
+
+    if ships is None:
+        raise PathParamError(f'No dock with id {dock_id}')
+    
+    result = [ship._asdict() for ship in ships]
     return jsonify(result), 200
 
 @dock_route_bp.route('/UpdateLength/<int:dock_id>', methods=('PUT','PATCH'))
@@ -110,6 +249,7 @@ def update_dock_length(dock_id:int):
 
     dock = dock_schema.load(data, instance=dock, session=db.session, partial=True)
     db.session.commit()
+    after_commit(compatibility_index.invalidate)
 
     result = dock_schema.dump(dock)
     return jsonify(result), 200
@@ -150,6 +290,7 @@ def update_dock_cargo(dock_id:int):
     new_dock_cargos = dock_cargos_schema.load(cargos_data, session=db.session, many=True)
     db.session.add_all(new_dock_cargos)
     db.session.commit()
+    after_commit(compatibility_index.invalidate)
 
     result = dock_schema.dump(dock)
     return jsonify(result), 200
@@ -169,5 +310,6 @@ def delete_dock(dock_id:int):
     #Deletion removes records from junction table automatically
     db.session.delete(dock)
     db.session.commit()
+    after_commit(compatibility_index.invalidate)
 
     return jsonify({'message': f'Dock "{dock.dock_code}" deleted.'}), 200
\ No newline at end of file
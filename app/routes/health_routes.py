@@ -0,0 +1,62 @@
+from time import perf_counter
+
+from flask import Blueprint, current_app
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.pool import QueuePool
+
+from app.db import db
+from app.utils import replica_router
+
+health_bp = Blueprint('health', __name__, url_prefix='/health')
+
+def _pool_stats() -> dict | None:
+    '''Get the connection pool's current usage, or None if connections are not pooled (DB_POOL_MODE=null)
+    '''
+    pool = db.engine.pool
+    if not isinstance(pool, QueuePool):
+        return None
+
+    max_overflow = current_app.config['SQLALCHEMY_ENGINE_OPTIONS'].get('max_overflow', 10)
+    checked_out = pool.checkedout()
+    return {
+        'size': pool.size(),
+        'checked_in': pool.checkedin(),
+        'checked_out': checked_out,
+        'overflow': max(pool.overflow(), 0),
+        'max_overflow': max_overflow,
+        #A negative max_overflow means unlimited overflow, so the pool never makes a checkout wait
+        'saturated': max_overflow >= 0 and checked_out >= pool.size() + max_overflow
+    }
+
+@health_bp.route('/ready')
+def ready():
+    '''Readiness probe for the load balancer
+
+    Checks out a connection and runs a round trip query against the database. Returns 503 without touching the database
+    if every pooled connection is already checked out, as a new request to this worker would have to wait for one.
+
+    Response fields:
+        status (str): ready, saturated or unavailable
+        pool (object | null): Pool size, checked in/out & overflow connection counts
+        db (object): connect_ms - time waiting for a connection, round_trip_ms - time to run SELECT 1
+        replicas (array): host & healthy flag of each read replica. Unhealthy replicas do not fail the probe
+    '''
+    pool = _pool_stats()
+    if pool is not None and pool['saturated']:
+        return {'status': 'saturated', 'pool': pool, 'db': None}, 503
+
+    try:
+        start = perf_counter()
+        with db.engine.connect() as conn:
+            connected = perf_counter()
+            conn.execute(text('SELECT 1'))
+            finished = perf_counter()
+    except SQLAlchemyError as e:
+        return {'status': 'unavailable', 'pool': pool, 'db': {'error': type(e).__name__}}, 503
+
+    db_stats = {
+        'connect_ms': round((connected - start) * 1000, 3),
+        'round_trip_ms': round((finished - connected) * 1000, 3)
+    }
+    return {'status': 'ready', 'pool': pool, 'db': db_stats, 'replicas': replica_router.status()}
@@ -0,0 +1,12 @@
+from flask import Blueprint, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+from app.utils import metrics_registry
+
+metrics_bp = Blueprint('metrics', __name__)
+
+@metrics_bp.route('/metrics')
+def metrics():
+    '''Expose request, booking conflict & DB pool metrics in Prometheus text format, aggregated across gunicorn workers
+    '''
+    return Response(generate_latest(metrics_registry()), content_type=CONTENT_TYPE_LATEST)
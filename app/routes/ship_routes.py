@@ -5,10 +5,26 @@ from app.schemas import ship_schema, ships_schema
 from app.model import Ship, Booking
 from app.db import db
 from app.errors import PathParamError, BodyError
+from app.utils import (
+    schema_loader_options,
+    paginate,
+    paginated_response,
+    wants_stream,
+    ndjson_response,
+    compatibility_index,
+    conditional_get,
+    varies_by_now,
+    schema_tables,
+    sparse_schema,
+    load_booking_window,
+    idempotent,
+    after_commit
+)
 
 ship_route_bp = Blueprint('ship_routes', __name__, url_prefix='/ship')
 
 @ship_route_bp.route('/CreateShip', methods=('POST',))
+@idempotent
 def add_ship():
     '''Create a new ship
 
@@ -24,26 +40,41 @@ def add_ship():
     
     db.session.add(new_ship)
     db.session.commit()
+    after_commit(compatibility_index.invalidate)
     
     result = ship_schema.dump(new_ship)
     return jsonify(result), 201
 
 @ship_route_bp.route('/<int:ship_id>')
+@conditional_get(*schema_tables(Ship, ship_schema), time_key=varies_by_now('bookings_from'))
 def get_ship(ship_id:int):
     '''Get a single ship
 
     Path Params:
         ship_id (int): ID of the ship to retrieve
+    Query Params (All optional):
+        fields (str): Comma separated fields to return, e.g. id,ship_name. Nested fields can be selected with dot notation
+        expand (str): Comma separated nested objects to include, e.g. cargo_type,company. Others are omitted when fields or expand is supplied
+        bookings_from (datetime): Only include bookings ending after this time, in format YYYY-MM-DD HH:MM. Defaults to now
+        bookings_to (datetime): Only include bookings starting before this time, in format YYYY-MM-DD HH:MM
+        bookings_limit (int): Maximum number of bookings to include, ordered by booking_start. Defaults to 100.
+            The number of bookings in the window left out by the limit is returned as bookings_omitted
     '''
-    ship = db.session.get(Ship, ship_id)
+    schema = sparse_schema(ship_schema)
+    ship = db.session.get(Ship, ship_id, options=schema_loader_options(Ship, schema, skip=(Ship.bookings,)))
 
     if not ship:
         raise PathParamError(f'No ship with id {ship_id}')
+
+    bookings_omitted = load_booking_window(ship, schema)
     
-    result = ship_schema.dump(ship)
+    result = schema.dump(ship)
+    if bookings_omitted is not None:
+        result['bookings_omitted'] = bookings_omitted
     return jsonify(result), 200
 
 @ship_route_bp.route('/GetAllShips')
+@conditional_get(*schema_tables(Ship, ships_schema))
 def get_all_ships():
     '''Get all ships
     Query Params (All optional):
@@ -51,8 +82,14 @@ def get_all_ships():
         max_length (int): Retrieve ships shorter than supplied length (in metres)
         cargo_type_id (int): Retrieve ships configured for cargo type with supplied ID
         company_id (int): Retrieve ships owned by company with supplied ID
+        limit (int): Maximum number of ships to return. Paginated responses are returned as {'results': [...], 'next_cursor': str}
+        cursor (str): Return the page following the one that supplied this next_cursor value
+        stream (int): Set to 1 (or send Accept: application/x-ndjson) to stream all matching ships as NDJSON. Ignores limit & cursor
+        fields (str): Comma separated fields to return, e.g. id,ship_name. Nested fields can be selected with dot notation
+        expand (str): Comma separated nested objects to include, e.g. cargo_type,company. Others are omitted when fields or expand is supplied
     '''
-    stmt = select(Ship)
+    schema = sparse_schema(ships_schema)
+    stmt = select(Ship).options(*schema_loader_options(Ship, schema))
 
     min_length = request.args.get('min_length', type=int)
     max_length = request.args.get('max_length', type=int)
@@ -72,9 +109,28 @@ def get_all_ships():
     if company_id:
         stmt = stmt.where(Ship.company_id == company_id)
 
+    if wants_stream():
+        return ndjson_response(stmt.order_by(Ship.id), schema)
+
+    stmt, limit = paginate(stmt, (Ship.id,))
     ships = db.session.scalars(stmt)
 
-    result = ships_schema.dump(ships)
+    return paginated_response(ships, schema, (Ship.id,), limit)
+
+@ship_route_bp.route('/<int:ship_id>/CompatibleDocks')
+def get_compatible_docks(ship_id:int):
+    '''Get all docks a ship can use: at least as long as the ship, and accepting the ship's cargo type. Sorted by dock length
+    Answered from the in-process compatibility cache
+
+    Path Params:
+        ship_id (int): ID of the ship to find docks for
+    '''
+    docks = compatibility_index.compatible_docks(ship_id)
+
+    if docks is None:
+        raise PathParamError(f'No ship with id {ship_id}')
+    
+    result = [{'id': dock.id, 'dock_code': dock.dock_code, 'dock_length': dock.dock_length} for dock in docks]
     return jsonify(result), 200
 
 @ship_route_bp.route('/UpdateShip/<int:ship_id>', methods=('PUT','PATCH'))
@@ -104,6 +160,7 @@ def update_ship(ship_id:int):
 
     ship = ship_schema.load(data, instance=ship, session=db.session, partial=True)
     db.session.commit()
+    after_commit(compatibility_index.invalidate)
 
     result = ship_schema.dump(ship)
     return jsonify(result), 200
@@ -129,5 +186,6 @@ def delete_ship(ship_id:int):
 
     db.session.delete(ship)
     db.session.commit()
+    after_commit(compatibility_index.invalidate)
 
     return jsonify({'message': f'Ship "{ship.ship_name}" deleted.'}), 200
\ No newline at end of file
@@ -2,4 +2,4 @@ from .company_schema import company_schema, companies_schema
 from .cargo_schema import cargo_schema, cargos_schema
 from .ship_schema import ship_schema, ships_schema
 from .dock_schema import dock_schema, docks_schema, dock_cargos_schema
-from .booking_schema import booking_schema, bookings_schema
\ No newline at end of file
+from .booking_schema import booking_schema, bookings_schema, booking_summary_schema, bookings_summary_schema
\ No newline at end of file
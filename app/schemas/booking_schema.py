@@ -3,9 +3,11 @@ from datetime import datetime, timedelta
 from marshmallow_sqlalchemy import SQLAlchemyAutoSchema
 from marshmallow import fields, validate, validates_schema, ValidationError, post_dump
 
+from app.schemas.fast_dump import FastDumpMixin
 from app.model import Booking
+from app.model.booking_model import MAX_BOOKING_DURATION
 
-class BookingSchema(SQLAlchemyAutoSchema):
+class BookingSchema(FastDumpMixin, SQLAlchemyAutoSchema):
     """Schema to define load & dump validation rules for the Booking model
 
     Fields:
@@ -63,8 +65,8 @@ class BookingSchema(SQLAlchemyAutoSchema):
         if booking_end <= booking_start:
             raise ValidationError('Booking end cannot be earlier than booking start.')
 
-        if booking_end > booking_start + timedelta(hours=12):
-            raise ValidationError('Maximum booking duration is 12 hours.') 
+        if booking_end > booking_start + MAX_BOOKING_DURATION:
+            raise ValidationError(f'Maximum booking duration is {MAX_BOOKING_DURATION // timedelta(hours=1)} hours.') 
     
     @post_dump
     def serialise_fields(self, data, **kwargs):
@@ -85,7 +87,18 @@ class BookingSchema(SQLAlchemyAutoSchema):
             data['booking_end'] = datetime.strptime(end_str, r'%Y-%m-%dT%H:%M:%S%z').strftime(r'%Y-%m-%d %H:%M')
 
         return data
+    
+    #Equivalent of serialise_fields for the compiled many=True serialiser, formatting values directly without re-parsing
+    fast_dump_overrides = {
+        'booking_status': lambda status: status.name,
+        'booking_start': lambda start: start.strftime(r'%Y-%m-%d %H:%M'),
+        'booking_end': lambda end: end.strftime(r'%Y-%m-%d %H:%M')
+    }
 
 
 booking_schema = BookingSchema()
-bookings_schema = BookingSchema(many=True)
\ No newline at end of file
+bookings_schema = BookingSchema(many=True)
+
+#Lightweight representation of a booking without nested ship & dock, used when reporting conflicting bookings
+booking_summary_schema = BookingSchema(only=('id', 'booking_start', 'booking_end', 'booking_status'))
+bookings_summary_schema = BookingSchema(many=True, only=('id', 'booking_start', 'booking_end', 'booking_status'))
\ No newline at end of file
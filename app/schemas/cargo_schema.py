@@ -1,9 +1,10 @@
 from marshmallow_sqlalchemy import SQLAlchemyAutoSchema, auto_field
 from marshmallow import fields, validate
 
+from app.schemas.fast_dump import FastDumpMixin
 from app.model import CargoType
 
-class CargoSchema(SQLAlchemyAutoSchema):
+class CargoSchema(FastDumpMixin, SQLAlchemyAutoSchema):
     """Schema to define load & dump validation rules for the Cargo model
 
     Fields:
@@ -1,9 +1,10 @@
 from marshmallow_sqlalchemy import SQLAlchemyAutoSchema, auto_field
 from marshmallow import fields, validate
 
+from app.schemas.fast_dump import FastDumpMixin
 from app.model import Dock, DockCargo
 
-class DockSchema(SQLAlchemyAutoSchema):
+class DockSchema(FastDumpMixin, SQLAlchemyAutoSchema):
     """Schema to define load & dump validation rules for the Dock model
 
     Fields:
@@ -0,0 +1,115 @@
+from typing import Any, Callable
+
+from marshmallow import Schema, fields
+from marshmallow.decorators import PRE_DUMP, POST_DUMP
+
+from app.utils.instrumentation import timed
+
+_NOT_COMPILED = object()
+
+def _field_converter(field:fields.Field) -> Callable[[Any], Any] | None:
+    '''Get a function converting a (non-None) attribute value exactly as the field's _serialize method would,
+    or None if the field type is not supported by the compiled serialiser
+    '''
+    if isinstance(field, fields.Nested):
+        nested_serialiser = compile_serialiser(field.schema)
+        if nested_serialiser is None:
+            return None
+        if field.schema.many or field.many:
+            return lambda values: [nested_serialiser(value) for value in values]
+        return nested_serialiser
+
+    if isinstance(field, fields.List):
+        inner_converter = _field_converter(field.inner)
+        if inner_converter is None:
+            return None
+        return lambda values: [None if value is None else inner_converter(value) for value in values]
+
+    #Only compile fields whose serialisation has not been customised by a subclass
+    field_serialise = type(field)._serialize
+
+    if isinstance(field, fields.Integer) and field_serialise is fields.Number._serialize and not field.as_string:
+        return field.num_type
+    if isinstance(field, fields.String) and field_serialise is fields.String._serialize:
+        return str
+    if isinstance(field, fields.DateTime) and field_serialise is fields.DateTime._serialize:
+        data_format = field.format or field.DEFAULT_FORMAT
+        return field.SERIALIZATION_FUNCS.get(data_format) or (lambda value: value.strftime(data_format))
+
+    return None
+
+def compile_serialiser(schema:Schema) -> Callable[[Any], dict] | None:
+    '''Compile a function that dumps a single object identically to schema.dump(obj, many=False)
+
+    The function is generated once from the schema's dump fields (so only/exclude are respected), with each field read
+    directly from the object and converted inline, skipping marshmallow's per-field dispatch.
+    Schemas with pre/post dump hooks are only compiled if they declare fast_dump_overrides replacing those hooks.
+    The result is cached on the schema instance.
+
+    Returns:
+        Callable | None: The serialiser, or None if the schema uses unsupported fields or hooks
+    '''
+    compiled = schema.__dict__.get('_fast_serialiser', _NOT_COMPILED)
+    if compiled is not _NOT_COMPILED:
+        return compiled
+
+    #Mark as not compilable while compiling, in case of recursive nesting
+    schema._fast_serialiser = None
+
+    overrides = getattr(schema, 'fast_dump_overrides', {})
+    if (schema._hooks[PRE_DUMP] or schema._hooks[POST_DUMP]) and not overrides:
+        return None
+
+    namespace = {}
+    entries = []
+
+    for i, (field_name, field) in enumerate(schema.dump_fields.items()):
+        attr = field.attribute or field_name
+        converter = overrides.get(field_name) or _field_converter(field)
+        if converter is None or not attr.isidentifier():
+            return None
+
+        key = field.data_key if field.data_key is not None else field_name
+        namespace[f'_convert_{i}'] = converter
+        entries.append(f'        {key!r}: None if (value := obj.{attr}) is None else _convert_{i}(value),')
+
+    source = '\n'.join(['def serialise(obj):', '    return {', *entries, '    }'])
+    exec(compile(source, f'<compiled serialiser for {type(schema).__name__}>', 'exec'), namespace)
+
+    schema._fast_serialiser = namespace['serialise']
+    return schema._fast_serialiser
+
+def marshmallow_dump(schema:Schema, obj:Any, many:bool | None=None):
+    '''Dump using marshmallow's own implementation, bypassing the compiled serialiser
+    '''
+    return Schema.dump(schema, obj, many=many)
+
+def find_fast_dump_mismatches(schema:Schema, objs:list) -> list[int]:
+    '''Compare the compiled serialiser's output against marshmallow's for each object
+
+    Returns:
+        list[int]: Index of every object whose dumps differ
+    '''
+    fast_result = schema.dump(objs, many=True)
+    marshmallow_result = marshmallow_dump(schema, objs, many=True)
+    return [i for i, (fast, slow) in enumerate(zip(fast_result, marshmallow_result)) if fast != slow or list(fast) != list(slow)]
+
+class FastDumpMixin:
+    '''Schema mixin using a compiled serialiser for many=True dumps, falling back to marshmallow where it can't be compiled
+
+    Attributes:
+        fast_dump_overrides (dict): Field name to converter, used by the compiled serialiser in place of the field's
+            own serialisation. Must reproduce any pre/post dump hooks of the schema for those fields
+    '''
+    fast_dump_overrides: dict[str, Callable[[Any], Any]] = {}
+
+    def dump(self, obj:Any, *, many:bool | None=None):
+        many = self.many if many is None else bool(many)
+
+        with timed('serialise_ms'):
+            if many and obj is not None:
+                serialiser = compile_serialiser(self)
+                if serialiser is not None:
+                    return [serialiser(item) for item in obj]
+
+            return super().dump(obj, many=many)
@@ -0,0 +1,13 @@
+from .query_utils import schema_loader_options, schema_tables, sparse_schema
+from .pagination import paginate, paginated_response
+from .streaming import wants_stream, ndjson_response
+from .booking_window import load_booking_window
+from .scheduling import free_gaps, max_weight_schedule, allocate_docks
+from .booking_index import booking_index
+from .compatibility import compatibility_index
+from .conditional import conditional_get, varies_by_day, varies_by_now
+from .instrumentation import register_instrumentation
+from .metrics import register_metrics, metrics_registry, record_booking_conflict
+from .replica_router import replica_router
+from .idempotency import idempotent, after_commit
+from .solver_pool import solver_pool
@@ -0,0 +1,149 @@
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from threading import Lock
+from time import monotonic
+
+from flask import Flask
+from sqlalchemy import select
+
+from app.db import db
+from app.model import Booking
+
+def _naive(value:datetime) -> datetime:
+    '''Strip timezone info, so database (aware) and request (naive) booking times compare as wall clock times
+    '''
+    return value.replace(tzinfo=None)
+
+class _DockIntervals:
+    '''Sorted arrays of the confirmed bookings for one dock
+    Confirmed bookings on a dock never overlap, so sorting by start also sorts by end
+    '''
+    __slots__ = ('starts', 'ends', 'booking_ids', 'loaded_at')
+
+    def __init__(self, rows:list):
+        self.starts = [_naive(start) for _, start, _ in rows]
+        self.ends = [_naive(end) for _, _, end in rows]
+        self.booking_ids = [booking_id for booking_id, _, _ in rows]
+        self.loaded_at = monotonic()
+
+    def overlapping(self, start:datetime, end:datetime) -> list[int]:
+        '''Get the positions of all intervals overlapping [start, end)
+        '''
+        positions = []
+        i = bisect_right(self.ends, start)
+        while i < len(self.starts) and self.starts[i] < end:
+            positions.append(i)
+            i += 1
+        return positions
+
+    def pop(self, position:int):
+        del self.starts[position], self.ends[position], self.booking_ids[position]
+
+class BookingIntervalIndex:
+    '''Per-worker index of CONFIRMED bookings for each dock, used to reject obvious booking conflicts before touching the database
+
+    Each dock's upcoming confirmed bookings are loaded lazily on first use, kept up to date by the booking write routes
+    of this worker, and reloaded once older than BOOKING_INDEX_TTL seconds to pick up writes made by other workers.
+    Callers confirm hits against the database before rejecting a booking, and the
+    exclude_overlapping_confirmed_bookings_per_dock constraint remains the source of truth.
+
+    Config:
+        BOOKING_INDEX_ENABLED (bool): Enable the index. When disabled every method is a no-op
+        BOOKING_INDEX_TTL (int): Seconds before a dock's cached bookings are reloaded
+    '''
+    def __init__(self):
+        self.enabled = False
+        self.ttl = 30
+        self._docks: dict[int, _DockIntervals] = {}
+        self._lock = Lock()
+
+    def init_app(self, app:Flask):
+        self.enabled = app.config.get('BOOKING_INDEX_ENABLED', False)
+        self.ttl = app.config.get('BOOKING_INDEX_TTL', self.ttl)
+
+    def _get_dock(self, dock_id:int) -> _DockIntervals:
+        intervals = self._docks.get(dock_id)
+        if intervals is not None and monotonic() - intervals.loaded_at < self.ttl:
+            return intervals
+
+        #New bookings cannot start before today, so only bookings ending today or later can conflict
+        today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        stmt = select(Booking.id, Booking.booking_start, Booking.booking_end).where(
+            (Booking.dock_id == dock_id)
+            & (Booking.booking_status == 'CONFIRMED')
+            & (Booking.booking_end > today)
+        ).order_by(Booking.booking_start)
+
+        intervals = _DockIntervals(db.session.execute(stmt).all())
+        with self._lock:
+            self._docks[dock_id] = intervals
+        return intervals
+
+    def overlaps(self, dock_id:int, start:datetime, end:datetime, ignore_id:int | None=None) -> list[tuple[int, datetime, datetime]]:
+        '''Get all indexed confirmed bookings on the dock that overlap [start, end)
+
+        Args:
+            dock_id: ID of the dock to check
+            start: Start of the proposed booking
+            end: End of the proposed booking
+            ignore_id: ID of a booking to leave out of the results, e.g. the booking being updated
+
+        Returns:
+            list[tuple]: (booking_id, booking_start, booking_end) of each overlapping booking, in start order
+        '''
+        if not self.enabled:
+            return []
+
+        intervals = self._get_dock(dock_id)
+        with self._lock:
+            return [
+                (intervals.booking_ids[i], intervals.starts[i], intervals.ends[i])
+                for i in intervals.overlapping(_naive(start), _naive(end))
+                if intervals.booking_ids[i] != ignore_id
+            ]
+
+    def add(self, dock_id:int, booking_id:int, start:datetime, end:datetime):
+        '''Record a committed confirmed booking, replacing any previous entry for the same booking.
+        Any other overlapping entries must be stale, and are dropped
+        '''
+        if not self.enabled or dock_id not in self._docks:
+            return
+
+        start, end = _naive(start), _naive(end)
+        with self._lock:
+            intervals = self._docks[dock_id]
+            if booking_id in intervals.booking_ids:
+                intervals.pop(intervals.booking_ids.index(booking_id))
+            for position in reversed(intervals.overlapping(start, end)):
+                intervals.pop(position)
+
+            position = bisect_left(intervals.starts, start)
+            intervals.starts.insert(position, start)
+            intervals.ends.insert(position, end)
+            intervals.booking_ids.insert(position, booking_id)
+
+    def remove(self, dock_id:int, booking_id:int):
+        '''Drop a booking that was deleted or is no longer confirmed
+        '''
+        if not self.enabled or dock_id not in self._docks:
+            return
+
+        with self._lock:
+            intervals = self._docks[dock_id]
+            if booking_id in intervals.booking_ids:
+                intervals.pop(intervals.booking_ids.index(booking_id))
+
+    def invalidate(self, *dock_ids:int):
+        '''Discard cached bookings for the supplied docks, so they are reloaded on next use
+        '''
+        with self._lock:
+            for dock_id in dock_ids:
+                self._docks.pop(dock_id, None)
+
+    def clear(self):
+        '''Discard cached bookings for every dock
+        '''
+        with self._lock:
+            self._docks.clear()
+
+booking_index = BookingIntervalIndex()
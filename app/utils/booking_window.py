@@ -0,0 +1,81 @@
+from datetime import datetime
+
+from flask import request
+from marshmallow import Schema
+from sqlalchemy import func, select
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.db import db
+from app.errors import QueryParamError
+from app.model import Booking
+from app.model.booking_model import MAX_BOOKING_DURATION
+from app.utils.pagination import DEFAULT_PAGE_LIMIT, MAX_PAGE_LIMIT
+from app.utils.query_utils import schema_loader_options
+
+def _booking_window_params() -> tuple[datetime, datetime | None, int]:
+    '''Parse the bookings_from, bookings_to & bookings_limit query params of the current request
+    '''
+    q_from_time = request.args.get('bookings_from')
+    q_to_time = request.args.get('bookings_to')
+    limit = request.args.get('bookings_limit', DEFAULT_PAGE_LIMIT, type=int)
+
+    try:
+        from_time = datetime.strptime(q_from_time, r'%Y-%m-%d %H:%M') if q_from_time else datetime.now()
+        to_time = datetime.strptime(q_to_time, r'%Y-%m-%d %H:%M') if q_to_time else None
+    except ValueError:
+        raise QueryParamError('Invalid input supplied. bookings_from and bookings_to must match format: YYYY-MM-DD HH:MM')
+
+    if not 0 < limit <= MAX_PAGE_LIMIT:
+        raise QueryParamError(f'bookings_limit must be between 1 and {MAX_PAGE_LIMIT}.')
+
+    return from_time, to_time, limit
+
+def load_booking_window(parent, schema:Schema) -> int | None:
+    '''Load a dock or ship's bookings collection with only the bookings in the current request's window,
+    if the schema dumps bookings. Load the parent with schema_loader_options(..., skip=(Model.bookings,)) so the full
+    collection is not also loaded
+
+    Bookings overlapping [bookings_from, bookings_to) are fetched in one query ordered by booking_start,
+    up to bookings_limit, with count() over () giving the number of matches cut off by the limit.
+    The window defaults to upcoming bookings: those ending after now.
+
+    Query Params (All optional):
+        bookings_from (datetime): Start of the window, in format YYYY-MM-DD HH:MM. Defaults to now
+        bookings_to (datetime): End of the window, in format YYYY-MM-DD HH:MM. Defaults to no end
+        bookings_limit (int): Maximum number of bookings to include. Defaults to 100
+
+    Args:
+        parent: The Dock or Ship instance
+        schema: The schema that will dump the parent
+
+    Returns:
+        int | None: Number of bookings in the window omitted by the limit, or None if the schema doesn't dump bookings
+    '''
+    bookings_field = schema.dump_fields.get('bookings')
+    if bookings_field is None:
+        return None
+
+    from_time, to_time, limit = _booking_window_params()
+
+    #Bookings' FK to the parent (dock_id or ship_id), from the relationship's join condition
+    relationship = type(parent).bookings.property
+    [(parent_column, booking_column)] = relationship.local_remote_pairs
+
+    #Bookings are dumped as List(Nested(BookingSchema))
+    booking_schema = bookings_field.inner.schema
+
+    stmt = select(Booking, func.count().over()) \
+        .options(*schema_loader_options(Booking, booking_schema)) \
+        .where(booking_column == getattr(parent, parent_column.key)) \
+        .where(Booking.booking_end > from_time) \
+        .where(Booking.booking_start > from_time - MAX_BOOKING_DURATION) \
+        .order_by(Booking.booking_start, Booking.id) \
+        .limit(limit)
+    if to_time:
+        stmt = stmt.where(Booking.booking_start < to_time)
+
+    rows = db.session.execute(stmt).all()
+    set_committed_value(parent, 'bookings', [booking for booking, _ in rows])
+
+    #Every row carries the window's total count, computed before the limit
+    return rows[0][1] - len(rows) if rows else 0
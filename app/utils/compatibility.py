@@ -0,0 +1,196 @@
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from threading import Lock
+from time import monotonic
+from typing import NamedTuple
+
+from flask import Flask, g
+from sqlalchemy import select
+
+from app.db import db
+from app.model import Dock, DockCargo, Ship, TableVersion
+
+#Tables the cache is built from, whose table_versions stamps decide whether it is current
+COMPATIBILITY_TABLES = (Dock.__tablename__, DockCargo.__tablename__, Ship.__tablename__)
+
+class DockEntry(NamedTuple):
+    id: int
+    dock_code: str
+    dock_length: int
+    cargo_mask: int
+
+class ShipEntry(NamedTuple):
+    id: int
+    ship_name: str
+    ship_length: int
+    cargo_type_id: int
+    company_id: int
+
+class _Snapshot:
+    '''Immutable compatibility structure, rebuilt as a whole and swapped in atomically
+
+    Fields:
+        docks: Dock entries by ID
+        docks_by_length: Dock entries sorted by dock_length
+        dock_lengths: dock_length of each entry in docks_by_length, for bisecting
+        ships: Ship entries by ID
+        ships_by_cargo: For each cargo type ID, ship entries sorted by ship_length, and their lengths for bisecting
+        cargo_type_ids: IDs of the cargo types accepted by any dock, the only bits set in the docks' masks
+        versions: table_versions stamps of the source tables, read before the snapshot was loaded
+    '''
+    def __init__(self, docks:list[DockEntry], ships:list[ShipEntry], cargo_type_ids:set[int], versions:tuple):
+        self.docks = {dock.id: dock for dock in docks}
+        self.docks_by_length = sorted(docks, key=lambda dock: (dock.dock_length, dock.id))
+        self.dock_lengths = [dock.dock_length for dock in self.docks_by_length]
+
+        self.ships = {ship.id: ship for ship in ships}
+        self.ships_by_cargo = {}
+        grouped = defaultdict(list)
+        for ship in ships:
+            grouped[ship.cargo_type_id].append(ship)
+        for cargo_type_id, cargo_ships in grouped.items():
+            cargo_ships.sort(key=lambda ship: (ship.ship_length, ship.id))
+            self.ships_by_cargo[cargo_type_id] = (cargo_ships, [ship.ship_length for ship in cargo_ships])
+        self.cargo_type_ids = cargo_type_ids
+        self.versions = versions
+        self.loaded_at = monotonic()
+
+class CompatibilityIndex:
+    '''Per-worker cache of which ships can use which docks
+
+    Each dock's accepted cargo types are encoded as a bitmask (bit n set = accepts cargo type ID n), and docks are kept
+    sorted by dock_length, so compatibility is a bisect plus a bit test. Built on first use with a query per table.
+    The table_versions stamps of docks, dock_cargo & ships are compared with those the cache was built from, rebuilding
+    it when writes made by any worker changed them. Unknown ship & dock IDs are answered as missing without a rebuild.
+
+    Lookups made to validate writes, or for responses tagged with table versions (fresh=True), check the stamps once
+    per request. Other lookups check them at most once per COMPATIBILITY_CHECK_INTERVAL seconds, so are usually
+    answered without touching the database. The cache is also rebuilt after COMPATIBILITY_CACHE_TTL seconds,
+    which bounds staleness if the table_versions triggers are missing.
+
+    Config:
+        COMPATIBILITY_CACHE_TTL (int): Seconds before the cache is rebuilt regardless of the table_versions stamps
+        COMPATIBILITY_CHECK_INTERVAL (int): Seconds between stamp checks for lookups that don't need to be fresh
+    '''
+    def __init__(self):
+        self.ttl = 300
+        self.check_interval = 1
+        self._snapshot: _Snapshot | None = None
+        self._checked_at = 0.0
+        self._lock = Lock()
+
+    def init_app(self, app:Flask):
+        self.ttl = app.config.get('COMPATIBILITY_CACHE_TTL', self.ttl)
+        self.check_interval = app.config.get('COMPATIBILITY_CHECK_INTERVAL', self.check_interval)
+
+    def _versions(self) -> tuple:
+        stmt = select(TableVersion.table_name, TableVersion.version) \
+            .where(TableVersion.table_name.in_(COMPATIBILITY_TABLES)) \
+            .order_by(TableVersion.table_name)
+        return tuple(db.session.execute(stmt).all())
+
+    def _load(self) -> _Snapshot:
+        #Versions are read first, so a write made during the load leaves the snapshot behind & is picked up next request
+        versions = self._versions()
+        masks = defaultdict(int)
+        cargo_type_ids = set()
+        for dock_id, cargo_type_id in db.session.execute(select(DockCargo.dock_id, DockCargo.cargo_type_id)):
+            masks[dock_id] |= 1 << cargo_type_id
+            cargo_type_ids.add(cargo_type_id)
+
+        docks = [
+            DockEntry(dock_id, dock_code, dock_length, masks[dock_id])
+            for dock_id, dock_code, dock_length in db.session.execute(select(Dock.id, Dock.dock_code, Dock.dock_length))
+        ]
+        ships = [
+            ShipEntry(*row)
+            for row in db.session.execute(select(Ship.id, Ship.ship_name, Ship.ship_length, Ship.cargo_type_id, Ship.company_id))
+        ]
+        return _Snapshot(docks, ships, cargo_type_ids, versions)
+
+    def _get_snapshot(self, fresh:bool=False) -> _Snapshot:
+        '''Get the current snapshot, rebuilding it if expired, or if the source tables' versions changed since it was built
+
+        Args:
+            fresh: Check the versions on the first use in the current request (or app context), rather than at most
+                once per check_interval
+        '''
+        snapshot = self._snapshot
+        now = monotonic()
+        if snapshot is not None and now - snapshot.loaded_at < self.ttl:
+            if g.get('compatibility_checked') or (not fresh and now - self._checked_at < self.check_interval):
+                return snapshot
+            g.compatibility_checked = True
+            self._checked_at = now
+            if self._versions() == snapshot.versions:
+                return snapshot
+
+        with self._lock:
+            #Another thread may have rebuilt the snapshot while this one waited for the lock
+            if self._snapshot is snapshot:
+                self._snapshot = self._load()
+            snapshot = self._snapshot
+        g.compatibility_checked = True
+        self._checked_at = monotonic()
+        return snapshot
+
+    def dock_accepts(self, dock_id:int, cargo_type_id:int) -> bool:
+        '''Check whether a dock accepts a cargo type. Checked against fresh data, for validating writes
+
+        Returns:
+            bool: False if the dock doesn't accept the cargo type, or is missing from the cache
+        '''
+        dock = self._get_snapshot(fresh=True).docks.get(dock_id)
+        return dock is not None and bool(dock.cargo_mask >> cargo_type_id & 1)
+
+    def docks_accepting(self, cargo_type_ids:list[int]) -> list[int]:
+        '''Get the IDs of all docks accepting any of the supplied cargo types, checked against fresh data.
+        Cargo types no dock accepts are ignored
+        '''
+        snapshot = self._get_snapshot(fresh=True)
+        mask = 0
+        for cargo_type_id in snapshot.cargo_type_ids.intersection(cargo_type_ids):
+            mask |= 1 << cargo_type_id
+        return [dock.id for dock in snapshot.docks.values() if dock.cargo_mask & mask]
+
+    def compatible_docks(self, ship_id:int, fresh:bool=False) -> list[DockEntry] | None:
+        '''Get all docks a ship can use: long enough for the ship and accepting its cargo type. Sorted by dock_length
+
+        Args:
+            ship_id: ID of the ship
+            fresh: Check the cache against the database in this request, e.g. when allocating bookings
+
+        Returns:
+            list[DockEntry] | None: The compatible docks, or None if the ship does not exist
+        '''
+        snapshot = self._get_snapshot(fresh)
+        ship = snapshot.ships.get(ship_id)
+        if ship is None:
+            return None
+
+        start = bisect_left(snapshot.dock_lengths, ship.ship_length)
+        return [dock for dock in snapshot.docks_by_length[start:] if dock.cargo_mask >> ship.cargo_type_id & 1]
+
+    def compatible_ships(self, dock_id:int) -> list[ShipEntry] | None:
+        '''Get all ships that can use a dock: no longer than the dock and carrying a cargo type it accepts. Sorted by ID
+
+        Returns:
+            list[ShipEntry] | None: The compatible ships, or None if the dock does not exist
+        '''
+        snapshot = self._get_snapshot()
+        dock = snapshot.docks.get(dock_id)
+        if dock is None:
+            return None
+
+        ships = []
+        for cargo_type_id, (cargo_ships, lengths) in snapshot.ships_by_cargo.items():
+            if dock.cargo_mask >> cargo_type_id & 1:
+                ships.extend(cargo_ships[:bisect_right(lengths, dock.dock_length)])
+        return sorted(ships, key=lambda ship: ship.id)
+
+    def invalidate(self):
+        '''Discard the cache, so it is rebuilt on next use, including later in the current request
+        '''
+        self._snapshot = None
+
+compatibility_index = CompatibilityIndex()
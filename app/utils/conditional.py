@@ -0,0 +1,75 @@
+from datetime import date
+from functools import wraps
+from hashlib import sha1
+from typing import Callable
+
+from flask import current_app, make_response, request
+from sqlalchemy import select
+
+from app.db import db
+from app.model import TableVersion
+
+def varies_by_day(*params:str) -> Callable[[], str]:
+    '''time_key for routes defaulting to today (or clamping times to today) unless every one of params is supplied
+    '''
+    def time_key():
+        return '' if params and all(request.args.get(param) for param in params) else date.today().isoformat()
+    return time_key
+
+def varies_by_now(*params:str) -> Callable[[], str | None]:
+    '''time_key for routes defaulting to the current time unless every one of params is supplied.
+    The response can change at any moment without a write, so conditional handling is skipped
+    '''
+    def time_key():
+        return '' if all(request.args.get(param) for param in params) else None
+    return time_key
+
+def conditional_get(*table_names:str, time_key:Callable[[], str | None] | None=None):
+    '''Decorator adding ETag & Last-Modified headers to a GET route, answering 304 Not Modified when the client's copy is current
+
+    The ETag is derived from the table_versions stamps of every table the response reads, plus the request path & query,
+    so a single indexed lookup decides whether the route needs to run its query and dump at all.
+
+    Args:
+        table_names: Names of every table the route's response is built from, e.g. from schema_tables()
+        time_key: For routes whose defaults depend on the current date / time, a function returning the resolved value
+            for the current request, added to the ETag (Last-Modified is then omitted, as it can't reflect it).
+            Returns '' when the request doesn't depend on the time, or None to skip conditional handling
+    '''
+    stmt = select(TableVersion.table_name, TableVersion.version, TableVersion.updated_at) \
+        .where(TableVersion.table_name.in_(table_names)) \
+        .order_by(TableVersion.table_name)
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            time_value = time_key() if time_key else ''
+            if time_value is None:
+                return view(*args, **kwargs)
+
+            versions = db.session.execute(stmt).all()
+
+            tag_source = f"{request.full_path}|{request.headers.get('Accept', '')}|{time_value}|" \
+                + ','.join(f'{table_name}:{version}' for table_name, version, _ in versions)
+            etag = sha1(tag_source.encode()).hexdigest()
+            last_modified = None if time_value else max((updated_at for _, _, updated_at in versions), default=None)
+
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains_weak(etag)
+            else:
+                not_modified = bool(last_modified and request.if_modified_since
+                    and last_modified.replace(microsecond=0) <= request.if_modified_since)
+
+            if not_modified:
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            
+            response.set_etag(etag)
+            if last_modified:
+                response.last_modified = last_modified
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,157 @@
+from datetime import timedelta
+from functools import wraps
+from hashlib import sha256
+
+from flask import Response, current_app, g, jsonify, make_response, request
+from psycopg2 import errorcodes
+from sqlalchemy import func, select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import OperationalError
+
+from app.db import db
+from app.model import IdempotencyKey
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+
+def _request_hash() -> str:
+    '''Hash the current request's method, path & raw body, identifying the request a key was first used for
+    '''
+    return sha256(f'{request.method} {request.path}\n'.encode() + request.get_data()).hexdigest()
+
+def _claim_stmt(key:str, request_hash:str, ttl:timedelta):
+    '''Insert a pending row for the key, or take over an expired one, returning the key if claimed
+
+    While the claiming transaction is open the row stays locked, so the same statement from a concurrent request with
+    the key waits for it to commit (then returns nothing) or roll back (then claims the key itself)
+    '''
+    stmt = insert(IdempotencyKey).values(
+        idempotency_key=key,
+        request_hash=request_hash,
+        created_at=func.now(),
+        expires_at=func.now() + ttl
+    )
+    return stmt.on_conflict_do_update(
+        index_elements=[IdempotencyKey.idempotency_key],
+        set_={
+            'request_hash': stmt.excluded.request_hash,
+            'status_code': None,
+            'response_body': None,
+            'content_type': None,
+            'created_at': stmt.excluded.created_at,
+            'expires_at': stmt.excluded.expires_at
+        },
+        where=IdempotencyKey.expires_at < func.now()
+    ).returning(IdempotencyKey.idempotency_key)
+
+def after_commit(func, *args):
+    '''Call func(*args) once the current request's writes are committed, e.g. to update in-process caches.
+    Inside an idempotent view the writes are only committed with the stored response, so the call is queued until then,
+    and dropped if the transaction is rolled back. Elsewhere the route has already committed, so func is called now
+    '''
+    if g.get('db_connection') is None:
+        func(*args)
+    else:
+        g.after_commit_callbacks.append((func, args))
+
+def _run_view(view, args, kwargs, conn) -> Response:
+    '''Run the view in the transaction of conn, letting the app's error handlers turn handled exceptions
+    (e.g. validation errors) into responses, so they are stored & replayed like any other response.
+    Unhandled exceptions are raised
+
+    db.session joins the transaction with a savepoint (see RoutingSession), so the view's commits are only committed
+    with the transaction, together with the stored response. Calls the view queues with after_commit are left in
+    g.after_commit_callbacks
+    '''
+    #Any transaction the session began before the view is on another connection
+    db.session.close()
+    g.db_connection = conn
+    g.after_commit_callbacks = []
+    try:
+        return make_response(view(*args, **kwargs))
+    except Exception as e:
+        return make_response(current_app.handle_user_exception(e))
+    finally:
+        db.session.close()
+        g.pop('db_connection')
+
+def _replay(stored) -> Response:
+    response = current_app.response_class(stored.response_body, status=stored.status_code, content_type=stored.content_type)
+    response.headers[REPLAYED_HEADER] = 'true'
+    return response
+
+def idempotent(view):
+    '''Decorator honouring an Idempotency-Key header on a POST route, so a retried request replays the first response
+    instead of running again
+
+    The key is claimed in idempotency_keys and the view runs in the same transaction, on a single connection.
+    The response (any status below 500) is then stored, and committed in one go with the claim & the view's writes,
+    so a key is never left without its response, nor the writes without the key. A concurrent request with the same key
+    blocks on the claimed row until then, for up to IDEMPOTENCY_WAIT_SECONDS, and replays the stored response.
+    If the view raises, everything is rolled back and the key can be retried. For a 5xx or streamed response the view's
+    writes are committed, without storing the response or the key. Cache updates the view queued with after_commit
+    run once the transaction is committed. Requests without the header run as normal.
+
+    Responses:
+        Replayed responses have the Idempotent-Replayed: true header
+        409 if the first request with the key is still running after IDEMPOTENCY_WAIT_SECONDS
+        422 if the key was already used for a different method, path or body
+
+    Config:
+        IDEMPOTENCY_KEY_TTL (int): Hours a stored response is replayed for. Expired keys can be reused,
+            and are deleted by flask db purge-idempotency-keys
+        IDEMPOTENCY_WAIT_SECONDS (int): Seconds a request waits for a concurrent request with the same key
+    '''
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if key is None:
+            return view(*args, **kwargs)
+
+        if not 0 < len(key) <= MAX_KEY_LENGTH:
+            return jsonify({'message': f'{IDEMPOTENCY_HEADER} must be between 1 and {MAX_KEY_LENGTH} characters.'}), 400
+
+        request_hash = _request_hash()
+        ttl = timedelta(hours=current_app.config.get('IDEMPOTENCY_KEY_TTL', 24))
+        wait_seconds = current_app.config.get('IDEMPOTENCY_WAIT_SECONDS', 30)
+
+        #Closing the connection without committing rolls back the claim & the view's writes
+        with db.engine.connect() as conn:
+            conn.execute(select(func.set_config('lock_timeout', f'{wait_seconds * 1000}ms', True)))
+            try:
+                claimed = conn.scalar(_claim_stmt(key, request_hash, ttl))
+            except OperationalError as e:
+                if e.orig.pgcode != errorcodes.LOCK_NOT_AVAILABLE:
+                    raise e
+                response = jsonify({'message': f'A request with this {IDEMPOTENCY_HEADER} is still in progress. Retry later.'})
+                response.headers['Retry-After'] = str(wait_seconds)
+                return response, 409
+
+            if claimed is None:
+                stored = conn.execute(select(IdempotencyKey.__table__).where(IdempotencyKey.idempotency_key == key)).one()
+                if stored.request_hash != request_hash:
+                    return jsonify({'message': f'{IDEMPOTENCY_HEADER} has already been used for a different request.'}), 422
+                return _replay(stored)
+
+            #The wait only applies to the claim, not to the view's statements
+            conn.execute(text('SET LOCAL lock_timeout TO DEFAULT'))
+
+            try:
+                response = _run_view(view, args, kwargs, conn)
+                if response.status_code >= 500 or response.is_streamed:
+                    conn.execute(IdempotencyKey.__table__.delete().where(IdempotencyKey.idempotency_key == key))
+                else:
+                    conn.execute(
+                        IdempotencyKey.__table__.update()
+                        .where(IdempotencyKey.idempotency_key == key)
+                        .values(status_code=response.status_code, response_body=response.get_data(as_text=True), content_type=response.content_type)
+                    )
+                conn.commit()
+            finally:
+                callbacks = g.pop('after_commit_callbacks', [])
+
+        for callback, callback_args in callbacks:
+            callback(*callback_args)
+        return response
+    return wrapper
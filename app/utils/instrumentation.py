@@ -0,0 +1,160 @@
+import logging
+from contextlib import contextmanager
+from heapq import nlargest
+from json import dumps
+from time import perf_counter
+
+from flask import Flask, Response, g, has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+slow_request_logger = logging.getLogger('app.slow_requests')
+
+class RequestTiming:
+    '''Timings accumulated over a single request
+
+    Fields:
+        started: perf_counter value when the request started
+        statements: (duration_ms, statement) of each SQL statement executed
+        db_ms: Total time spent executing SQL statements
+        serialise_ms: Total time spent dumping objects with marshmallow schemas (including any lazy loads it fires)
+        json_ms: Total time spent encoding JSON
+    '''
+    __slots__ = ('started', 'statements', 'db_ms', 'serialise_ms', 'json_ms', '_active')
+
+    def __init__(self):
+        self.started = perf_counter()
+        self.statements: list[tuple[float, str]] = []
+        self.db_ms = 0.0
+        self.serialise_ms = 0.0
+        self.json_ms = 0.0
+        self._active = set()
+
+    def total_ms(self) -> float:
+        return (perf_counter() - self.started) * 1000
+
+def current_timing() -> RequestTiming | None:
+    '''Get the timings of the current request, or None outside of a request
+    '''
+    if not has_request_context():
+        return None
+    return g.get('request_timing')
+
+@contextmanager
+def timed(metric:str):
+    '''Add the time spent in the block to a metric of the current request (serialise_ms or json_ms).
+    Nested blocks for the same metric, e.g. a schema dumping a nested schema, are only counted once
+    '''
+    timing = current_timing()
+    if timing is None or metric in timing._active:
+        yield
+        return
+
+    timing._active.add(metric)
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        setattr(timing, metric, getattr(timing, metric) + (perf_counter() - start) * 1000)
+        timing._active.discard(metric)
+
+#The start time is kept on the statement's execution context, which is discarded whether or not the statement succeeds
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._query_start_time = perf_counter()
+
+def _record_statement(context, statement:str):
+    start = getattr(context, '_query_start_time', None)
+    timing = current_timing()
+    if start is not None and timing is not None:
+        duration = (perf_counter() - start) * 1000
+        timing.db_ms += duration
+        timing.statements.append((duration, statement))
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    _record_statement(context, statement)
+
+def _handle_error(exception_context):
+    #Failed statements (e.g. lock timeouts) are timed too, as after_cursor_execute doesn't fire for them
+    if exception_context.execution_context is not None:
+        _record_statement(exception_context.execution_context, exception_context.statement)
+
+class TimedJSONProvider(DefaultJSONProvider):
+    '''JSON provider adding the time spent encoding to the current request's timings
+    '''
+    def dumps(self, obj, **kwargs) -> str:
+        with timed('json_ms'):
+            return super().dumps(obj, **kwargs)
+
+def server_timing_header(timing:RequestTiming) -> str:
+    '''Format request timings as a Server-Timing header value
+    '''
+    return ', '.join((
+        f'db;dur={timing.db_ms:.2f};desc="{len(timing.statements)} statements"',
+        f'serialise;dur={timing.serialise_ms:.2f}',
+        f'json;dur={timing.json_ms:.2f}',
+        f'total;dur={timing.total_ms():.2f}'
+    ))
+
+def _log_if_slow(timing:RequestTiming, method:str, path:str, endpoint:str | None, status:int, threshold_ms:int, top:int):
+    total_ms = timing.total_ms()
+    if total_ms < threshold_ms:
+        return
+
+    slow_request_logger.warning(dumps({
+        'method': method,
+        'path': path,
+        'endpoint': endpoint,
+        'status': status,
+        'total_ms': round(total_ms, 2),
+        'db_ms': round(timing.db_ms, 2),
+        'serialise_ms': round(timing.serialise_ms, 2),
+        'json_ms': round(timing.json_ms, 2),
+        'statement_count': len(timing.statements),
+        'top_statements': [
+            {'duration_ms': round(duration, 2), 'statement': statement}
+            for duration, statement in nlargest(top, timing.statements, key=lambda item: item[0])
+        ]
+    }))
+
+def register_instrumentation(app:Flask):
+    '''Time SQL statements, serialisation and JSON encoding for every request
+
+    The timings are returned in a Server-Timing header, and requests slower than SLOW_REQUEST_MS are logged as JSON
+    to the app.slow_requests logger with their slowest statements. Streamed responses are logged once fully sent,
+    but their Server-Timing header only covers the time before streaming started.
+
+    Config:
+        SLOW_REQUEST_MS (int | None): Threshold for the slow request log. None disables the log
+        SLOW_REQUEST_TOP_STATEMENTS (int): Number of statements included in each slow request log entry
+    '''
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _handle_error)
+
+    app.json = TimedJSONProvider(app)
+
+    if app.config.get('SLOW_REQUEST_MS') is not None and not slow_request_logger.handlers:
+        slow_request_logger.addHandler(logging.StreamHandler())
+        slow_request_logger.setLevel(logging.WARNING)
+
+    @app.before_request
+    def start_request_timing():
+        g.request_timing = RequestTiming()
+
+    @app.after_request
+    def add_server_timing(response:Response):
+        timing = current_timing()
+        if timing is None:
+            return response
+
+        response.headers['Server-Timing'] = server_timing_header(timing)
+
+        threshold_ms = app.config.get('SLOW_REQUEST_MS')
+        if threshold_ms is not None:
+            #The request context may already be gone when a streamed response is closed, so capture its details now
+            details = (request.method, request.full_path, request.endpoint, response.status_code)
+            top = app.config.get('SLOW_REQUEST_TOP_STATEMENTS', 5)
+            response.call_on_close(lambda: _log_if_slow(timing, *details, threshold_ms, top))
+        return response
@@ -0,0 +1,95 @@
+from os import environ
+
+from flask import Flask, Response, g, got_request_exception, has_request_context, request
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, multiprocess
+from sqlalchemy.pool import QueuePool
+
+from app.db import db
+from app.utils.instrumentation import current_timing
+
+REQUEST_COUNT = Counter(
+    'http_requests_total', 'HTTP requests handled',
+    ('method', 'endpoint', 'status')
+)
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', 'HTTP request latency until the response is returned by the view',
+    ('method', 'endpoint'),
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+REQUEST_EXCEPTIONS = Counter(
+    'http_request_exceptions_total', 'Unhandled exceptions raised by views',
+    ('endpoint', 'exception')
+)
+ROWS_RETURNED = Histogram(
+    'http_response_rows', 'Rows returned per list request',
+    ('endpoint',),
+    buckets=(0, 1, 10, 50, 100, 250, 500, 1000, 5000, 10000, 50000)
+)
+BOOKING_CONFLICTS = Counter(
+    'booking_conflicts_total', 'Bookings rejected for overlapping a confirmed booking on the same dock',
+    ('source',)
+)
+POOL_SIZE = Gauge('db_pool_size', 'Connections kept open by the pools of all live workers', multiprocess_mode='livesum')
+POOL_CHECKED_OUT = Gauge('db_pool_checked_out', 'Connections checked out from the pools of all live workers', multiprocess_mode='livesum')
+POOL_OVERFLOW = Gauge('db_pool_overflow', 'Overflow connections open in the pools of all live workers', multiprocess_mode='livesum')
+
+def record_rows(count:int):
+    '''Record the number of rows returned by the current (list) request
+    '''
+    if has_request_context():
+        g.rows_returned = g.get('rows_returned', 0) + count
+
+def record_streamed_rows(count:int):
+    '''Record the number of rows sent by a streamed response, which finishes after the request metrics are recorded
+    '''
+    ROWS_RETURNED.labels(request.endpoint or 'unmatched').observe(count)
+
+def record_booking_conflict(source:str):
+    '''Count a booking rejected for a conflict, found by the database exclusion constraint or the in-process booking index
+
+    Args:
+        source: database or index
+    '''
+    BOOKING_CONFLICTS.labels(source).inc()
+
+def metrics_registry() -> CollectorRegistry:
+    '''Get the registry to expose. When PROMETHEUS_MULTIPROC_DIR is set (e.g. under gunicorn),
+    metrics are aggregated across every worker from the files in that directory
+    '''
+    if not environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        return REGISTRY
+
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+def _update_pool_gauges():
+    pool = db.engine.pool
+    if isinstance(pool, QueuePool):
+        POOL_SIZE.set(pool.size())
+        POOL_CHECKED_OUT.set(pool.checkedout())
+        POOL_OVERFLOW.set(max(pool.overflow(), 0))
+
+def register_metrics(app:Flask):
+    '''Record request count, latency, unhandled exceptions, rows returned & DB pool usage for every request.
+    Must be registered after the request instrumentation, which supplies the request start time
+    '''
+    @app.after_request
+    def record_request_metrics(response:Response):
+        #Unmatched URLs share a label, so arbitrary paths cannot create new time series
+        endpoint = request.endpoint or 'unmatched'
+
+        REQUEST_COUNT.labels(request.method, endpoint, response.status_code).inc()
+        timing = current_timing()
+        if timing is not None:
+            REQUEST_LATENCY.labels(request.method, endpoint).observe(timing.total_ms() / 1000)
+        if 'rows_returned' in g:
+            ROWS_RETURNED.labels(endpoint).observe(g.rows_returned)
+
+        _update_pool_gauges()
+        return response
+
+    def record_exception(sender:Flask, exception:Exception, **extra):
+        REQUEST_EXCEPTIONS.labels(request.endpoint or 'unmatched', type(exception).__name__).inc()
+
+    got_request_exception.connect(record_exception, app, weak=False)
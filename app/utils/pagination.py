@@ -0,0 +1,90 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+from datetime import datetime
+
+from flask import request, jsonify
+from sqlalchemy import Select, tuple_
+from marshmallow import Schema
+
+from app.errors import QueryParamError
+from app.utils.metrics import record_rows
+
+DEFAULT_PAGE_LIMIT = 100
+MAX_PAGE_LIMIT = 1000
+
+def encode_cursor(values:list) -> str:
+    '''Encode the keyset values of the last row on a page into an opaque cursor string
+    '''
+    serialised = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return urlsafe_b64encode(json.dumps(serialised).encode()).decode()
+
+def decode_cursor(cursor:str, columns:tuple) -> tuple:
+    '''Decode a cursor string produced by encode_cursor back into typed keyset values for the supplied columns
+    '''
+    try:
+        values = json.loads(urlsafe_b64decode(cursor.encode()))
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError
+
+        return tuple(
+            datetime.fromisoformat(value) if column.type.python_type is datetime else column.type.python_type(value)
+            for column, value in zip(columns, values)
+        )
+    except (ValueError, TypeError, BinasciiError):
+        raise QueryParamError('Invalid cursor supplied. Use the next_cursor value returned by the previous page.')
+
+def paginate(stmt:Select, columns:tuple) -> tuple[Select, int | None]:
+    '''Apply keyset pagination to a select statement, using the limit & cursor query params of the current request
+
+    Results are always ordered by the supplied columns, which must together be unique and should be indexed.
+    One extra row is requested beyond the limit so paginated_response can tell whether another page exists.
+
+    Args:
+        stmt: The select statement to paginate
+        columns: The model attributes to order & page on, e.g. (Booking.booking_start, Booking.id)
+
+    Returns:
+        tuple: The paginated statement, and the page limit (None if pagination was not requested)
+    '''
+    q_limit = request.args.get('limit')
+    cursor = request.args.get('cursor')
+
+    stmt = stmt.order_by(*columns)
+
+    if q_limit is None and not cursor:
+        return stmt, None
+
+    #A cursor without a limit pages by the default. Zero, negative & non-integer limits are rejected
+    try:
+        limit = int(q_limit) if q_limit is not None else DEFAULT_PAGE_LIMIT
+    except ValueError:
+        limit = 0
+    if not 0 < limit <= MAX_PAGE_LIMIT:
+        raise QueryParamError(f'limit must be an integer between 1 and {MAX_PAGE_LIMIT}.')
+
+    if cursor:
+        stmt = stmt.where(tuple_(*columns) > tuple_(*decode_cursor(cursor, columns)))
+
+    return stmt.limit(limit + 1), limit
+
+def paginated_response(rows, schema:Schema, columns:tuple, limit:int | None):
+    '''Dump rows from a statement returned by paginate into a JSON response
+
+    Without a limit the dumped rows are returned as a plain list, as before pagination existed.
+    With a limit, the response is an object: {'results': [...], 'next_cursor': str | None}
+    '''
+    if limit is None:
+        results = schema.dump(rows)
+        record_rows(len(results))
+        return jsonify(results), 200
+
+    rows = list(rows)
+    next_cursor = None
+
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([getattr(rows[-1], column.key) for column in columns])
+
+    record_rows(len(rows))
+    return jsonify({'results': schema.dump(rows), 'next_cursor': next_cursor}), 200
@@ -0,0 +1,163 @@
+from functools import lru_cache
+
+from flask import request
+from marshmallow import Schema, fields
+from sqlalchemy import inspect
+from sqlalchemy.orm import joinedload, load_only, selectinload
+
+from app.errors import QueryParamError
+
+def _nested_schema(field:fields.Field) -> Schema | None:
+    '''Return the nested schema instance for a Nested or List(Nested) field, or None for any other field type
+    '''
+    if isinstance(field, fields.List):
+        field = field.inner
+    if isinstance(field, fields.Nested):
+        return field.schema
+    return None
+
+def _projected_columns(model, schema:Schema, keep:tuple=()) -> list | None:
+    '''Get the column attributes to load for a schema that does not dump every column of the model,
+    always including primary & foreign keys (needed to load relationships) and any keep columns.
+    None if every column is dumped
+    '''
+    mapper = inspect(model)
+    dumped = {field.attribute or field_name for field_name, field in schema.dump_fields.items()}
+    kept = {column.key for column in keep}
+
+    columns = []
+    for prop in mapper.column_attrs:
+        is_key = any(column.primary_key or column.foreign_keys for column in prop.columns)
+        if prop.key in dumped or prop.key in kept or is_key:
+            columns.append(prop)
+
+    if len(columns) == len(mapper.column_attrs):
+        return None
+    return [getattr(model, prop.key) for prop in columns]
+
+@lru_cache(maxsize=256)
+def schema_loader_options(model, schema:Schema, keep:tuple=(), skip:tuple=()) -> tuple:
+    '''Build SQLAlchemy loader options matching the nesting of a marshmallow schema
+
+    Each nested field in the schema's dump fields that maps to a relationship on the model is eager loaded,
+    and the nested schema is walked recursively, so dumping the query result never triggers a lazy load.
+    Collections are loaded with selectinload, many-to-one relationships with joinedload.
+    Relationships the schema doesn't dump are left unloaded, and if it dumps only some columns (e.g. a sparse_schema)
+    the rest are deferred with load_only.
+
+    Args:
+        model: The SQLAlchemy model the statement selects
+        schema: The marshmallow schema instance that will dump the result
+        keep: Model attributes to load even if not dumped, e.g. the keyset columns read to build a page cursor
+        skip: Relationships not to load even if dumped, e.g. as they're loaded separately by load_booking_window
+
+    Returns:
+        tuple: Loader options to be passed to Select.options() or Session.get(options=...)
+    '''
+    relationships = inspect(model).relationships
+    skip_keys = {attr.key for attr in skip}
+    options = []
+
+    columns = _projected_columns(model, schema, keep)
+    if columns is not None:
+        options.append(load_only(*columns))
+
+    for field_name, field in schema.dump_fields.items():
+        nested_schema = _nested_schema(field)
+        relationship = relationships.get(field.attribute or field_name)
+
+        if nested_schema is None or relationship is None or relationship.key in skip_keys:
+            continue
+
+        attr = getattr(model, relationship.key)
+        loader = selectinload(attr) if relationship.uselist else joinedload(attr)
+
+        child_options = schema_loader_options(relationship.mapper.class_, nested_schema)
+        if child_options:
+            loader = loader.options(*child_options)
+
+        options.append(loader)
+
+    return tuple(options)
+
+@lru_cache(maxsize=256)
+def schema_tables(model, schema:Schema) -> frozenset[str]:
+    '''Get the names of every table read when dumping the model with a marshmallow schema,
+    including association tables of nested relationships
+
+    Args:
+        model: The SQLAlchemy model being dumped
+        schema: The marshmallow schema instance that will dump it
+
+    Returns:
+        frozenset[str]: Table names
+    '''
+    relationships = inspect(model).relationships
+    tables = {model.__tablename__}
+
+    for field_name, field in schema.dump_fields.items():
+        nested_schema = _nested_schema(field)
+        relationship = relationships.get(field.attribute or field_name)
+
+        if nested_schema is None or relationship is None:
+            continue
+
+        if relationship.secondary is not None:
+            tables.add(relationship.secondary.name)
+        tables |= schema_tables(relationship.mapper.class_, nested_schema)
+
+    return frozenset(tables)
+
+def _parse_names(param:str | None) -> tuple[str, ...] | None:
+    names = tuple(sorted({name.strip() for name in (param or '').split(',') if name.strip()}))
+    return names or None
+
+def _check_field_path(schema:Schema, path:str):
+    '''Raise a QueryParamError if a (dot separated) field path is not dumped by the schema
+    '''
+    current = schema
+    for name in path.split('.'):
+        if current is None or name not in current.dump_fields:
+            available = ', '.join(current.dump_fields) if current is not None else 'none'
+            raise QueryParamError(f'Unknown field "{path}" supplied. Available fields: {available}')
+        current = _nested_schema(current.dump_fields[name])
+
+@lru_cache(maxsize=256)
+def _restricted_schema(schema:Schema, field_names:tuple[str, ...] | None, expand:tuple[str, ...]) -> Schema:
+    nested_names = [field_name for field_name, field in schema.dump_fields.items() if _nested_schema(field) is not None]
+
+    for path in field_names or ():
+        _check_field_path(schema, path)
+    for field_name in expand:
+        if field_name not in nested_names:
+            raise QueryParamError(f'Unknown expand "{field_name}" supplied. Available: {", ".join(nested_names) or "none"}')
+
+    if field_names is None:
+        field_names = tuple(field_name for field_name in schema.dump_fields if field_name not in nested_names)
+
+    #Keep the schema's field order in the output
+    positions = {field_name: i for i, field_name in enumerate(schema.dump_fields)}
+    only = sorted({*field_names, *expand}, key=lambda path: (positions[path.split('.')[0]], path))
+    return type(schema)(many=schema.many, only=only, exclude=schema.exclude)
+
+def sparse_schema(schema:Schema) -> Schema:
+    '''Restrict a schema to the fields & expand query params of the current request
+
+    Query Params:
+        fields (str): Comma separated fields to return. Nested fields can be selected with dot notation, e.g. company.company_name.
+            Defaults to every non-nested field when only expand is supplied
+        expand (str): Comma separated nested objects to include in full, e.g. cargo_type,company.
+            Nested objects not named in fields or expand are omitted
+
+    Restricted schemas are cached per combination, so pass the result to schema_loader_options to also
+    only load the selected columns & relationships.
+
+    Returns:
+        Schema: The schema unchanged if neither param was supplied, otherwise a restricted instance of it
+    '''
+    field_names = _parse_names(request.args.get('fields'))
+    expand = _parse_names(request.args.get('expand'))
+
+    if field_names is None and expand is None:
+        return schema
+    return _restricted_schema(schema, field_names, expand or ())
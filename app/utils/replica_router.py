@@ -0,0 +1,120 @@
+from itertools import count
+from threading import Lock
+from time import monotonic, time
+
+from flask import Flask, Response, g, request
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import Engine, ExceptionContext
+from sqlalchemy.exc import SQLAlchemyError
+
+STICKY_COOKIE = 'db_primary_until'
+READ_METHODS = ('GET', 'HEAD')
+API_BLUEPRINT = 'routes'
+
+class _Replica:
+    __slots__ = ('engine', 'down_until', 'checked_at')
+
+    def __init__(self, engine:Engine):
+        self.engine = engine
+        self.down_until = 0.0
+        self.checked_at = 0.0
+
+class ReplicaRouter:
+    '''Routes read-only API requests (GET & HEAD on the /api/v1 routes) to read replicas, round robin
+
+    A replica is pinged before use once every DB_REPLICA_CHECK_INTERVAL seconds, and skipped for DB_REPLICA_RETRY_AFTER
+    seconds after a failed ping or a connection error, with reads falling back to the primary while no replica is healthy.
+    After a successful write, the client is sent a cookie keeping its reads on the primary for DB_REPLICA_STICKY_SECONDS,
+    so it reads its own writes despite replication lag.
+
+    Config:
+        DB_REPLICA_URLS (list[str]): Connection strings of the replicas. No routing is done when empty
+        DB_REPLICA_CHECK_INTERVAL (int): Seconds between health pings of each replica
+        DB_REPLICA_RETRY_AFTER (int): Seconds an unhealthy replica is skipped
+        DB_REPLICA_STICKY_SECONDS (int): Seconds a client's reads stay on the primary after it writes. 0 disables
+    '''
+    def __init__(self):
+        self.check_interval = 10
+        self.retry_after = 30
+        self.sticky_seconds = 5
+        self._replicas: list[_Replica] = []
+        self._counter = count()
+        self._lock = Lock()
+
+    def init_app(self, app:Flask):
+        self.check_interval = app.config.get('DB_REPLICA_CHECK_INTERVAL', self.check_interval)
+        self.retry_after = app.config.get('DB_REPLICA_RETRY_AFTER', self.retry_after)
+        self.sticky_seconds = app.config.get('DB_REPLICA_STICKY_SECONDS', self.sticky_seconds)
+
+        engine_options = app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})
+        self._replicas = [_Replica(create_engine(url, **engine_options)) for url in app.config.get('DB_REPLICA_URLS', [])]
+        for replica in self._replicas:
+            event.listen(replica.engine, 'handle_error', self._error_listener(replica))
+
+        if self._replicas:
+            app.before_request(self._route_request)
+            app.after_request(self._set_sticky_cookie)
+
+    def _error_listener(self, replica:_Replica):
+        def handle_error(context:ExceptionContext):
+            #Connection is None when the error occurred while connecting
+            if context.is_disconnect or context.connection is None:
+                self._mark_down(replica)
+        return handle_error
+
+    def _mark_down(self, replica:_Replica):
+        replica.down_until = monotonic() + self.retry_after
+
+    def _ping(self, replica:_Replica) -> bool:
+        try:
+            with replica.engine.connect() as conn:
+                conn.execute(text('SELECT 1'))
+        except SQLAlchemyError:
+            self._mark_down(replica)
+            return False
+        return True
+
+    def _next_healthy(self) -> _Replica | None:
+        '''Get the next healthy replica in round robin order, pinging it first if its last check is too old
+        '''
+        for _ in range(len(self._replicas)):
+            replica = self._replicas[next(self._counter) % len(self._replicas)]
+            now = monotonic()
+            if replica.down_until > now:
+                continue
+
+            with self._lock:
+                #Only one thread pings a replica per interval, the rest use it as is
+                due_check = now - replica.checked_at >= self.check_interval
+                if due_check:
+                    replica.checked_at = now
+            if due_check and not self._ping(replica):
+                continue
+            return replica
+        return None
+
+    def _route_request(self):
+        if request.method not in READ_METHODS or (request.blueprint or '').split('.')[0] != API_BLUEPRINT:
+            return
+        if self.sticky_seconds and request.cookies.get(STICKY_COOKIE, 0, type=float) > time():
+            return
+
+        replica = self._next_healthy()
+        if replica is not None:
+            g.db_read_engine = replica.engine
+
+    def _set_sticky_cookie(self, response:Response):
+        if self.sticky_seconds and request.method not in READ_METHODS and response.status_code < 400:
+            response.set_cookie(STICKY_COOKIE, str(time() + self.sticky_seconds), max_age=self.sticky_seconds, httponly=True, samesite='Lax')
+        return response
+
+    def status(self) -> list[dict]:
+        '''Get the health of each replica, in configured order
+        '''
+        now = monotonic()
+        return [
+            {'host': replica.engine.url.host, 'healthy': replica.down_until <= now}
+            for replica in self._replicas
+        ]
+
+replica_router = ReplicaRouter()
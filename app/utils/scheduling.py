@@ -0,0 +1,148 @@
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+from typing import Hashable, Iterable
+
+def free_gaps(busy:Iterable[tuple[datetime, datetime]], window_start:datetime, window_end:datetime, min_duration:timedelta) -> list[tuple[datetime, datetime]]:
+    '''Sweep a set of busy intervals and return the free gaps within a window
+
+    Args:
+        busy: (start, end) intervals, sorted by start. Intervals may overlap or extend outside the window
+        window_start: Start of the window to search
+        window_end: End of the window to search
+        min_duration: Minimum length of a gap to be returned
+
+    Returns:
+        list[tuple]: (gap_start, gap_end) pairs in ascending order, each at least min_duration long
+    '''
+    gaps = []
+    cursor = window_start
+
+    for start, end in busy:
+        if start >= window_end:
+            break
+        if start - cursor >= min_duration:
+            gaps.append((cursor, start))
+        cursor = max(cursor, end)
+
+    if window_end - cursor >= min_duration:
+        gaps.append((cursor, window_end))
+
+    return gaps
+
+def max_weight_schedule(intervals:Iterable[tuple[Hashable, datetime, datetime, float]],
+                        taken:Iterable[tuple[datetime, datetime]]=()) -> tuple[list[Hashable], list[Hashable]]:
+    '''Weighted interval scheduling: choose non-overlapping intervals with the greatest total weight, in O(n log n)
+
+    Intervals are half open, so one may start when another ends. Candidates overlapping a taken interval are skipped.
+    The rest are sorted by end, and for each the best total using it (its weight plus the best total of the intervals
+    ending by its start, found by binary search) is compared with the best total without it.
+
+    Args:
+        intervals: (key, start, end, weight) candidate intervals
+        taken: (start, end) intervals already occupied, sorted by start & not overlapping each other
+
+    Returns:
+        tuple: Keys of the chosen intervals ordered by end, and keys of the candidates skipped for overlapping a taken interval
+    '''
+    taken_starts, taken_ends = [], []
+    for start, end in taken:
+        taken_starts.append(start)
+        taken_ends.append(end)
+
+    def is_free(start:datetime, end:datetime) -> bool:
+        i = bisect_right(taken_ends, start)
+        return i == len(taken_starts) or taken_starts[i] >= end
+
+    candidates, blocked = [], []
+    for interval in intervals:
+        if not is_free(interval[1], interval[2]):
+            blocked.append(interval[0])
+        elif interval[3] > 0:
+            candidates.append(interval)
+    candidates.sort(key=lambda interval: interval[2])
+    ends = [end for _, _, end, _ in candidates]
+
+    #previous[j]: number of candidates ending by the start of candidate j, all of which can precede it
+    previous = [bisect_right(ends, start, hi=j) for j, (_, start, _, _) in enumerate(candidates)]
+    best = [0] * (len(candidates) + 1)
+    for j, (_, _, _, weight) in enumerate(candidates):
+        best[j + 1] = max(best[j], weight + best[previous[j]])
+
+    chosen = []
+    j = len(candidates)
+    while j > 0:
+        if candidates[j - 1][3] + best[previous[j - 1]] > best[j - 1]:
+            chosen.append(candidates[j - 1][0])
+            j = previous[j - 1]
+        else:
+            j -= 1
+
+    chosen.reverse()
+    return chosen, blocked
+
+def earliest_fit(starts:list[datetime], ends:list[datetime], earliest:datetime, latest_end:datetime,
+                 duration:timedelta) -> tuple[datetime, datetime | None] | None:
+    '''Find the earliest start of a booking of the given duration between busy intervals, within [earliest, latest_end]
+
+    Args:
+        starts: Starts of the busy intervals, sorted. Intervals must not overlap, so ends are sorted too
+        ends: Ends of the busy intervals, in the same order
+
+    Returns:
+        tuple | None: (start, end of the busy interval before it or None if there is none), or None if nothing fits
+    '''
+    i = bisect_right(ends, earliest)
+    start = earliest
+    previous_end = ends[i - 1] if i else None
+
+    while start + duration <= latest_end:
+        if i == len(starts) or starts[i] >= start + duration:
+            return start, previous_end
+        start = max(start, ends[i])
+        previous_end = ends[i]
+        i += 1
+    return None
+
+def allocate_docks(requests:list[tuple[datetime, datetime, timedelta, list[tuple[int, int]]]],
+                   busy:dict[int, list[tuple[datetime, datetime]]]) -> list[tuple[int, datetime] | None]:
+    '''Assign booking requests to docks without overlapping busy intervals or each other, with a best-fit greedy heuristic
+
+    Requests are placed in order of their latest possible start, so the least flexible go first. Each goes on the
+    compatible dock where it can start earliest, breaking ties by the smallest idle gap left before it, then the shortest
+    dock, so long docks stay free for long ships. Each placement is a binary search plus a scan of the dock's gaps.
+    Pure function of its arguments, so it can run in another process.
+
+    Args:
+        requests: (earliest_start, latest_end, duration, compatible docks as (dock_id, dock_length)) per request
+        busy: Dock id: (start, end) intervals already booked, sorted by start & not overlapping each other
+
+    Returns:
+        list: (dock_id, start) for each request in order, or None if it fits on no compatible dock
+    '''
+    starts = {dock_id: [start for start, _ in intervals] for dock_id, intervals in busy.items()}
+    ends = {dock_id: [end for _, end in intervals] for dock_id, intervals in busy.items()}
+
+    allocations = [None] * len(requests)
+    order = sorted(range(len(requests)), key=lambda i: (requests[i][1] - requests[i][2], requests[i][0], i))
+
+    for i in order:
+        earliest, latest_end, duration, docks = requests[i]
+        best = None
+        for dock_id, dock_length in docks:
+            fit = earliest_fit(starts.setdefault(dock_id, []), ends.setdefault(dock_id, []), earliest, latest_end, duration)
+            if fit is None:
+                continue
+            start, previous_end = fit
+            gap = start - previous_end if previous_end is not None else timedelta.max
+            key = (start, gap, dock_length, dock_id)
+            if best is None or key < best:
+                best = key
+
+        if best is not None:
+            start, _, _, dock_id = best
+            position = bisect_left(starts[dock_id], start)
+            starts[dock_id].insert(position, start)
+            ends[dock_id].insert(position, start + duration)
+            allocations[i] = (dock_id, start)
+
+    return allocations
@@ -0,0 +1,203 @@
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import datetime, timedelta
+from io import TextIOBase
+from random import Random
+from typing import Iterable, Iterator
+
+from app.model.booking_model import MAX_BOOKING_DURATION
+
+#Generated bookings stay within the duration the API accepts
+MAX_BOOKING_MINUTES = MAX_BOOKING_DURATION // timedelta(minutes=1)
+
+COUNTRIES = (
+    'Australia', 'New Zealand', 'Singapore', 'China', 'Japan', 'Korea', 'Sweden', 'Norway', 'Germany', 'Netherlands',
+    'United Kingdom', 'United States', 'Canada', 'Brazil', 'Panama', 'Liberia', 'Cayman Islands', 'Greece', 'Malta', 'India'
+)
+
+class CopyStream(TextIOBase):
+    '''Read-only file over an iterable of rows, formatted for COPY ... FROM STDIN (text format)
+
+    Rows are formatted lazily as COPY reads, so loading never holds more than one read buffer in memory.
+    Values are written as-is, so must not contain tabs, newlines or backslashes. None is written as NULL.
+    '''
+    def __init__(self, rows:Iterable[tuple]):
+        self._rows = iter(rows)
+        self._buffer = ''
+        self.row_count = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size:int=-1) -> str:
+        lines = [self._buffer]
+        length = len(self._buffer)
+        for row in self._rows:
+            line = '\t'.join([r'\N' if value is None else str(value) for value in row]) + '\n'
+            lines.append(line)
+            length += len(line)
+            self.row_count += 1
+            if 0 <= size <= length:
+                break
+
+        data = ''.join(lines)
+        if size < 0:
+            size = len(data)
+        chunk, self._buffer = data[:size], data[size:]
+        return chunk
+
+    def readline(self, size:int=-1) -> str:
+        return self.read(size)
+
+class SeedGenerator:
+    '''Deterministic generator of a large, valid dataset for load & performance testing
+
+    Every ship is compatible with at least one dock, each dock's CONFIRMED bookings never overlap,
+    and PENDING bookings are generated overlapping confirmed ones. The same arguments always generate the same rows.
+
+    Args:
+        cargo_type_ids: IDs of the existing cargo types to assign to ships & docks
+        companies: Number of companies to generate
+        ships: Number of ships to generate
+        docks: Number of docks to generate
+        bookings_per_dock: Number of CONFIRMED bookings to generate for each dock
+        days: Number of days from start the bookings are spread over
+        start: Start of the booking window
+        pending_ratio: Fraction of CONFIRMED bookings to generate an overlapping PENDING booking for
+        seed: Random seed
+        id_offsets: For each table, the ID after which generated IDs start
+    '''
+    def __init__(self, cargo_type_ids:list[int], companies:int, ships:int, docks:int, bookings_per_dock:int, days:int,
+                 start:datetime, pending_ratio:float=0.2, seed:int=0, id_offsets:dict[str, int] | None=None):
+        self.cargo_type_ids = list(cargo_type_ids)
+        self.companies = companies
+        self.ships = ships
+        self.docks = docks
+        self.bookings_per_dock = bookings_per_dock
+        self.days = days
+        self.start = start
+        self.pending_ratio = pending_ratio
+        self.seed = seed
+        self.id_offsets = defaultdict(int, id_offsets or {})
+
+        #Docks & ships are small enough to hold in memory, and are needed to pick compatible ships for bookings
+        self._dock_rows = self._generate_docks()
+        self._ship_rows = self._generate_ships()
+
+    def _random(self, table:str) -> Random:
+        '''Independent random stream per table, so changing one count does not change the other tables' rows
+        '''
+        return Random(f'{self.seed}:{table}')
+
+    def _generate_docks(self) -> list[tuple[int, str, int, list[int]]]:
+        rng = self._random('docks')
+        offset = self.id_offsets['docks']
+        docks = []
+        for dock_id in range(offset + 1, offset + self.docks + 1):
+            cargo_count = rng.randint(1, min(3, len(self.cargo_type_ids)))
+            cargo_type_ids = sorted(rng.sample(self.cargo_type_ids, cargo_count))
+            docks.append((dock_id, f'GD{dock_id}', rng.randrange(120, 401, 10), cargo_type_ids))
+        return docks
+
+    def _generate_ships(self) -> list[tuple[int, str, int, str, int, int]]:
+        rng = self._random('ships')
+        offset = self.id_offsets['ships']
+        company_offset = self.id_offsets['companies']
+
+        #Only generate ships some dock can receive: a cargo type & length within a dock's limits
+        max_length_by_cargo = defaultdict(int)
+        for _, _, dock_length, cargo_type_ids in self._dock_rows:
+            for cargo_type_id in cargo_type_ids:
+                max_length_by_cargo[cargo_type_id] = max(max_length_by_cargo[cargo_type_id], dock_length)
+        cargo_type_ids = sorted(max_length_by_cargo)
+
+        ships = []
+        for ship_id in range(offset + 1, offset + self.ships + 1):
+            cargo_type_id = rng.choice(cargo_type_ids)
+            ship_length = rng.randint(50, max_length_by_cargo[cargo_type_id])
+            company_id = company_offset + rng.randint(1, self.companies)
+            ships.append((ship_id, f'Generated Ship {ship_id}', ship_length, rng.choice(COUNTRIES), cargo_type_id, company_id))
+        return ships
+
+    def company_rows(self) -> Iterator[tuple]:
+        '''Rows of (id, company_name, country, email, phone, address)
+        '''
+        rng = self._random('companies')
+        offset = self.id_offsets['companies']
+        for company_id in range(offset + 1, offset + self.companies + 1):
+            yield (
+                company_id,
+                f'Generated Company {company_id}',
+                rng.choice(COUNTRIES),
+                f'contact{company_id}@company{company_id}.example.com',
+                f'+61 {rng.randint(100000000, 999999999)}',
+                f'{rng.randint(1, 999)} Harbour Road, Port {company_id}'
+            )
+
+    def dock_rows(self) -> Iterator[tuple]:
+        '''Rows of (id, dock_code, dock_length)
+        '''
+        for dock_id, dock_code, dock_length, _ in self._dock_rows:
+            yield dock_id, dock_code, dock_length
+
+    def dock_cargo_rows(self) -> Iterator[tuple]:
+        '''Rows of (id, cargo_type_id, dock_id)
+        '''
+        dock_cargo_id = self.id_offsets['dock_cargo']
+        for dock_id, _, _, cargo_type_ids in self._dock_rows:
+            for cargo_type_id in cargo_type_ids:
+                dock_cargo_id += 1
+                yield dock_cargo_id, cargo_type_id, dock_id
+
+    def ship_rows(self) -> Iterator[tuple]:
+        '''Rows of (id, ship_name, ship_length, registration_country, cargo_type_id, company_id)
+        '''
+        yield from self._ship_rows
+
+    def booking_rows(self) -> Iterator[tuple]:
+        '''Rows of (id, booking_start, booking_end, booking_status, ship_id, dock_id)
+
+        The booking window is split into one equal slot per confirmed booking, and each confirmed booking placed
+        inside its own slot, so confirmed bookings on a dock can never overlap. Pending bookings are then placed
+        around a confirmed booking, overlapping it.
+        '''
+        rng = self._random('bookings')
+        booking_id = self.id_offsets['bookings']
+
+        ships_by_cargo = defaultdict(list)
+        for ship_id, _, ship_length, _, cargo_type_id, _ in self._ship_rows:
+            ships_by_cargo[cargo_type_id].append((ship_length, ship_id))
+        for cargo_ships in ships_by_cargo.values():
+            cargo_ships.sort()
+
+        slot_minutes = self.days * 24 * 60 // max(self.bookings_per_dock, 1)
+        #Durations are capped to MAX_BOOKING_DURATION, enforced when creating bookings through the API
+        max_duration = min(max(slot_minutes * 9 // 10, 1), MAX_BOOKING_MINUTES)
+        min_duration = min(max(slot_minutes // 4, 1), max_duration)
+        duration_range = max_duration - min_duration + 1
+        random = rng.random
+        minute = timedelta(minutes=1)
+
+        for dock_id, _, dock_length, cargo_type_ids in self._dock_rows:
+            compatible_ships = []
+            for cargo_type_id in cargo_type_ids:
+                cargo_ships = ships_by_cargo[cargo_type_id]
+                compatible_ships.extend(ship_id for _, ship_id in cargo_ships[:bisect_right(cargo_ships, (dock_length, float('inf')))])
+            if not compatible_ships:
+                continue
+            ship_count = len(compatible_ships)
+
+            #random() is scaled directly rather than using randint/choice, which dominate the generation time
+            for slot in range(self.bookings_per_dock):
+                duration = min_duration + int(random() * duration_range)
+                offset = slot * slot_minutes + int(random() * (slot_minutes - duration + 1))
+                booking_start = self.start + offset * minute
+                booking_end = booking_start + duration * minute
+
+                booking_id += 1
+                yield booking_id, booking_start, booking_end, 'CONFIRMED', compatible_ships[int(random() * ship_count)], dock_id
+
+                if random() < self.pending_ratio:
+                    shift = (int(random() * (duration + 1)) - duration // 2) * minute
+                    booking_id += 1
+                    yield booking_id, booking_start + shift, booking_end + shift, 'PENDING', compatible_ships[int(random() * ship_count)], dock_id
@@ -0,0 +1,46 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from threading import Lock
+from typing import Callable
+
+from flask import Flask
+
+class SolverPool:
+    '''Runs CPU heavy solver functions (e.g. allocate_docks) for large inputs in a pool of worker processes,
+    so a long solve doesn't hold the GIL of the worker serving other requests
+
+    The pool is started on first use, in the serving process, using spawn so the solver processes don't inherit the
+    worker's threads & database connections. Smaller inputs, or every input when disabled, are solved in process.
+
+    Config:
+        SOLVER_PROCESSES (int): Number of solver processes per worker. 0 disables the pool
+        SOLVER_POOL_MIN_SIZE (int): Inputs with at least this many items are solved in the pool
+    '''
+    def __init__(self):
+        self.processes = 0
+        self.min_size = 500
+        self._executor: ProcessPoolExecutor | None = None
+        self._lock = Lock()
+
+    def init_app(self, app:Flask):
+        self.processes = app.config.get('SOLVER_PROCESSES', self.processes)
+        self.min_size = app.config.get('SOLVER_POOL_MIN_SIZE', self.min_size)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(self.processes, mp_context=multiprocessing.get_context('spawn'))
+            return self._executor
+
+    def run(self, func:Callable, *args, size:int):
+        '''Call func(*args), in the pool if it is enabled and size is at least SOLVER_POOL_MIN_SIZE.
+        func must be a module level function, and args picklable
+
+        Args:
+            size: Size of the input, e.g. the number of requests to allocate
+        '''
+        if self.processes <= 0 or size < self.min_size:
+            return func(*args)
+        return self._get_executor().submit(func, *args).result()
+
+solver_pool = SolverPool()
@@ -0,0 +1,38 @@
+from flask import current_app, request, stream_with_context
+from sqlalchemy import Select
+from marshmallow import Schema
+
+from app.db import db
+from app.utils.metrics import record_streamed_rows
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+STREAM_CHUNK_SIZE = 500
+
+def wants_stream() -> bool:
+    '''Check whether the current request asked for a streamed NDJSON response,
+    either with ?stream=1 or an Accept header preferring application/x-ndjson
+    '''
+    if request.args.get('stream', type=int) == 1:
+        return True
+    return request.accept_mimetypes.best_match(('application/json', NDJSON_MIMETYPE)) == NDJSON_MIMETYPE
+
+def ndjson_response(stmt:Select, schema:Schema, chunk_size:int=STREAM_CHUNK_SIZE):
+    '''Stream the results of a select statement as newline delimited JSON, one dumped object per line
+
+    Rows are fetched from a server-side cursor with yield_per and dumped one chunk at a time,
+    so worker memory stays flat regardless of the size of the result set.
+
+    Args:
+        stmt: The select statement to stream. Loader options must be compatible with yield_per (no joined collections)
+        schema: A many=True schema instance used to dump each chunk
+        chunk_size: Number of rows fetched & dumped per chunk
+    '''
+    def generate():
+        rows = db.session.scalars(stmt.execution_options(yield_per=chunk_size))
+        count = 0
+        for chunk in rows.partitions():
+            count += len(chunk)
+            yield ''.join(f'{current_app.json.dumps(item)}\n' for item in schema.dump(chunk))
+        record_streamed_rows(count)
+
+    return current_app.response_class(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
@@ -0,0 +1,21 @@
+from os import environ, listdir, makedirs, path, remove
+
+from prometheus_client import multiprocess
+
+def on_starting(server):
+    '''Clear metric files left by a previous run, so counters restart from zero
+    '''
+    metrics_dir = environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if not metrics_dir:
+        return
+
+    makedirs(metrics_dir, exist_ok=True)
+    for file_name in listdir(metrics_dir):
+        if file_name.endswith('.db'):
+            remove(path.join(metrics_dir, file_name))
+
+def child_exit(server, worker):
+    '''Drop the live gauges of an exited worker from the aggregated metrics
+    '''
+    if environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        multiprocess.mark_process_dead(worker.pid)